@@ -0,0 +1,212 @@
+# association.py
+import math
+from statistics import NormalDist
+import numpy as np
+from config import *
+from geometry import normalize_angle
+from spatial import GridIndex
+
+def chi2_quantile(dof, probability):
+    """Wilson-Hilferty approximation of the chi-square quantile (no SciPy needed)"""
+    z = NormalDist().inv_cdf(probability)
+    return dof * (1 - 2 / (9 * dof) + z * math.sqrt(2 / (9 * dof))) ** 3
+
+class DataAssociator:
+    """
+    Matches anonymous (range, bearing) measurements to landmarks mapped by
+    an EKF, using Mahalanobis gating and either greedy nearest neighbour
+    or Joint Compatibility Branch and Bound (JCBC).
+
+    Candidates come from a GridIndex over the estimated landmark positions,
+    so each measurement is only gated against landmarks within
+    `search_radius` of where it lands. Measurements incompatible with every
+    mapped landmark (beyond the new-landmark gate) start tentative
+    landmarks, which are removed again unless re-observed `confirm_hits`
+    times within `confirm_window` frames (this is what filters clutter);
+    ambiguous measurements in between the two gates are dropped.
+
+    A pairing is only considered when it clearly beats its rivals on both
+    sides: every other landmark gated by the measurement, and every other
+    measurement of the frame gated by the landmark, must have a d2 at
+    least `ambiguity_ratio` times larger. A landmark is observed once per
+    frame, so a clutter return in the gate of a landmark in view makes
+    the landmark ambiguous for that frame instead of updating it.
+
+    Only confirmed landmarks paired in `consistency_frames` consecutive
+    frames correct the EKF; re-sightings of tentative landmarks and the
+    first pairings after a gap are only counted, so a lone clutter return
+    cannot move the map or the pose.
+    """
+
+    def __init__(self, ekf, joint=JOINT_COMPATIBILITY, gate_probability=ASSOCIATION_GATE_PROB,
+                 new_landmark_probability=NEW_LANDMARK_GATE_PROB, search_radius=ASSOCIATION_RADIUS,
+                 confirm_hits=LANDMARK_CONFIRM_HITS, confirm_window=LANDMARK_CONFIRM_WINDOW,
+                 ambiguity_ratio=ASSOCIATION_AMBIGUITY_RATIO, consistency_frames=ASSOCIATION_CONSISTENCY_FRAMES):
+        self.ekf = ekf
+        self.joint = joint
+        self.gate_probability = gate_probability
+        self.gate = chi2_quantile(2, gate_probability)
+        self.new_landmark_gate = chi2_quantile(2, new_landmark_probability)
+        self.search_radius = search_radius
+        self.confirm_hits = confirm_hits
+        self.confirm_window = confirm_window
+        self.ambiguity_ratio = ambiguity_ratio
+        self.consistency_frames = consistency_frames
+        self.index = GridIndex(GRID_CELL_SIZE)
+        self.next_id = 0
+        self.frame = 0
+        self.tentative = {}  # lm_id -> [first frame, sightings]
+        self.streak = {}     # lm_id -> (last frame paired, consecutive frames paired)
+        for lm_id in ekf.landmark_ids:
+            self.index.insert(lm_id, *ekf.landmark_estimate(lm_id))
+
+    def _candidates(self, z):
+        """Individually compatible (d2, lm_id) for one measurement, best first, and the smallest d2"""
+        x, y, theta = self.ekf.pose
+        px = x + z[0] * math.cos(theta + z[1])
+        py = y + z[0] * math.sin(theta + z[1])
+        compatible, best = [], math.inf
+        for lm_id, _ in self.index.query_radius(px, py, self.search_radius):
+            res, S = self.ekf.innovation(lm_id, z)
+            d2 = float(res @ np.linalg.solve(S, res))
+            best = min(best, d2)
+            if d2 < self.gate:
+                compatible.append((d2, lm_id))
+        compatible.sort()
+        return compatible, best
+
+    def associate(self, measurements):
+        """
+        Label a frame of anonymous (range, bearing) measurements.
+        Returns (lm_id, z) pairs; lm_id is a fresh id for new landmarks.
+        """
+        candidates, nearest = [], []
+        for z in measurements:
+            compatible, best = self._candidates(z)
+            candidates.append(compatible)
+            nearest.append(best)
+        candidates = self._unambiguous(candidates)
+
+        if self.joint:
+            labels = self._jcbc(measurements, candidates)
+        else:
+            labels = self._nearest_neighbour(candidates)
+
+        pairs = []
+        for z, lm_id, best in zip(measurements, labels, nearest):
+            if lm_id is None and best > self.new_landmark_gate:
+                lm_id = f"M{self.next_id}"
+                self.next_id += 1
+            if lm_id is not None:
+                pairs.append((lm_id, z))
+        return pairs
+
+    def _unambiguous(self, candidates):
+        """Drop the pairings that do not beat every rival d2 by ambiguity_ratio"""
+        by_landmark = {}
+        for compatible in candidates:
+            for d2, lm_id in compatible:
+                by_landmark.setdefault(lm_id, []).append(d2)
+
+        def clear(d2, rivals):
+            """d2 is the smallest of rivals (which include it) by the ratio"""
+            rivals = sorted(rivals)
+            return d2 == rivals[0] and (len(rivals) == 1 or self.ambiguity_ratio * d2 <= rivals[1])
+
+        return [[(d2, lm_id) for d2, lm_id in compatible
+                 if clear(d2, [c for c, _ in compatible]) and clear(d2, by_landmark[lm_id])]
+                for compatible in candidates]
+
+    def _nearest_neighbour(self, candidates):
+        """Greedy global nearest neighbour: smallest d2 first, each landmark used once"""
+        options = sorted((d2, i, lm_id) for i, compatible in enumerate(candidates) for d2, lm_id in compatible)
+        labels = [None] * len(candidates)
+        used = set()
+        for d2, i, lm_id in options:
+            if labels[i] is None and lm_id not in used:
+                labels[i] = lm_id
+                used.add(lm_id)
+        return labels
+
+    def _joint_d2(self, measurements, hypothesis):
+        """Joint Mahalanobis distance of all pairings in a hypothesis"""
+        pairs = [(measurements[i], lm_id) for i, lm_id in enumerate(hypothesis) if lm_id is not None]
+        k = len(pairs)
+        y = np.empty(2 * k)
+        H = []
+        cols = [0, 1, 2]
+        for j, (z, lm_id) in enumerate(pairs):
+            z_hat, Hb, block_cols = self.ekf.observation(lm_id)
+            y[2*j] = z[0] - z_hat[0]; y[2*j+1] = normalize_angle(z[1] - z_hat[1])
+            H.append(Hb)
+            cols.extend(block_cols[3:])
+        Hj = np.zeros((2 * k, len(cols)))
+        for j, Hb in enumerate(H):
+            Hj[2*j:2*j+2, 0:3] = Hb[:, 0:3]
+            Hj[2*j:2*j+2, 3+2*j:5+2*j] = Hb[:, 3:5]
+        S = Hj @ self.ekf.covariance(cols) @ Hj.T + np.kron(np.eye(k), self.ekf.meas_noise)
+        return float(y @ np.linalg.solve(S, y)), k
+
+    def _jcbc(self, measurements, candidates):
+        """
+        Joint Compatibility Branch and Bound: the hypothesis with the most
+        pairings whose joint innovation passes the chi-square gate
+        (ties broken by joint d2). Landmarks repeated within a hypothesis
+        are not allowed.
+        """
+        n = len(measurements)
+        best = {"labels": [None] * n, "pairings": 0, "d2": math.inf}
+
+        def search(i, hypothesis, pairings, d2):
+            if i == n:
+                if pairings > best["pairings"] or (pairings == best["pairings"] and d2 < best["d2"]):
+                    best.update(labels=list(hypothesis), pairings=pairings, d2=d2)
+                return
+            used = set(hypothesis)
+            for _, lm_id in candidates[i]:
+                if lm_id in used:
+                    continue
+                hypothesis.append(lm_id)
+                joint_d2, k = self._joint_d2(measurements, hypothesis)
+                if joint_d2 < chi2_quantile(2 * k, self.gate_probability):
+                    search(i + 1, hypothesis, pairings + 1, joint_d2)
+                hypothesis.pop()
+            # Star branch (measurement i unpaired), only if it can still beat the best
+            if pairings + (n - i - 1) >= best["pairings"]:
+                hypothesis.append(None)
+                search(i + 1, hypothesis, pairings, d2)
+                hypothesis.pop()
+
+        search(0, [], 0, 0.0)
+        return best["labels"]
+
+    def correct(self, measurements):
+        """Associate a frame, apply it to the EKF and keep the index in sync"""
+        pairs = self.associate(measurements)
+        for lm_id, _ in pairs:
+            last, run = self.streak.get(lm_id, (None, 0))
+            self.streak[lm_id] = (self.frame, run + 1 if last == self.frame - 1 else 1)
+        # New landmarks are initialized; otherwise only consistently paired, confirmed ones correct
+        self.ekf.correct([(lm_id, z) for lm_id, z in pairs if lm_id not in self.index or (
+            lm_id not in self.tentative and self.streak[lm_id][1] >= self.consistency_frames)])
+        # Landmarks near the robot move most with an update; re-index the observed ones
+        for lm_id, _ in pairs:
+            if lm_id not in self.index:
+                self.tentative[lm_id] = [self.frame, 0]
+            if lm_id in self.tentative:
+                self.tentative[lm_id][1] += 1
+            self.index.move(lm_id, *self.ekf.landmark_estimate(lm_id))
+        self._prune_tentative()
+        self.frame += 1
+        return pairs
+
+    def _prune_tentative(self):
+        """Confirm tentative landmarks seen often enough; remove stale ones"""
+        for lm_id, (first, hits) in list(self.tentative.items()):
+            if hits >= self.confirm_hits:
+                del self.tentative[lm_id]
+            elif self.frame - first >= self.confirm_window:
+                del self.tentative[lm_id]
+                del self.streak[lm_id]
+                self.ekf.remove_landmark(lm_id)
+                self.index.remove(lm_id)
@@ -0,0 +1,273 @@
+# batch.py
+import math
+import time
+import numpy as np
+from config import *
+from costmap import DistanceField
+from geometry import normalize_angle
+
+class BatchSimulator:
+    """
+    Vectorized Monte-Carlo version of SlamSimulator: B independent robots,
+    each with its own EKF, advanced together with NumPy arrays of shape
+    (B, n) and (B, n, n), n = 3 + 2 * (landmarks in the world).
+    The control, truth, odometry and EKF models match simulator.py.
+    """
+
+    def __init__(self, num_runs, landmarks=None, goals=None, seed=None, world_size=None, walls=None,
+                 motion_noise=MOTION_NOISE, meas_noise=MEAS_NOISE, odom_std=ODOM_STD):
+        self.rng = np.random.default_rng(seed)
+        self.num_runs = B = num_runs
+        landmarks = LANDMARKS if landmarks is None else landmarks
+        self.landmark_ids = list(landmarks)
+        self.landmark_xy = np.array([landmarks[lm] for lm in self.landmark_ids], dtype=float)  # (L, 2)
+        self.costmap = DistanceField.from_world(landmarks, walls or [])
+        self.goals = np.array(GOALS if goals is None else goals, dtype=float)  # (G, 2)
+        self.world_width, self.world_height = world_size or (WORLD_WIDTH, WORLD_HEIGHT)
+        self.motion_noise = np.asarray(motion_noise, dtype=float)
+        self.meas_noise = np.asarray(meas_noise, dtype=float)
+        self.odom_std = odom_std
+
+        L = len(self.landmark_ids)
+        self.state_size = n = 3 + 2 * L
+
+        start = np.column_stack([
+            self.rng.uniform(0.5, self.world_width - 0.5, B),
+            self.rng.uniform(0.5, self.world_height - 0.5, B),
+            self.rng.uniform(0, 2 * math.pi, B),
+        ])
+        self.truth = start.copy()  # (B, 3)
+        self.odom = start.copy()
+        self.X = np.zeros((B, n))
+        self.X[:, 0:3] = start
+
+        # Same initial covariance as EKF; landmark rows stay zero until the
+        # first sighting, so each run matches the EKF's state up to slot order
+        self.P = np.zeros((B, n, n))
+        self.P[:, 0:3, 0:3] = INITIAL_POSE_COV
+
+        self.seen = np.zeros((B, L), dtype=bool)
+        self.in_range = np.zeros((B, L), dtype=bool)  # Landmarks sensed last step (the sensor rays)
+        self.goal_index = np.zeros(B, dtype=int)
+        self.time = 0.0
+        self.step_count = 0
+
+    @classmethod
+    def from_world(cls, num_runs, world, **kwargs):
+        """Batch runs in a world dict from world.py"""
+        return cls(num_runs, landmarks=world["landmarks"], goals=world["goals"], walls=world.get("walls"),
+                   world_size=(world["width"], world["height"]), **kwargs)
+
+    @property
+    def done(self):
+        return self.goal_index >= len(self.goals)
+
+    @property
+    def position_error(self):
+        return np.hypot(self.truth[:, 0] - self.X[:, 0], self.truth[:, 1] - self.X[:, 1])
+
+    @property
+    def heading_error(self):
+        return np.abs(normalize_angle(self.truth[:, 2] - self.X[:, 2]))
+
+    def avoidance(self):
+        """Vectorized detect_obstacles_and_avoid: (avoidance_angle, speed_factor) per run"""
+        tx, ty, tth = self.truth[:, 0:1], self.truth[:, 1:2], self.truth[:, 2:3]
+        dx = self.landmark_xy[:, 0] - tx
+        dy = self.landmark_xy[:, 1] - ty
+        dist = np.hypot(dx, dy)  # (B, L)
+        angle_diff = normalize_angle(np.arctan2(dy, dx) - tth)
+        near = (np.abs(angle_diff) < math.pi/2) & (dist < SAFE_DISTANCE)
+        push = -AVOIDANCE_GAIN * np.sign(angle_diff) / np.maximum(dist, 0.1)
+
+        # Sensor rays and the nearest obstacle in the distance field both contribute, as in simulator.py
+        ray_hit = near & self.in_range
+        field_dist, gradient = self.costmap.sample_many(self.truth[:, :2])
+        field_diff = normalize_angle(np.arctan2(-gradient[:, 1], -gradient[:, 0]) - self.truth[:, 2])
+        field_hit = (field_dist < SAFE_DISTANCE) & gradient.any(axis=1) & (np.abs(field_diff) < math.pi/2)
+        field_push = -AVOIDANCE_GAIN * np.where(field_diff < 0, -1.0, 1.0) / np.maximum(field_dist, 0.1)
+        angle = np.sum(np.where(ray_hit, push, 0.0), axis=1) + np.where(field_hit, field_push, 0.0)
+        detected = ray_hit.any(axis=1) | field_hit
+        angle = np.where(detected, np.clip(angle, -MAX_AVOIDANCE_ANGLE, MAX_AVOIDANCE_ANGLE), 0.0)
+        closest = np.minimum(np.min(np.where(ray_hit, dist, np.inf), axis=1), np.where(field_hit, field_dist, np.inf))
+        speed_factor = np.where(detected & (closest < STOP_DISTANCE), 0.0, 1.0)
+        return angle, speed_factor
+
+    def compute_control(self):
+        active = ~self.done
+        goal = self.goals[np.minimum(self.goal_index, len(self.goals) - 1)]
+        dx = goal[:, 0] - self.X[:, 0]
+        dy = goal[:, 1] - self.X[:, 1]
+        dist = np.hypot(dx, dy)
+        heading_error = normalize_angle(np.arctan2(dy, dx) - self.X[:, 2])
+        avoidance_angle, speed_factor = self.avoidance()
+
+        reached = active & (dist < GOAL_THRESHOLD)
+        self.goal_index += reached
+        moving = active & ~reached
+
+        base_v = np.minimum(K_DISTANCE * dist, MAX_SPEED)
+        avoiding = avoidance_angle != 0.0
+        omega = np.where(avoiding, avoidance_angle * 1.5, K_HEADING * heading_error)
+        v = np.where(avoiding, base_v * 0.5 * speed_factor, base_v)
+        v = np.where((np.abs(heading_error) > 1.0) & (np.abs(avoidance_angle) < 0.1), 0.0, v)
+        return np.where(moving, v, 0.0), np.where(moving, omega, 0.0)
+
+    def predict(self, v, w, dt):
+        X, P = self.X, self.P
+        theta = X[:, 2].copy()
+        X[:, 0] += v * np.cos(theta) * dt; X[:, 1] += v * np.sin(theta) * dt
+        X[:, 2] = normalize_angle(X[:, 2] + w*dt)
+
+        # Same in-place robot row/column update as EKF.predict
+        a = (-v * np.sin(theta) * dt)[:, None]; b = (v * np.cos(theta) * dt)[:, None]
+        P[:, 0, :] += a * P[:, 2, :]; P[:, 1, :] += b * P[:, 2, :]
+        P[:, :, 0] += a * P[:, :, 2]; P[:, :, 1] += b * P[:, :, 2]
+        Q = self.motion_noise * (dt / SIM_DT)  # MOTION_NOISE is per SIM_DT, as in EKF.predict
+        P[:, 0, 0] += Q[0]; P[:, 1, 1] += Q[1]; P[:, 2, 2] += Q[2]
+
+    def sense_and_update(self):
+        tx, ty, tth = self.truth[:, 0:1], self.truth[:, 1:2], self.truth[:, 2:3]
+        dx = self.landmark_xy[:, 0] - tx
+        dy = self.landmark_xy[:, 1] - ty
+        true_dist = np.hypot(dx, dy)
+        self.in_range = true_dist <= MAX_SENSOR_RANGE
+        z_r = true_dist + self.rng.normal(0, RANGE_STD, true_dist.shape)
+        z_b = normalize_angle(normalize_angle(np.arctan2(dy, dx) - tth) + self.rng.normal(0, BEARING_STD, true_dist.shape))
+
+        # Landmarks are fused sequentially (as in EKF.correct), vectorized over runs
+        for j in range(len(self.landmark_ids)):
+            idx = 3 + 2*j
+            visible = self.in_range[:, j]
+            update = visible & self.seen[:, j]
+
+            new = np.nonzero(visible & ~self.seen[:, j])[0]
+            if new.size:
+                self._initialize(new, idx, z_r[new, j], z_b[new, j])
+                self.seen[new, j] = True
+
+            runs = np.nonzero(update)[0]
+            if runs.size:
+                self._update(runs, idx, z_r[runs, j], z_b[runs, j])
+
+        # Re-symmetrize against round-off in the stacked updates
+        self.P += self.P.transpose(0, 2, 1); self.P *= 0.5
+
+    def _initialize(self, runs, idx, r, bearing):
+        """EKF._initialize_landmark for the given runs: mean, cross-covariance and block from Gr, Gz"""
+        X, P = self.X, self.P
+        c, s = np.cos(X[runs, 2] + bearing), np.sin(X[runs, 2] + bearing)
+        X[runs, idx] = X[runs, 0] + r * c
+        X[runs, idx+1] = X[runs, 1] + r * s
+        ones, zeros = np.ones_like(r), np.zeros_like(r)
+        Gr = np.stack([np.stack([ones, zeros, -r * s], axis=1),
+                       np.stack([zeros, ones, r * c], axis=1)], axis=1)  # (k, 2, 3)
+        Gz = np.stack([np.stack([c, -r * s], axis=1), np.stack([s, r * c], axis=1)], axis=1)  # (k, 2, 2)
+        P_cross = Gr @ P[runs, 0:3, :]  # (k, 2, n)
+        P[runs, idx:idx+2, :] = P_cross
+        P[runs, :, idx:idx+2] = P_cross.transpose(0, 2, 1)
+        P[runs, idx:idx+2, idx:idx+2] = (P_cross[:, :, 0:3] @ Gr.transpose(0, 2, 1)
+                                         + Gz @ self.meas_noise @ Gz.transpose(0, 2, 1))
+
+    def _update(self, runs, idx, z_r, z_b):
+        """
+        One landmark's update for the given runs. H is nonzero only in the
+        pose and landmark columns, with the landmark's x/y columns the
+        negatives of the pose's, so PH^T and S come from two column
+        differences of P and S is inverted in closed form.
+        """
+        X, P = self.X[runs], self.P[runs]
+        dx = X[:, idx] - X[:, 0]; dy = X[:, idx+1] - X[:, 1]
+        q = dx**2 + dy**2; r_pred = np.sqrt(q)
+        y_r = z_r - r_pred
+        y_b = normalize_angle(z_b - normalize_angle(np.arctan2(dy, dx) - X[:, 2]))
+
+        def project(A):
+            """H applied to the last axis of A: (range, bearing) rows"""
+            Dx, Dy = A[..., idx] - A[..., 0], A[..., idx+1] - A[..., 1]
+            dx_, dy_, r_, q_ = (v.reshape(v.shape + (1,) * (Dx.ndim - 1)) for v in (dx, dy, r_pred, q))
+            return (dx_ * Dx + dy_ * Dy) / r_, (dx_ * Dy - dy_ * Dx) / q_ - A[..., 2]
+
+        PHt_r, PHt_b = project(P)  # (k, n) columns of PH^T
+        (S_rr, S_rb), (_, S_bb) = project(PHt_r), project(PHt_b)
+        R = self.meas_noise
+        S_rr = S_rr + R[0, 0]; S_rb = S_rb + R[0, 1]; S_bb = S_bb + R[1, 1]
+        det = S_rr * S_bb - S_rb**2
+        K_r = (PHt_r * S_bb[:, None] - PHt_b * S_rb[:, None]) / det[:, None]
+        K_b = (PHt_b * S_rr[:, None] - PHt_r * S_rb[:, None]) / det[:, None]
+
+        X += K_r * y_r[:, None] + K_b * y_b[:, None]; X[:, 2] = normalize_angle(X[:, 2])
+        P -= np.stack([K_r, K_b], axis=2) @ np.stack([PHt_r, PHt_b], axis=1)  # Rank-2 K H P
+        self.X[runs], self.P[runs] = X, P
+
+    def step(self, dt=SIM_DT):
+        v, omega = self.compute_control()
+        v_l = v - omega*WHEEL_BASE/2
+        v_r = v + omega*WHEEL_BASE/2
+
+        # Ground truth
+        v_t = (v_l + v_r)/2; w_t = (v_r - v_l)/WHEEL_BASE
+        self.truth[:, 0] += v_t * np.cos(self.truth[:, 2]) * dt
+        self.truth[:, 1] += v_t * np.sin(self.truth[:, 2]) * dt
+        self.truth[:, 2] = normalize_angle(self.truth[:, 2] + w_t*dt)
+
+        # Noisy wheel odometry
+        noise = self.rng.normal(0, self.odom_std, (self.num_runs, 2))
+        v_l_n = v_l + noise[:, 0]; v_r_n = v_r + noise[:, 1]
+        v_o = (v_l_n + v_r_n)/2; w_o = (v_r_n - v_l_n)/WHEEL_BASE
+        self.odom[:, 0] += v_o * np.cos(self.odom[:, 2]) * dt
+        self.odom[:, 1] += v_o * np.sin(self.odom[:, 2]) * dt
+        self.odom[:, 2] = normalize_angle(self.odom[:, 2] + w_o*dt)
+
+        # EKF
+        self.predict(v_o, w_o, dt)
+        self.sense_and_update()
+
+        self.time += dt
+        self.step_count += 1
+
+    def run(self, duration, dt=SIM_DT, record_every=6):
+        """
+        Step all runs for `duration` simulated seconds.
+        Returns a dict of per-run error trajectories sampled every
+        `record_every` steps: "time" (T,), "position_error" and
+        "heading_error" (B, T), plus final "goals_reached" (B,).
+        """
+        steps = int(round(duration / dt))
+        times, pos_err, head_err = [], [], []
+        for i in range(steps):
+            self.step(dt)
+            if i % record_every == 0 or i == steps - 1:
+                times.append(self.time)
+                pos_err.append(self.position_error)
+                head_err.append(self.heading_error)
+        return {
+            "time": np.array(times),
+            "position_error": np.stack(pos_err, axis=1),
+            "heading_error": np.stack(head_err, axis=1),
+            "goals_reached": self.goal_index.copy(),
+        }
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Vectorized Monte-Carlo EKF-SLAM runs")
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--world", help="World .npz file from world.py (default: the config.py room)")
+    args = parser.parse_args()
+
+    if args.world:
+        from world import load_world
+        sim = BatchSimulator.from_world(args.runs, load_world(args.world), seed=args.seed)
+    else:
+        sim = BatchSimulator(args.runs, seed=args.seed)
+    start = time.perf_counter()
+    result = sim.run(args.seconds)
+    elapsed = time.perf_counter() - start
+
+    rmse = np.sqrt(np.mean(result["position_error"]**2, axis=1))
+    print(f"{args.runs} runs x {args.seconds:.0f}s simulated in {elapsed:.2f}s wall")
+    print(f"Position RMSE (m): mean {rmse.mean():.3f}  p50 {np.percentile(rmse, 50):.3f}  "
+          f"p95 {np.percentile(rmse, 95):.3f}  max {rmse.max():.3f}")
+    print(f"All goals reached: {np.mean(result['goals_reached'] == len(sim.goals)) * 100:.1f}% of runs")
@@ -0,0 +1,111 @@
+# benchmarks/association.py
+"""
+Data-association time per frame as the mapped landmark count and the
+clutter rate grow, for greedy nearest neighbour and JCBC.
+
+Landmarks are scattered at a constant density, so the number visible per
+frame stays fixed while the map grows; the spatial index keeps the
+association cost independent of the map size.
+
+The closed-loop part drives the headless simulator with anonymous
+landmarks and clutter and compares the final pose error with the known-id
+run of the same seed; it exits with an error when a run ends farther than
+--max-error meters from the truth.
+
+Run from the repository root:
+    python -m benchmarks.association --landmarks 100 500 2000 --clutter 0 2 5
+"""
+import argparse
+import math
+import time
+import numpy as np
+from config import MAX_SENSOR_RANGE, RANGE_STD, BEARING_STD
+from ekf import EKF
+from association import DataAssociator
+from geometry import normalize_angle
+from simulator import SlamSimulator
+
+def make_scene(num_landmarks, density, rng):
+    """An EKF that has mapped every landmark, with the robot in the middle of the world"""
+    side = math.sqrt(num_landmarks / density)
+    xy = rng.uniform(0, side, size=(num_landmarks, 2))
+    pose = (side / 2, side / 2, 0.0)
+    ekf = EKF(pose, capacity=num_landmarks)
+    for i, (x, y) in enumerate(xy):
+        dx, dy = x - pose[0], y - pose[1]
+        ekf.update(f"L{i}", (math.hypot(dx, dy), math.atan2(dy, dx)))
+    return ekf, xy, pose
+
+def make_frame(xy, pose, clutter, rng):
+    """Measurements of the visible landmarks plus clutter, and the true id of each (None for clutter)"""
+    d = np.hypot(xy[:, 0] - pose[0], xy[:, 1] - pose[1])
+    frame, truth = [], []
+    for i in np.nonzero(d <= MAX_SENSOR_RANGE)[0]:
+        dx, dy = xy[i, 0] - pose[0], xy[i, 1] - pose[1]
+        frame.append((math.hypot(dx, dy) + rng.normal(0, RANGE_STD),
+                      normalize_angle(math.atan2(dy, dx) - pose[2] + rng.normal(0, BEARING_STD))))
+        truth.append(f"L{i}")
+    for _ in range(rng.poisson(clutter)):
+        frame.append((MAX_SENSOR_RANGE * math.sqrt(rng.random()), rng.uniform(-math.pi, math.pi)))
+        truth.append(None)
+    return frame, truth
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--landmarks", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--clutter", type=float, nargs="+", default=[0, 2, 5])
+    parser.add_argument("--density", type=float, default=0.05, help="Landmarks per square meter")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--seeds", type=int, nargs="*", default=[1, 2, 3], help="Closed-loop runs (none to skip)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Simulated seconds per closed-loop run")
+    parser.add_argument("--max-error", type=float, default=2.0, help="Closed-loop pose error bound (m)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'landmarks':>10} {'clutter':>8} {'meas/frame':>11} {'NN (ms)':>9} {'JCBC (ms)':>10} "
+          f"{'NN correct':>11} {'JCBC correct':>13}")
+    for n in args.landmarks:
+        ekf, xy, pose = make_scene(n, args.density, rng)
+        for clutter in args.clutter:
+            frames = [make_frame(xy, pose, clutter, rng) for _ in range(args.frames)]
+            times, accuracy = {}, {}
+            for joint in (False, True):
+                assoc = DataAssociator(ekf, joint=joint)
+                start = time.perf_counter()
+                results = [assoc.associate(frame) for frame, _ in frames]
+                times[joint] = (time.perf_counter() - start) / len(frames)
+
+                # Fraction of measurements given the right label (clutter counts if left unpaired/new)
+                correct = total = 0
+                for (frame, truth), pairs in zip(frames, results):
+                    labels = {id(z): lm_id for lm_id, z in pairs}
+                    for z, true_id in zip(frame, truth):
+                        label = labels.get(id(z))
+                        correct += label == true_id if true_id else label is None or label not in ekf.landmark_index
+                        total += 1
+                accuracy[joint] = correct / max(1, total)
+            meas = sum(len(f) for f, _ in frames) / len(frames)
+            print(f"{n:>10} {clutter:>8g} {meas:>11.1f} {times[False]*1e3:>9.2f} {times[True]*1e3:>10.2f} "
+                  f"{accuracy[False]*100:>10.1f}% {accuracy[True]*100:>12.1f}%")
+
+    if not args.seeds:
+        return
+    print(f"\n{'seed':>5} {'clutter':>8} {'known ids (m)':>14} {'NN (m)':>8} {'JCBC (m)':>9}")
+    failures = []
+    for seed in args.seeds:
+        known = SlamSimulator(seed=seed).run(args.duration).error
+        for clutter in args.clutter:
+            errors = {}
+            for joint in (False, True):
+                sim = SlamSimulator(seed=seed, anonymous=True, clutter_rate=clutter)
+                sim.associator.joint = joint
+                errors[joint] = sim.run(args.duration).error
+                if errors[joint] > args.max_error:
+                    failures.append(f"seed {seed}, clutter {clutter:g}, {'JCBC' if joint else 'NN'}: "
+                                    f"{errors[joint]:.2f} m")
+            print(f"{seed:>5} {clutter:>8g} {known:>14.2f} {errors[False]:>8.2f} {errors[True]:>9.2f}")
+    if failures:
+        raise SystemExit(f"Pose error above {args.max_error:g} m: " + "; ".join(failures))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# benchmarks/common.py
+"""
+Synthetic drives shared by the filter benchmarks: a closed loop through
+a generated world with one odometry sample and one frame of
+range/bearing measurements per dt.
+"""
+import math
+import numpy as np
+from config import MAX_SENSOR_RANGE, ODOM_STD, RANGE_STD, BEARING_STD, WHEEL_BASE, MOTION_NOISE, SIM_DT
+from geometry import normalize_angle
+from world import generate_world
+
+def frame_noise(dt):
+    """
+    MOTION_NOISE added once per dt frame, as a per-SIM_DT process noise.
+    These drives take one odometry sample per frame, so the filters keep
+    the per-frame noise they were tuned with whatever --dt is.
+    """
+    return [n * SIM_DT / dt for n in MOTION_NOISE]
+
+def simulate(num_landmarks, density, speed, dt, laps, rng, seed):
+    """Landmarks, true poses, odometry (v, w) and per-frame (lm_id, z) of a loop through a generated world"""
+    side = math.sqrt(num_landmarks / density)
+    world = generate_world(side, side, density=density, num_goals=0, seed=seed)
+    landmarks = world["landmarks"]
+    ids = list(landmarks)
+    xy = np.array([landmarks[i] for i in ids]).reshape(-1, 2)
+
+    radius = side / 2 - MAX_SENSOR_RANGE / 2
+    steps = int(laps * 2 * math.pi * radius / (speed * dt))
+    turn = speed / radius
+    theta = math.pi / 2 + turn * dt * np.arange(1, steps + 1)
+    true = np.stack([side / 2 + radius * np.cos(theta - math.pi / 2),
+                     side / 2 + radius * np.sin(theta - math.pi / 2), normalize_angle(theta)], axis=1)
+    v_l = speed - turn * WHEEL_BASE / 2 + rng.normal(0, ODOM_STD, steps)
+    v_r = speed + turn * WHEEL_BASE / 2 + rng.normal(0, ODOM_STD, steps)
+    odom = np.stack([(v_l + v_r) / 2, (v_r - v_l) / WHEEL_BASE], axis=1)
+
+    frames = []
+    for x, y, heading in true:
+        d = np.hypot(xy[:, 0] - x, xy[:, 1] - y)
+        frame = []
+        for j in np.flatnonzero(d <= MAX_SENSOR_RANGE):
+            bearing = math.atan2(xy[j, 1] - y, xy[j, 0] - x) - heading
+            frame.append((ids[j], (d[j] + rng.normal(0, RANGE_STD), normalize_angle(bearing + rng.normal(0, BEARING_STD)))))
+        frames.append(frame)
+    start = (side / 2 + radius, side / 2, math.pi / 2)
+    return landmarks, start, true, odom, frames
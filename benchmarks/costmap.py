@@ -0,0 +1,95 @@
+# benchmarks/costmap.py
+"""
+Per-query cost of the obstacle-avoidance lookup vs. the number of
+obstacles: the original loop over every landmark, a GridIndex radius
+query plus a loop over the obstacles nearby (what simulator.py did
+before the costmap), and one DistanceField lookup, the first time a
+tile is touched and once it is cached. Walls are given to the loops as
+their DistanceField sample points. The last column is the cost of moving
+one landmark, which only recomputes the tiles around it.
+
+Run from the repository root:
+    python -m benchmarks.costmap --landmarks 100 1000 10000 --walls 0 1000
+"""
+import argparse
+import math
+import time
+import numpy as np
+from config import *
+from costmap import DistanceField
+from geometry import normalize_angle
+from spatial import GridIndex
+from world import generate_world
+
+def avoid_loop(x, y, theta, obstacles):
+    """The per-obstacle steering term of the original detect_obstacles_and_avoid"""
+    angle = 0.0
+    for ox, oy in obstacles:
+        dist = math.hypot(ox - x, oy - y)
+        if dist < SAFE_DISTANCE:
+            angle_diff = normalize_angle(math.atan2(oy - y, ox - x) - theta)
+            if abs(angle_diff) < math.pi/2:
+                angle += -AVOIDANCE_GAIN * math.copysign(1.0, angle_diff) / max(dist, 0.1)
+    return angle
+
+def avoid_field(x, y, theta, field):
+    dist, grad_x, grad_y = field.sample(x, y)
+    if dist < SAFE_DISTANCE and (grad_x or grad_y):
+        angle_diff = normalize_angle(math.atan2(-grad_y, -grad_x) - theta)
+        if abs(angle_diff) < math.pi/2:
+            return -AVOIDANCE_GAIN * math.copysign(1.0, angle_diff) / max(dist, 0.1)
+    return 0.0
+
+def timed(fn, poses, *args):
+    start = time.perf_counter()
+    for x, y, theta in poses:
+        fn(x, y, theta, *args)
+    return (time.perf_counter() - start) / len(poses)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--landmarks", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--walls", type=int, nargs="+", default=[0, 1000])
+    parser.add_argument("--density", type=float, default=0.1, help="Landmarks per square meter")
+    parser.add_argument("--queries", type=int, default=2000, help="Robot poses along a random walk")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'landmarks':>10} {'walls':>6} {'samples':>8} {'loop (us)':>10} {'grid (us)':>10} "
+          f"{'field cold (us)':>16} {'field (us)':>11} {'speedup':>8} {'move (ms)':>10}")
+    for n in args.landmarks:
+        for num_walls in args.walls:
+            side = math.sqrt(n / args.density)
+            world = generate_world(side, side, n, num_goals=0, seed=args.seed, num_walls=num_walls)
+            field = DistanceField.from_world(world["landmarks"], world["walls"])
+            points = np.concatenate(list(field.obstacles.values()))
+            grid = GridIndex(GRID_CELL_SIZE)
+            for i, (px, py) in enumerate(points):
+                grid.insert(i, px, py)
+
+            # A robot-like random walk: consecutive queries share tiles, as they do when driving
+            rng = np.random.default_rng(args.seed)
+            heading = np.cumsum(rng.normal(0, 0.3, args.queries))
+            xy = side / 2 + np.cumsum(0.1 * np.column_stack([np.cos(heading), np.sin(heading)]), axis=0)
+            poses = np.column_stack([np.clip(xy, 0, side), heading])
+
+            loop = timed(avoid_loop, poses[:max(1, args.queries // 10)], points)
+            nearby = timed(lambda x, y, theta: avoid_loop(
+                x, y, theta, [p for _, p in grid.query_radius(x, y, SAFE_DISTANCE)]), poses)
+            cold = timed(avoid_field, poses, field)
+            cached = timed(avoid_field, poses, field)
+
+            ids = list(world["landmarks"])
+            start = time.perf_counter()
+            for k in range(100):
+                lm_id = ids[k % len(ids)]
+                x, y = world["landmarks"][lm_id]
+                field.move(lm_id, x + 0.1, y)
+                field.sample(x, y)
+            move = (time.perf_counter() - start) / 100
+
+            print(f"{n:>10} {num_walls:>6} {len(points):>8} {loop*1e6:>10.1f} {nearby*1e6:>10.1f} "
+                  f"{cold*1e6:>16.1f} {cached*1e6:>11.2f} {nearby/cached:>7.1f}x {move*1e3:>10.3f}")
+
+if __name__ == "__main__":
+    main()
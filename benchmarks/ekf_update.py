@@ -0,0 +1,101 @@
+# benchmarks/ekf_update.py
+"""
+Per-update cost of the EKF measurement update as the landmark count grows.
+
+Compares the block-sparse EKF.update against the original dense
+formulation (full H, inv(S), (I - K H) P), then the per-frame cost of
+fusing k visible landmarks sequentially vs. in one batched update.
+
+Run from the repository root:
+    python -m benchmarks.ekf_update --landmarks 5 50 500 2000 5000
+"""
+import argparse
+import math
+import time
+import numpy as np
+from ekf import EKF
+from geometry import normalize_angle
+
+def dense_update(X, P, idx, z, meas_noise):
+    """Reference update exactly as it was inlined in the original main.py"""
+    n = X.shape[0]
+    lx, ly = X[idx, 0], X[idx+1, 0]
+    dx, dy = lx - X[0,0], ly - X[1,0]
+    q = dx**2 + dy**2; r_pred = math.sqrt(q)
+    y_res = z - np.array([[r_pred], [normalize_angle(math.atan2(dy, dx) - X[2,0])]])
+    y_res[1,0] = normalize_angle(y_res[1,0])
+
+    H = np.zeros((2, n))
+    H[0,0] = -dx/r_pred; H[0,1] = -dy/r_pred; H[0,2] = 0
+    H[1,0] = dy/q; H[1,1] = -dx/q; H[1,2] = -1
+    H[0, idx] = dx/r_pred; H[0, idx+1] = dy/r_pred
+    H[1, idx] = -dy/q; H[1, idx+1] = dx/q
+
+    S = H @ P @ H.T + meas_noise
+    K = P @ H.T @ np.linalg.inv(S)
+    X = X + K @ y_res; X[2,0] = normalize_angle(X[2,0])
+    P = (np.eye(n) - K @ H) @ P
+    return X, P
+
+def make_filter(num_landmarks, rng):
+    ids = [f"L{i}" for i in range(num_landmarks)]
+    ekf = EKF((0.0, 0.0, 0.0))
+    for lm_id in ids:
+        ekf.update(lm_id, (rng.uniform(1.0, 5.0), rng.uniform(-math.pi, math.pi)))
+    return ekf, ids
+
+def time_call(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--landmarks", type=int, nargs="+", default=[5, 50, 200, 500, 1000, 2000, 5000])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--visible", type=int, nargs="+", default=[1, 5, 20, 50],
+                        help="Landmarks per frame for the sequential vs. batched comparison")
+    parser.add_argument("--dense-max", type=int, default=1000,
+                        help="Skip the O(N^3) dense reference above this landmark count")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'landmarks':>10} {'state':>7} {'sparse (ms)':>12} {'dense (ms)':>12} {'speedup':>8} {'max |dP|':>10}")
+    for n in args.landmarks:
+        ekf, ids = make_filter(n, rng)
+        z = (3.0, 0.1)
+        lm_id = ids[n // 2]
+        idx = ekf.landmark_index[lm_id]
+
+        X0, P0 = ekf.X.copy(), ekf.P.copy()
+        sparse_t = time_call(lambda: ekf.update(lm_id, z), args.repeats)
+
+        if n <= args.dense_max:
+            dense_t = time_call(lambda: dense_update(X0, P0, idx, np.array([[z[0]], [z[1]]]), ekf.meas_noise), args.repeats)
+            # One update from the same starting point to check both paths agree
+            ekf.X, ekf.P = X0.copy(), P0.copy()
+            ekf.update(lm_id, z)
+            _, P_ref = dense_update(X0, P0, idx, np.array([[z[0]], [z[1]]]), ekf.meas_noise)
+            err = np.max(np.abs(ekf.P - P_ref))
+            print(f"{n:>10} {ekf.state_size:>7} {sparse_t*1e3:>12.3f} {dense_t*1e3:>12.3f} {dense_t/sparse_t:>7.1f}x {err:>10.2e}")
+        else:
+            print(f"{n:>10} {ekf.state_size:>7} {sparse_t*1e3:>12.3f} {'-':>12} {'-':>8} {'-':>10}")
+
+    n = max(args.landmarks)
+    ekf, ids = make_filter(n, rng)
+    X0, P0 = ekf.X.copy(), ekf.P.copy()
+    print(f"\n{n} landmarks, per-frame update cost")
+    print(f"{'visible':>10} {'sequential (ms)':>16} {'batched (ms)':>13} {'speedup':>8}")
+    for k in args.visible:
+        frame = [(ids[i], (3.0, 0.1)) for i in range(k)]
+        times = {}
+        for mode in ("sequential", "batched"):
+            ekf.X, ekf.P = X0.copy(), P0.copy()
+            ekf.update_mode = mode
+            times[mode] = time_call(lambda: ekf.correct(frame), max(1, args.repeats // 4))
+        print(f"{k:>10} {times['sequential']*1e3:>16.3f} {times['batched']*1e3:>13.3f} "
+              f"{times['sequential']/times['batched']:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/fastslam.py
+"""
+Cost and accuracy of the FastSLAM particle filters against the EKF as
+the particle count and the map size grow.
+
+The robot drives a closed loop (a circle, laps times) through a
+generated world with a constant landmark density, so the map grows with
+the loop while the landmarks visible per frame stay roughly fixed, and
+the second lap closes the loop. Each row is one backend on one map:
+mean predict + correct time per frame, position RMSE along the run and
+landmark RMSE at the end, averaged over --repeats drives (world and
+odometry seeds seed, seed + 1, ...; the particle filters take the
+repeat index as their seed). The run fails if, for a version and map, the mean pose
+or map error of a particle count exceeds --tolerance times that of the
+previous (smaller) count: more particles must not make the filter worse.
+
+Run from the repository root:
+    python -m benchmarks.fastslam --landmarks 100 400 --particles 10 100 300
+"""
+import argparse
+import functools
+import math
+import time
+import numpy as np
+from benchmarks.common import frame_noise, simulate
+from fastslam import FastSLAM
+from filters import make_filter
+
+def run(make, start, true, odom, frames, dt, landmarks):
+    ekf = make(start)
+    errors = np.empty(len(frames))
+    t0 = time.perf_counter()
+    for i, frame in enumerate(frames):
+        ekf.predict(odom[i, 0], odom[i, 1], dt)
+        ekf.correct(frame)
+        x, y, _ = ekf.pose
+        errors[i] = math.hypot(x - true[i, 0], y - true[i, 1])
+    elapsed = (time.perf_counter() - t0) / len(frames)
+    ids, means, _ = ekf.landmark_marginals()
+    truth = np.array([landmarks[i] for i in ids]).reshape(-1, 2)
+    landmark_rmse = math.sqrt(np.mean(np.sum((means - truth) ** 2, axis=1))) if ids else math.nan
+    return elapsed, math.sqrt(np.mean(errors ** 2)), landmark_rmse
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--landmarks", type=int, nargs="+", default=[100, 400], help="Landmarks in the world")
+    parser.add_argument("--particles", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--versions", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--density", type=float, default=0.1, help="Landmarks per square meter")
+    parser.add_argument("--speed", type=float, default=1.0, help="m/s")
+    parser.add_argument("--dt", type=float, default=0.1)
+    parser.add_argument("--laps", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=4, help="Drives averaged per row")
+    parser.add_argument("--tolerance", type=float, default=1.1,
+                        help="Allowed error ratio between consecutive particle counts")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'landmarks':>10} {'backend':>16} {'ms/frame':>10} {'pose RMSE (m)':>14} {'map RMSE (m)':>13}")
+    for n in args.landmarks:
+        drives = [simulate(n, args.density, args.speed, args.dt, args.laps, np.random.default_rng(seed), seed)
+                  for seed in range(args.seed, args.seed + args.repeats)]
+        noise = frame_noise(args.dt)
+        backends = [("ekf", None, functools.partial(make_filter, backend="ekf", motion_noise=noise))]
+        for version in args.versions:
+            for m in args.particles:
+                backends.append((f"fastslam{version} M={m}", version,
+                                 functools.partial(FastSLAM, motion_noise=noise, version=version, num_particles=m)))
+        previous = {}  # version -> (name, pose RMSE, map RMSE) of the previous particle count
+        for name, version, make in backends:
+            results = []
+            for repeat, (landmarks, start, true, odom, frames) in enumerate(drives):
+                seeded = make if version is None else functools.partial(make, seed=repeat)
+                results.append(run(seeded, start, true, odom, frames, args.dt, landmarks))
+            per_frame, pose_rmse, map_rmse = np.mean(results, axis=0)
+            print(f"{len(landmarks):>10} {name:>16} {per_frame * 1e3:>10.3f} {pose_rmse:>14.3f} {map_rmse:>13.3f}")
+            if version is None:
+                continue
+            if version in previous:
+                smaller, *bounds = previous[version]
+                for label, error, bound in zip(("pose", "map"), (pose_rmse, map_rmse), bounds):
+                    if error > args.tolerance * bound:
+                        failures.append(f"{len(landmarks)} landmarks, {smaller} -> {name}: {label} RMSE "
+                                        f"{bound:.3f} -> {error:.3f} m")
+            previous[version] = name, pose_rmse, map_rmse
+    if failures:
+        raise SystemExit("Error grows with the particle count: " + "; ".join(failures))
+
+if __name__ == "__main__":
+    main()
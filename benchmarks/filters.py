@@ -0,0 +1,122 @@
+# benchmarks/filters.py
+"""
+Throughput and numerical drift of the EKF-SLAM backends in filters.py
+over a long run.
+
+The robot drives a circle inside a ring of landmarks; noisy odometry and
+range/bearing measurements are generated in NumPy chunks with a fixed
+seed, so every backend filters exactly the same data. At each checkpoint
+the covariance is checked for asymmetry (max |P - P^T|) and for loss of
+positive-definiteness (smallest eigenvalue), next to the pose RMSE and
+the mean pose NEES (3 for a consistent filter) since the last checkpoint.
+
+Run from the repository root (the default 10^6 steps takes minutes per
+backend):
+    python -m benchmarks.filters --steps 1000000 --backends ekf joseph sqrt eif
+"""
+import argparse
+import math
+import time
+import numpy as np
+from config import ODOM_STD, RANGE_STD, BEARING_STD, WHEEL_BASE, SIM_DT
+from filters import FILTERS, make_filter
+from geometry import normalize_angle
+
+def make_world(num_landmarks, radius):
+    """Landmarks on a ring around the origin"""
+    angles = np.linspace(0, 2 * math.pi, num_landmarks, endpoint=False)
+    return np.stack([radius * np.cos(angles), radius * np.sin(angles)], axis=1)
+
+def simulate_chunk(pose, n, v, w, dt, landmarks, sensor_range, rng):
+    """
+    True poses, noisy odometry and measurements for n steps from `pose`.
+    Returns (true (n, 3), odometry (n, 2), per-step lists of (lm_id, z)).
+    """
+    theta = pose[2] + w * dt * np.arange(1, n + 1)
+    true = np.empty((n, 3))
+    true[:, 0] = pose[0] + np.cumsum(v * dt * np.cos(theta - w * dt))
+    true[:, 1] = pose[1] + np.cumsum(v * dt * np.sin(theta - w * dt))
+    true[:, 2] = theta
+    # Independent wheel-speed noise, as in the simulator
+    v_l = v - w * WHEEL_BASE / 2 + rng.normal(0, ODOM_STD, n)
+    v_r = v + w * WHEEL_BASE / 2 + rng.normal(0, ODOM_STD, n)
+    odom = np.stack([(v_l + v_r) / 2, (v_r - v_l) / WHEEL_BASE], axis=1)
+
+    dx = landmarks[None, :, 0] - true[:, None, 0]
+    dy = landmarks[None, :, 1] - true[:, None, 1]
+    r = np.hypot(dx, dy) + rng.normal(0, RANGE_STD, dx.shape)
+    b = normalize_angle(np.arctan2(dy, dx) - true[:, None, 2] + rng.normal(0, BEARING_STD, dx.shape))
+    visible = np.hypot(dx, dy) <= sensor_range
+    frames = [[(f"L{j}", (r[i, j], b[i, j])) for j in np.flatnonzero(visible[i])] for i in range(n)]
+    return true, odom, frames
+
+def run(backend, steps, checkpoints, args):
+    """Filter `steps` steps with one backend; returns elapsed seconds and per-checkpoint rows"""
+    rng = np.random.default_rng(args.seed)
+    landmarks = make_world(args.landmarks, args.radius)
+    pose = np.array([args.radius / 2, 0.0, math.pi / 2])
+    v, w = args.speed, args.speed / (args.radius / 2)
+    ekf = make_filter(tuple(pose), backend, update_mode=args.update_mode)
+
+    rows, elapsed = [], 0.0
+    sq_error = nees = 0.0
+    done = since = 0
+    marks = iter(checkpoints)
+    mark = next(marks)
+    while done < steps:
+        n = min(args.chunk, mark - done)
+        true, odom, frames = simulate_chunk(pose, n, v, w, SIM_DT, landmarks, args.sensor_range, rng)
+        pose = true[-1]
+        est = np.empty((n, 3))
+        pose_cov = np.empty((n, 3, 3))
+        start = time.perf_counter()
+        for i in range(n):
+            ekf.predict(odom[i, 0], odom[i, 1], SIM_DT)
+            ekf.correct(frames[i])
+            est[i] = ekf.pose
+            pose_cov[i] = ekf.pose_covariance()
+        elapsed += time.perf_counter() - start
+
+        e = true - est
+        e[:, 2] = normalize_angle(e[:, 2])
+        sq_error += np.sum(e[:, 0]**2 + e[:, 1]**2)
+        nees += np.sum(e * np.linalg.solve(pose_cov, e[:, :, None])[:, :, 0])
+        done += n
+        since += n
+        if done == mark:
+            P = ekf.P
+            rows.append((done, np.abs(P - P.T).max(), np.linalg.eigvalsh((P + P.T) / 2).min(),
+                         math.sqrt(sq_error / since), nees / since))
+            sq_error = nees = 0.0
+            since = 0
+            mark = next(marks, steps)
+    return elapsed, rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=1_000_000)
+    parser.add_argument("--checkpoints", type=int, default=10, help="Drift reports per run")
+    parser.add_argument("--backends", nargs="+", choices=list(FILTERS), default=list(FILTERS))
+    parser.add_argument("--update-mode", choices=["sequential", "batched"], default="batched")
+    parser.add_argument("--landmarks", type=int, default=12)
+    parser.add_argument("--radius", type=float, default=6.0, help="Landmark ring radius (m)")
+    parser.add_argument("--sensor-range", type=float, default=5.0)
+    parser.add_argument("--speed", type=float, default=0.5, help="Forward speed (m/s)")
+    parser.add_argument("--chunk", type=int, default=10_000, help="Steps simulated per NumPy chunk")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    checkpoints = sorted({max(1, args.steps * (k + 1) // args.checkpoints) for k in range(args.checkpoints)})
+    print(f"{'backend':>8} {'step':>9} {'max|P-P^T|':>11} {'min eig(P)':>11} {'RMSE (m)':>9} {'NEES':>7}")
+    summary = []
+    for backend in args.backends:
+        elapsed, rows = run(backend, args.steps, checkpoints, args)
+        for step, asym, min_eig, rmse, nees in rows:
+            print(f"{backend:>8} {step:>9} {asym:>11.2e} {min_eig:>11.2e} {rmse:>9.4f} {nees:>7.2f}")
+        summary.append((backend, elapsed))
+    print()
+    for backend, elapsed in summary:
+        print(f"{backend:>8}: {args.steps / elapsed:>8.0f} steps/s ({elapsed:.1f} s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/overlay.py
+"""
+Per-frame cost of the covariance-ellipse overlay vs. map size: one
+eigendecomposition and outline per landmark in a Python loop (the
+straightforward way) against CovarianceOverlay's batched eigh with cached
+outlines. Each frame a handful of landmark blocks change, as they do when
+the robot observes its neighbourhood, and every ellipse is drawn.
+
+Runs headless through SDL's dummy video driver. Run from the repository root:
+    python -m benchmarks.overlay --landmarks 100 1000 5000
+"""
+import argparse
+import os
+import time
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import numpy as np
+import pygame
+from config import *
+from camera import Camera
+from filters import make_filter
+from overlays import CovarianceOverlay
+
+def draw_naive(screen, camera, ekf, sigma=ELLIPSE_SIGMA, segments=ELLIPSE_SEGMENTS):
+    t = np.linspace(0.0, 2 * np.pi, segments, endpoint=False)
+    circle = np.stack([np.cos(t), np.sin(t)])
+    for lm_id in ekf.landmark_ids:
+        idx = ekf.landmark_index[lm_id]
+        values, vectors = np.linalg.eig(ekf.covariance([idx, idx + 1]))
+        outline = vectors @ (sigma * np.sqrt(np.abs(values))[:, None] * circle)
+        x, y = ekf.landmark_estimate(lm_id)
+        points = [camera.to_screen(x + dx, y + dy) for dx, dy in outline.T]
+        pygame.draw.lines(screen, PURPLE, True, points, 1)
+
+def make_map(n, side, rng):
+    """An EKF holding n landmarks scattered over a side x side world"""
+    ekf = make_filter((side / 2, side / 2, 0.0), "ekf", capacity=n)
+    for i in range(n):
+        ekf._register_landmark(f"L{i}")
+    ekf.X[3:, 0] = rng.uniform(0, side, 2 * n)
+    sd = rng.uniform(0.02, 0.3, 2 * n)
+    ekf.P[3:, 3:] = np.diag(sd ** 2)
+    return ekf
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--landmarks", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--changed", type=int, default=10, help="Landmark blocks changed per frame")
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    rng = np.random.default_rng(0)
+
+    print(f"{'landmarks':>10} {'per-landmark (ms)':>18} {'batched (ms)':>13} {'recomputed':>11} {'speedup':>8}")
+    for n in args.landmarks:
+        side = np.sqrt(n / 0.05)
+        ekf = make_map(n, side, rng)
+        camera = Camera(center=(side / 2, side / 2), scale=SCREEN_HEIGHT / side, min_scale=0.0)
+        overlay = CovarianceOverlay()
+        changes = rng.integers(0, n, size=(args.frames, args.changed))
+
+        def perturb(frame):
+            for j in changes[frame]:
+                ekf.P[3 + 2 * j:5 + 2 * j, 3 + 2 * j:5 + 2 * j] *= 0.8
+
+        start = time.perf_counter()
+        for frame in range(args.frames):
+            perturb(frame)
+            draw_naive(screen, camera, ekf)
+        naive = (time.perf_counter() - start) / args.frames
+
+        overlay.update(ekf)  # First build of every outline, not timed
+        start = time.perf_counter()
+        recomputed = 0
+        for frame in range(args.frames):
+            perturb(frame)
+            overlay.update(ekf)
+            overlay.draw(screen, camera)
+            recomputed += overlay.recomputed
+        batched = (time.perf_counter() - start) / args.frames
+
+        print(f"{n:>10} {naive*1e3:>18.3f} {batched*1e3:>13.3f} {recomputed / args.frames:>11.1f} {naive/batched:>7.1f}x")
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/posegraph.py
+"""
+Offline smoothing with the sparse pose graph against filtering with the
+EKF as the trajectory grows.
+
+The same world is looped an increasing number of times (the drive from
+benchmarks/fastslam.py), so the trajectory grows while the map stays
+fixed; with --grow-map the world grows with the trajectory instead. For
+each length: total EKF time and the graph's build + solve time (solved
+every --incremental frames while it is built, then to convergence),
+final solver iterations, and the position RMSE of both along the run.
+
+Run from the repository root:
+    python -m benchmarks.posegraph --laps 1 2 4 --landmarks 200
+"""
+import argparse
+import math
+import time
+import numpy as np
+from config import POSEGRAPH_INCREMENTAL, POSEGRAPH_INCREMENTAL_ITERATIONS
+from benchmarks.common import frame_noise, simulate
+from filters import make_filter
+from posegraph import PoseGraph
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--laps", type=float, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--landmarks", type=int, default=200, help="Landmarks in the world (per lap with --grow-map)")
+    parser.add_argument("--grow-map", action="store_true", help="Scale the world with the trajectory length")
+    parser.add_argument("--density", type=float, default=0.1, help="Landmarks per square meter")
+    parser.add_argument("--speed", type=float, default=1.0, help="m/s")
+    parser.add_argument("--dt", type=float, default=0.1)
+    parser.add_argument("--method", choices=["lm", "gn"], default="lm")
+    parser.add_argument("--solver", choices=["direct", "cg"], default="direct")
+    parser.add_argument("--incremental", type=int, default=POSEGRAPH_INCREMENTAL, help="Frames between solves (0: batch)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'laps':>5} {'poses':>7} {'lms':>5} {'meas':>7} {'EKF (s)':>8} {'EKF RMSE':>9} "
+          f"{'graph (s)':>10} {'iters':>6} {'graph RMSE':>11} {'us/pose':>8}")
+    for laps in args.laps:
+        rng = np.random.default_rng(args.seed)
+        n = int(args.landmarks * laps) if args.grow_map else args.landmarks
+        landmarks, start, true, odom, frames = simulate(n, args.density, args.speed, args.dt,
+                                                        1.0 if args.grow_map else laps, rng, args.seed)
+
+        noise = frame_noise(args.dt)
+        ekf = make_filter(start, "ekf", motion_noise=noise)
+        est = np.empty((len(frames), 3))
+        t0 = time.perf_counter()
+        for i, frame in enumerate(frames):
+            ekf.predict(odom[i, 0], odom[i, 1], args.dt)
+            ekf.correct(frame)
+            est[i] = ekf.pose
+        ekf_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        graph = PoseGraph(start, motion_noise=noise)
+        for i, frame in enumerate(frames):
+            graph.add_frame(odom[i, 0], odom[i, 1], args.dt, frame)
+            if args.incremental and (i + 1) % args.incremental == 0:
+                graph.optimize(POSEGRAPH_INCREMENTAL_ITERATIONS, method=args.method, solver=args.solver)
+        stats = graph.optimize(method=args.method, solver=args.solver)
+        graph_time = time.perf_counter() - t0
+
+        rmse = [math.sqrt(np.mean(np.sum((poses[:, :2] - true[:, :2]) ** 2, axis=1)))
+                for poses in (est, graph.poses[1:])]
+        print(f"{laps:>5g} {len(frames):>7} {graph.num_landmarks:>5} {len(graph.meas_z):>7} {ekf_time:>8.2f} "
+              f"{rmse[0]:>9.3f} {graph_time:>10.2f} {stats.iterations:>6} {rmse[1]:>11.3f} "
+              f"{graph_time / len(frames) * 1e6:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# benchmarks/render.py
+"""
+Per-frame cost of the static map content (background, grid, landmark
+sprites and labels, sensor bubble): redrawn from scratch every frame vs.
+blitted from LayeredRenderer's cached layers; of the robot trails after
+N points: whole paths redrawn vs. TrailLayer's incremental drawing; and,
+for large worlds seen through a zoomed-in camera, of rebuilding the map
+layer with every landmark drawn vs. only the ones the camera culls in.
+
+Runs headless through SDL's dummy video driver. Run from the repository root:
+    python -m benchmarks.render --landmarks 5 100 1000 --trail-points 1000 10000 100000 \
+        --world-landmarks 1000 10000 100000
+"""
+import argparse
+import os
+import time
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import numpy as np
+import pygame
+from config import *
+from utils import world_to_screen, create_landmark_sprite
+from renderer import LayeredRenderer
+from camera import Camera
+from trails import Trail, TrailLayer
+
+def draw_uncached(screen, landmarks, sprites, default_sprite, font, robot):
+    """The original main.py drawing path"""
+    screen.fill(BG_COLOR)
+    for x in range(0, int(WORLD_WIDTH * SCALE), SCALE):
+        pygame.draw.line(screen, GRID_COLOR, (x, 0), (x, SCREEN_HEIGHT))
+    for y in range(0, SCREEN_HEIGHT, SCALE):
+        pygame.draw.line(screen, GRID_COLOR, (0, y), (int(WORLD_WIDTH * SCALE), y))
+    sp = world_to_screen(*robot)
+    s = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+    pygame.draw.circle(s, (255, 255, 255, 10), sp, int(MAX_SENSOR_RANGE*SCALE))
+    pygame.draw.circle(s, (80, 80, 80), sp, int(MAX_SENSOR_RANGE*SCALE), 1)
+    screen.blit(s, (0, 0))
+    for lm_id, (lx, ly) in landmarks.items():
+        pos = world_to_screen(lx, ly)
+        sprite = sprites.get(lm_id, default_sprite)
+        screen.blit(sprite, sprite.get_rect(center=pos))
+        screen.blit(font.render(lm_id, True, TEXT_WHITE), (pos[0]+15, pos[1]-20))
+
+def draw_cached(screen, renderer, robot):
+    renderer.draw_static(screen)
+    renderer.draw_sensor_range(screen, *robot, MAX_SENSOR_RANGE)
+
+def random_walk(n, rng):
+    """A smooth n-point path wandering inside the room"""
+    heading = np.cumsum(rng.normal(0, 0.2, n))
+    xy = np.cumsum(np.stack([np.cos(heading), np.sin(heading)], axis=1) * 0.05, axis=0)
+    size = np.array([WORLD_WIDTH, WORLD_HEIGHT])
+    return np.abs((xy + size / 2) % (2 * size) - size)  # Reflect off the walls
+
+def bench_trails(screen, background, n, frames, rng):
+    """Per-frame trail cost once n points exist, appending one point per frame"""
+    path = random_walk(n + frames, rng)
+
+    points = [tuple(p) for p in path[:n]]
+    start = time.perf_counter()
+    for p in path[n:]:
+        points.append(tuple(p))
+        screen.blit(background, (0, 0))
+        pygame.draw.lines(screen, GREEN, False, [world_to_screen(*q) for q in points], 3)
+    full = (time.perf_counter() - start) / frames
+
+    trail = Trail(capacity=n + frames, min_distance=0.0)
+    layer = TrailLayer([(trail, GREEN, 3)], Camera())
+    for x, y in path[:n]:
+        trail.append(x, y)
+    layer.draw(screen, background)
+    start = time.perf_counter()
+    for x, y in path[n:]:
+        trail.append(x, y)
+        layer.draw(screen, background)
+    incremental = (time.perf_counter() - start) / frames
+    return full, incremental
+
+def bench_culling(screen, n, frames, font, sprites, default_sprite, rng):
+    """Per-frame map layer rebuild for n landmarks in a square world, camera panning over it"""
+    side = np.sqrt(n / 0.05)  # 0.05 landmarks per square meter
+    xy = rng.uniform(0, side, size=(n, 2))
+    landmarks = {f"L{i}": (float(x), float(y)) for i, (x, y) in enumerate(xy)}
+    camera = Camera()
+    path = side / 2 + np.cumsum(rng.normal(0, 0.5, size=(frames, 2)), axis=0)
+
+    start = time.perf_counter()
+    for x, y in path:
+        camera.look_at(x, y)
+        screen.fill(BG_COLOR)
+        for lm_id, (lx, ly) in landmarks.items():
+            pos = camera.to_screen(lx, ly)
+            sprite = sprites.get(lm_id, default_sprite)
+            screen.blit(sprite, sprite.get_rect(center=pos))
+            screen.blit(font.render(lm_id, True, TEXT_WHITE), (pos[0]+15, pos[1]-20))
+    unculled = (time.perf_counter() - start) / frames
+
+    renderer = LayeredRenderer(landmarks, sprites, font, camera)
+    start = time.perf_counter()
+    for x, y in path:
+        camera.look_at(x, y)  # A new view every frame: the static layer is rebuilt each time
+        renderer.draw_static(screen)
+    culled = (time.perf_counter() - start) / frames
+    return unculled, culled
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--landmarks", type=int, nargs="+", default=[5, 100, 1000])
+    parser.add_argument("--trail-points", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--world-landmarks", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    font = pygame.font.SysFont('Consolas', 14)
+    sprites = {}
+    default_sprite = create_landmark_sprite((220, 20, 60), 24, "circle")
+    rng = np.random.default_rng(0)
+
+    print(f"{'landmarks':>10} {'uncached (ms)':>14} {'cached (ms)':>12} {'speedup':>8}")
+    for n in args.landmarks:
+        xy = rng.uniform((0, 0), (WORLD_WIDTH, WORLD_HEIGHT), size=(n, 2))
+        landmarks = {f"L{i}": (float(x), float(y)) for i, (x, y) in enumerate(xy)}
+        renderer = LayeredRenderer(landmarks, sprites, font)
+        robots = rng.uniform((0, 0), (WORLD_WIDTH, WORLD_HEIGHT), size=(args.frames, 2))
+
+        start = time.perf_counter()
+        for robot in robots:
+            draw_uncached(screen, landmarks, sprites, default_sprite, font, robot)
+        uncached = (time.perf_counter() - start) / args.frames
+
+        start = time.perf_counter()
+        for robot in robots:
+            draw_cached(screen, renderer, robot)
+        cached = (time.perf_counter() - start) / args.frames
+
+        print(f"{n:>10} {uncached*1e3:>14.3f} {cached*1e3:>12.3f} {uncached/cached:>7.1f}x")
+
+    background = renderer.static_layer(screen)
+    print(f"\n{'trail pts':>10} {'full (ms)':>14} {'incr. (ms)':>12} {'speedup':>8}")
+    for n in args.trail_points:
+        full, incremental = bench_trails(screen, background, n, args.frames, rng)
+        print(f"{n:>10} {full*1e3:>14.3f} {incremental*1e3:>12.3f} {full/incremental:>7.1f}x")
+
+    print(f"\n{'world lms':>10} {'all (ms)':>14} {'culled (ms)':>12} {'speedup':>8}")
+    for n in args.world_landmarks:
+        unculled, culled = bench_culling(screen, n, max(1, args.frames // 10), font, sprites, default_sprite, rng)
+        print(f"{n:>10} {unculled*1e3:>14.3f} {culled*1e3:>12.3f} {unculled/culled:>7.1f}x")
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/submap.py
+"""
+Per-frame filter cost as the mapped area grows: one global EKF against
+the submap EKF (bounded local map, see submap.py).
+
+The robot drives a straight line through a generated world with a
+constant landmark density, so the number of mapped landmarks grows
+linearly with distance while the number visible per frame stays fixed.
+Each row is the mean predict + correct time over the last stretch.
+
+Run from the repository root:
+    python -m benchmarks.submap --distance 1000 --density 0.05
+"""
+import argparse
+import math
+import time
+import numpy as np
+from config import MAX_SENSOR_RANGE, ODOM_STD, RANGE_STD, BEARING_STD, WHEEL_BASE
+from benchmarks.common import frame_noise
+from filters import make_filter
+from geometry import normalize_angle
+from world import generate_world
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--distance", type=float, default=1000.0, help="Length of the drive (m)")
+    parser.add_argument("--density", type=float, default=0.05, help="Landmarks per square meter")
+    parser.add_argument("--speed", type=float, default=1.0, help="m/s")
+    parser.add_argument("--dt", type=float, default=0.1)
+    parser.add_argument("--rows", type=int, default=10, help="Report rows along the drive")
+    parser.add_argument("--backends", nargs="+", default=["ekf", "submap"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    margin = 2 * MAX_SENSOR_RANGE
+    world = generate_world(args.distance + 2 * margin, 2 * margin, density=args.density, num_goals=0, seed=args.seed)
+    ids = list(world["landmarks"])
+    xy = np.array([world["landmarks"][i] for i in ids])
+
+    # Straight drive along y = margin with noisy wheel odometry and range/bearing measurements
+    rng = np.random.default_rng(args.seed)
+    steps = int(args.distance / (args.speed * args.dt))
+    true = np.zeros((steps, 3))
+    true[:, 0] = margin + args.speed * args.dt * np.arange(1, steps + 1)
+    true[:, 1] = margin
+    v_l = args.speed + rng.normal(0, ODOM_STD, steps)
+    v_r = args.speed + rng.normal(0, ODOM_STD, steps)
+    odom = np.stack([(v_l + v_r) / 2, (v_r - v_l) / WHEEL_BASE], axis=1)
+    frames = []
+    for x, y, theta in true:
+        d = np.hypot(xy[:, 0] - x, xy[:, 1] - y)
+        frame = []
+        for j in np.flatnonzero(d <= MAX_SENSOR_RANGE):
+            bearing = math.atan2(xy[j, 1] - y, xy[j, 0] - x) - theta
+            frame.append((ids[j], (d[j] + rng.normal(0, RANGE_STD), normalize_angle(bearing + rng.normal(0, BEARING_STD)))))
+        frames.append(frame)
+
+    bounds = np.linspace(0, steps, args.rows + 1).astype(int)
+    results = {}
+    for backend in args.backends:
+        ekf = make_filter((margin, margin, 0.0), backend, motion_noise=frame_noise(args.dt))
+        rows = []
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            start = time.perf_counter()
+            for i in range(lo, hi):
+                ekf.predict(odom[i, 0], odom[i, 1], args.dt)
+                ekf.correct(frames[i])
+            elapsed = time.perf_counter() - start
+            x, y, _ = ekf.pose
+            rows.append((ekf.num_landmarks, ekf.state_size, elapsed / max(1, hi - lo),
+                         math.hypot(x - true[hi - 1, 0], y - true[hi - 1, 1])))
+        results[backend] = rows
+
+    print(f"{'distance (m)':>12} {'meas/frame':>10}" + "".join(
+        f" {b + ' lms':>11} {b + ' state':>12} {b + ' ms':>10} {b + ' err (m)':>13}" for b in args.backends))
+    for r, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+        meas = sum(len(f) for f in frames[lo:hi]) / max(1, hi - lo)
+        line = f"{hi * args.speed * args.dt:>12.0f} {meas:>10.1f}"
+        for backend in args.backends:
+            lms, size, per_frame, err = results[backend][r]
+            line += f" {lms:>11} {size:>12} {per_frame * 1e3:>10.3f} {err:>13.3f}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
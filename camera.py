@@ -0,0 +1,98 @@
+# camera.py
+import numpy as np
+from config import *
+
+class Camera:
+    """
+    Viewport onto the world: the world point shown at the centre of the
+    map area, the zoom in pixels per meter and the map area size in pixels.
+    The default camera reproduces the fixed utils.world_to_screen mapping.
+
+    Transforms work on single points or on (N, 2) NumPy arrays, and the
+    visibility tests cull points and segments against the viewport in one
+    vectorized pass. `key` changes whenever the view does, so cached layers
+    know when to rebuild. Following the robot uses a dead zone: the view
+    only re-centres when the target leaves the inner part of the viewport,
+    which keeps those rebuilds rare.
+    """
+
+    def __init__(self, viewport=(int(WORLD_WIDTH * SCALE), SCREEN_HEIGHT), center=(WORLD_WIDTH / 2, WORLD_HEIGHT / 2),
+                 scale=SCALE, min_scale=CAMERA_MIN_SCALE, max_scale=CAMERA_MAX_SCALE,
+                 follow_margin=CAMERA_FOLLOW_MARGIN):
+        self.width, self.height = viewport
+        self.cx, self.cy = center
+        self.scale = scale
+        self.min_scale, self.max_scale = min_scale, max_scale
+        self.follow_margin = follow_margin
+        self.following = False
+
+    @property
+    def key(self):
+        return (self.cx, self.cy, self.scale, self.width, self.height)
+
+    def to_screen(self, x, y):
+        """World meters -> map pixels"""
+        return (int((x - self.cx) * self.scale + self.width / 2),
+                int(self.height / 2 - (y - self.cy) * self.scale))
+
+    def to_screen_array(self, xy):
+        """(N, 2) world points -> (N, 2) integer pixels"""
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        px = np.empty(xy.shape, dtype=int)
+        px[:, 0] = (xy[:, 0] - self.cx) * self.scale + self.width / 2
+        px[:, 1] = self.height / 2 - (xy[:, 1] - self.cy) * self.scale
+        return px
+
+    def to_world(self, px, py):
+        return (self.cx + (px - self.width / 2) / self.scale,
+                self.cy - (py - self.height / 2) / self.scale)
+
+    def bounds(self, margin=0):
+        """(xmin, ymin, xmax, ymax) of the visible world, grown by `margin` pixels"""
+        half_w = (self.width / 2 + margin) / self.scale
+        half_h = (self.height / 2 + margin) / self.scale
+        return self.cx - half_w, self.cy - half_h, self.cx + half_w, self.cy + half_h
+
+    def visible(self, xy, margin=0):
+        """Mask of the (N, 2) world points within `margin` pixels of the viewport"""
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        xmin, ymin, xmax, ymax = self.bounds(margin)
+        return (xy[:, 0] >= xmin) & (xy[:, 0] <= xmax) & (xy[:, 1] >= ymin) & (xy[:, 1] <= ymax)
+
+    def segments_visible(self, start, end, margin=0):
+        """Mask of the world segments start[i] -> end[i] whose bounding box overlaps the viewport"""
+        start = np.asarray(start, dtype=float).reshape(-1, 2)
+        end = np.asarray(end, dtype=float).reshape(-1, 2)
+        xmin, ymin, xmax, ymax = self.bounds(margin)
+        return ((np.maximum(start[:, 0], end[:, 0]) >= xmin) & (np.minimum(start[:, 0], end[:, 0]) <= xmax) &
+                (np.maximum(start[:, 1], end[:, 1]) >= ymin) & (np.minimum(start[:, 1], end[:, 1]) <= ymax))
+
+    def set_viewport(self, width, height):
+        self.width, self.height = width, height
+
+    def pan(self, dx, dy):
+        """Move the view by (dx, dy) pixels; stops following"""
+        self.cx -= dx / self.scale
+        self.cy += dy / self.scale
+        self.following = False
+
+    def zoom(self, factor, anchor=None):
+        """Zoom by `factor`, keeping the world point under the `anchor` pixel (default: centre) in place"""
+        scale = min(max(self.scale * factor, self.min_scale), self.max_scale)
+        if anchor is not None and not self.following:
+            wx, wy = self.to_world(*anchor)
+            self.cx = wx - (anchor[0] - self.width / 2) / scale
+            self.cy = wy + (anchor[1] - self.height / 2) / scale
+        self.scale = scale
+
+    def look_at(self, x, y):
+        self.cx, self.cy = x, y
+
+    def follow(self, x, y):
+        """While following, re-centre on (x, y) once it leaves the dead zone"""
+        if not self.following:
+            return
+        px, py = self.to_screen(x, y)
+        mx, my = self.width * self.follow_margin, self.height * self.follow_margin
+        if not (mx <= px <= self.width - mx and my <= py <= self.height - my):
+            self.look_at(x, y)
@@ -28,6 +28,31 @@ ORANGE = (255, 165, 0)
 PURPLE = (180, 80, 255)
 CYAN = (0, 255, 255)
 
+# Rendering
+ROOM_BACKGROUND = False  # Tiled floor from assets.create_room_background instead of BG_COLOR
+TRAIL_CAPACITY = 20000  # Points kept per trail (ring buffer)
+TRAIL_MIN_DISTANCE = 0.02  # Trail points closer than this (m) to the previous one are dropped
+TEXT_CACHE_SIZE = 512  # Rendered text surfaces kept by the dashboard's LRU cache
+TELEMETRY_CAPACITY = 4096  # Samples kept per telemetry series
+
+# Run logs
+RECORDER_CHUNK = 4096  # Records buffered in memory before each append to the log files
+OFFLINE_CHUNK = 65536  # Frames converted per chunk by the offline processor
+
+# Pose-graph smoothing (posegraph.py)
+POSEGRAPH_PRIOR_STD = 1e-3       # Anchor of the first pose
+POSEGRAPH_ITERATIONS = 50
+POSEGRAPH_INCREMENTAL = 250     # Frames between solves while the graph is built (0: one batch solve)
+POSEGRAPH_INCREMENTAL_ITERATIONS = 3  # Per incremental solve
+POSEGRAPH_TOLERANCE = 1e-6       # Stop once the relative cost decrease is below this
+POSEGRAPH_RELINEARIZE = 0.01     # Variable change (m / rad) that triggers relinearizing its factors
+POSEGRAPH_INITIAL_LAMBDA = 1e-4  # Levenberg-Marquardt damping
+POSEGRAPH_MIN_LAMBDA = 1e-9
+POSEGRAPH_MAX_LAMBDA = 1e9
+POSEGRAPH_SMALL_MAP = 50         # Landmarks up to which the poses are eliminated in time order
+POSEGRAPH_CG_TOLERANCE = 1e-8
+POSEGRAPH_CG_ITERATIONS = 2000
+
 # Robot parameters
 WHEEL_BASE = 0.5
 MAX_SPEED = 1.0
@@ -42,19 +67,98 @@ GOAL_THRESHOLD = 0.2
 
 # Sensor parameters
 MAX_SENSOR_RANGE = 5.0
+GRID_CELL_SIZE = 5.0  # Cell size (m) of the landmark spatial index, ~ the usual query radius
+
+# Data association (anonymous landmarks)
+ANONYMOUS_LANDMARKS = False  # Hide landmark ids from the EKF and associate measurements instead
+CLUTTER_RATE = 0.0  # Mean number of spurious returns per scan (Poisson)
+ASSOCIATION_GATE_PROB = 0.99  # Chi-square gate for a measurement/landmark pairing
+NEW_LANDMARK_GATE_PROB = 0.9999  # Beyond this gate for every landmark, start a new one
+ASSOCIATION_RADIUS = 2.0  # Search radius (m) around a projected measurement
+ASSOCIATION_AMBIGUITY_RATIO = 4.0  # A pairing's d2 must be this many times smaller than any rival's (inf: no rivals)
+JOINT_COMPATIBILITY = False  # JCBC instead of greedy nearest neighbour
+LANDMARK_CONFIRM_HITS = 10  # Sightings needed to keep a new landmark...
+LANDMARK_CONFIRM_WINDOW = 15  # ...within this many frames
+ASSOCIATION_CONSISTENCY_FRAMES = 3  # Consecutive frames a confirmed landmark must be paired in to correct the EKF
 RANGE_STD = 0.1
 BEARING_STD = 0.02
 
+# World layout
+LANDMARKS = {
+    "A": (0.0, 0.0), "B": (10.0, 0.0), "C": (4.0, 3.0),
+    "D": (8.0, 5.0), "E": (2.0, 7.0)
+}
+GOALS = [(0, 2), (8, 4), (9, 7)]
+
+# Simulation timing
+SIM_DT = 1.0 / 60.0  # Fixed physics/filter timestep (seconds)
+MAX_FRAME_TIME = 0.25  # Cap on wall-clock time consumed per rendered frame
+# Multirate scheduling (main.py, simulator.py --multirate); rates are rounded to whole physics ticks
+PHYSICS_RATE = 200  # Hz: true dynamics and odometry integration
+CONTROL_RATE = 50   # Hz: waypoint controller / obstacle avoidance
+SENSOR_RATE = 50    # Hz: EKF prediction over the integrated odometry + measurement update
+TRAIL_RATE = 12     # Hz: trail samples (simulated time)
+DISPLAY_FPS = 60
+MAX_FRAME_SKIP = 5  # Rendered frames that may be skipped in a row when the loop falls behind
+
+# Camera (main.py): arrows / mouse drag pan, +/- / wheel zoom, F follows the robot, R resets
+CAMERA_MIN_SCALE = 1.0    # Pixels per meter, zoomed out
+CAMERA_MAX_SCALE = 400.0  # Pixels per meter, zoomed in
+CAMERA_FOLLOW_MARGIN = 0.25  # Following re-centres once the robot is this close (fraction of the view) to an edge
+CAMERA_PAN_STEP = 40      # Pixels per arrow key press
+CAMERA_ZOOM_STEP = 1.25
+
+# Covariance overlay (main.py, C toggles it)
+ELLIPSE_SIGMA = 2.0        # Ellipse radius in standard deviations
+ELLIPSE_SEGMENTS = 32      # Polygon vertices per ellipse
+ELLIPSE_TOLERANCE = 0.05   # Relative change of a 2x2 block before its ellipse is recomputed
+
+# Profiling
+PROFILE_WINDOW = 300  # Samples per span the percentiles are computed over
+PROFILE_REFRESH = 15  # Rendered frames between refreshes of the on-screen breakdown
+
 # EKF parameters
-NUM_LANDMARKS = 5
-STATE_SIZE = 3 + 2 * NUM_LANDMARKS
 # In config.py, modify these lines:
 MOTION_NOISE = [0.01, 0.01, 0.005]  # Reduced from [0.05, 0.05, 0.02]
+# MOTION_NOISE is the pose variance added per SIM_DT of prediction; a predict over dt adds
+# MOTION_NOISE * dt / SIM_DT, so changing the sensor/control rates does not retune the filter
 MEAS_NOISE = np.diag([0.05**2, 0.02**2]) * 5.0  # Reduced noise
+INITIAL_POSE_COV = np.diag([0.001, 0.001, 0.001])  # Starting pose covariance, shared by every backend
+UPDATE_MODE = "sequential"  # "sequential" (one update per landmark) or "batched" (one per frame)
+EKF_INITIAL_CAPACITY = 16  # Landmarks preallocated in the EKF state; doubles when full
+FILTER_BACKEND = "ekf"  # "ekf", "joseph", "sqrt" (Cholesky-factor EKF), "eif" (information filter), "submap",
+                        # or "fastslam1" / "fastslam2" (particle filters)
+COVARIANCE_UPDATE = "standard"  # EKF covariance update: "standard" or "joseph"
+# Submap EKF ("submap" backend): the local map holds the landmarks within SUBMAP_RADIUS of the robot
+# and is frozen into the global map every SUBMAP_LENGTH meters. Keep SUBMAP_RADIUS >= SUBMAP_LENGTH +
+# MAX_SENSOR_RANGE + ASSOCIATION_RADIUS so everything observable during a submap is in it.
+SUBMAP_RADIUS = 3 * MAX_SENSOR_RANGE
+SUBMAP_LENGTH = MAX_SENSOR_RANGE
+SUBMAP_BACKEND = "ekf"  # Filter variant of the local maps: "ekf", "joseph", "sqrt" or "eif"
+# Sparse information filter ("eif" backend)
+EIF_ACTIVE_LANDMARKS = 20  # Landmarks kept linked to the robot; the least recently seen are sparsified out
+EIF_MEAN_ITERATIONS = 5  # Conjugate-gradient iterations of the mean recovery per update (None: exact solve)
+# FastSLAM ("fastslam1" / "fastslam2" backends)
+FASTSLAM_PARTICLES = 100
+FASTSLAM_RESAMPLE_THRESHOLD = 0.5  # Resample when the effective sample size drops below this fraction
+FASTSLAM_SEED = 0  # Fixed so runs and replays are repeatable
+# Seconds of measurements that count as one independent observation in the particle weights: each
+# frame's likelihood is raised to the power dt / interval (at most 1), so the weights do not collapse
+# at high sensor rates and keep the same strength whatever the rate. FastSLAM 1.0 samples poses from
+# the motion model and needs sharp weights; 2.0 already draws them from the measurements
+FASTSLAM1_WEIGHT_INTERVAL = 0.1
+FASTSLAM2_WEIGHT_INTERVAL = 3.0
 
 # config.py - Add these parameters
 SAFE_DISTANCE = 1 # Minimum safe distance from obstacles
 AVOIDANCE_GAIN = 2.0  # How strongly to avoid obstacles
 MAX_AVOIDANCE_ANGLE = 0.8  # Maximum steering for avoidance
 STOP_DISTANCE = 0.5  # Stop if too close to obstacle
+COLLISION_RADIUS = 0.25  # Robot-to-landmark distance counted as a collision
+
+# Distance-field costmap (costmap.py)
+COSTMAP_RESOLUTION = 0.05  # Occupancy cell size (m)
+COSTMAP_TRUNCATION = 1.5   # Distances are clipped here; keep >= SAFE_DISTANCE
+COSTMAP_TILE = 64          # Cells per tile side; tiles are computed on first query and cached
+COSTMAP_MAX_TILES = 2048   # Cached tiles kept (least recently used dropped), ~50 KB each
 
@@ -0,0 +1,187 @@
+# costmap.py
+"""
+Truncated Euclidean distance field over point obstacles (landmarks) and
+wall segments, for O(1) obstacle-avoidance lookups.
+
+The world is rasterized into an occupancy grid of COSTMAP_RESOLUTION
+cells, split into square tiles of COSTMAP_TILE cells. A tile's distance
+transform and gradient are computed the first time it is queried, from
+the obstacles within COSTMAP_TRUNCATION of it, and cached; adding or
+removing an obstacle only drops the tiles within reach of it, so changes
+cost a few tiles instead of the whole map. Tiles with nothing in reach
+store nothing, which keeps large sparse worlds cheap.
+
+Uses scipy.ndimage's exact EDT when SciPy is installed and a
+brute-force NumPy transform otherwise.
+"""
+import math
+from collections import OrderedDict
+import numpy as np
+from config import *
+
+try:
+    from scipy import ndimage
+except ImportError:  # SciPy is optional
+    ndimage = None
+
+class DistanceField:
+    """
+    Tiled, lazily computed distance-to-nearest-obstacle field.
+    Obstacles are keyed like landmarks; a point is a single sample and a
+    wall segment is sampled every half cell. Distances are clipped to
+    `truncation`, where the gradient is zero.
+    """
+
+    def __init__(self, resolution=COSTMAP_RESOLUTION, truncation=COSTMAP_TRUNCATION,
+                 tile_size=COSTMAP_TILE, max_tiles=COSTMAP_MAX_TILES):
+        self.resolution = float(resolution)
+        self.truncation = float(truncation)
+        self.tile_size = int(tile_size)
+        self.tile_extent = self.tile_size * self.resolution
+        self.margin = int(math.ceil(self.truncation / self.resolution)) + 1  # Cells of context around a tile
+        self.reach = int(math.ceil(self.margin / self.tile_size))           # Tiles of context around a tile
+        self.max_tiles = max_tiles
+        self.obstacles = {}   # key -> (k, 2) sample points
+        self.bins = {}        # (tx, ty) -> {key: (m, 2) samples of that obstacle in the tile}
+        self.tiles = OrderedDict()  # (tx, ty) -> (distance, gradient) or None when nothing is in reach; LRU
+        self.computed = 0     # Tiles (re)computed so far
+
+    @classmethod
+    def from_world(cls, landmarks, walls=(), **kwargs):
+        """A field over {id: (x, y)} landmarks and ((x0, y0), (x1, y1)) walls"""
+        field = cls(**kwargs)
+        for lm_id, xy in landmarks.items():
+            field.add_point(lm_id, *xy)
+        for i, (a, b) in enumerate(walls):
+            field.add_segment(("wall", i), a, b)
+        return field
+
+    def __len__(self):
+        return len(self.obstacles)
+
+    def __contains__(self, key):
+        return key in self.obstacles
+
+    def add_point(self, key, x, y):
+        self.add(key, np.array([[x, y]], dtype=float))
+
+    def add_segment(self, key, start, end):
+        start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+        count = int(math.ceil(2 * np.hypot(*(end - start)) / self.resolution)) + 1
+        self.add(key, start + np.linspace(0.0, 1.0, count)[:, None] * (end - start))
+
+    def add(self, key, points):
+        """Insert (or replace) obstacle `key` given by (k, 2) sample points"""
+        if key in self.obstacles:
+            self.remove(key)
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.obstacles[key] = points
+        tiles = np.floor(points / self.tile_extent).astype(int)
+        for tile in set(map(tuple, tiles)):
+            self.bins.setdefault(tile, {})[key] = points[(tiles == tile).all(axis=1)]
+        self._invalidate(tiles)
+
+    def remove(self, key):
+        points = self.obstacles.pop(key)
+        tiles = np.floor(points / self.tile_extent).astype(int)
+        for tile in set(map(tuple, tiles)):
+            bucket = self.bins[tile]
+            del bucket[key]
+            if not bucket:
+                del self.bins[tile]
+        self._invalidate(tiles)
+
+    def move(self, key, x, y):
+        self.add_point(key, x, y)
+
+    def _invalidate(self, tiles):
+        """Drop every cached tile within reach of the given tiles"""
+        r = self.reach
+        (x0, y0), (x1, y1) = tiles.min(axis=0) - r, tiles.max(axis=0) + r
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.tiles):
+            stale = [t for t in self.tiles if x0 <= t[0] <= x1 and y0 <= t[1] <= y1]
+        else:
+            stale = [t for t in ((tx, ty) for tx in range(x0, x1 + 1) for ty in range(y0, y1 + 1)) if t in self.tiles]
+        for tile in stale:
+            del self.tiles[tile]
+
+    def _compute(self, tile):
+        """Distance and gradient of one tile from the occupancy of the tile plus its margin"""
+        tx, ty = tile
+        r = self.reach
+        samples = [points for ix in range(tx - r, tx + r + 1) for iy in range(ty - r, ty + r + 1)
+                   for points in self.bins.get((ix, iy), {}).values()]
+        if not samples:
+            return None
+        n, m, res = self.tile_size, self.margin, self.resolution
+        size = n + 2 * m
+        cells = np.floor(np.concatenate(samples) / res).astype(int) - (np.array(tile) * n - m)
+        cells = cells[((cells >= 0) & (cells < size)).all(axis=1)]
+        if not len(cells):
+            return None
+
+        # Occupancy indexed [ix, iy]; distances are to the centres of occupied cells
+        if ndimage is not None:
+            free = np.ones((size, size), dtype=bool)
+            free[cells[:, 0], cells[:, 1]] = False
+            distance = ndimage.distance_transform_edt(free, sampling=res)
+        else:
+            occupied = np.unique(cells, axis=0)
+            axis = np.arange(size)
+            distance = np.full((size, size), np.inf)
+            for chunk in np.array_split(occupied, max(1, len(occupied) // 256)):
+                dx = (axis[:, None] - chunk[:, 0]) ** 2  # (size, c)
+                dy = (axis[:, None] - chunk[:, 1]) ** 2
+                distance = np.minimum(distance, np.min(dx[:, None, :] + dy[None, :, :], axis=2))
+            distance = np.sqrt(distance) * res
+        np.minimum(distance, self.truncation, out=distance)
+        gradient = np.stack(np.gradient(distance, res))
+        inner = slice(m, m + n)
+        return (distance[inner, inner].astype(np.float32),
+                gradient[:, inner, inner].astype(np.float32))
+
+    def _lookup(self, tile):
+        tiles = self.tiles
+        if tile in tiles:
+            tiles.move_to_end(tile)
+            return tiles[tile]
+        data = tiles[tile] = self._compute(tile)
+        self.computed += 1
+        if len(tiles) > self.max_tiles:
+            tiles.popitem(last=False)
+        return data
+
+    def sample(self, x, y):
+        """(distance, d/dx, d/dy) at (x, y); the gradient points away from the nearest obstacle"""
+        ix, iy = int(math.floor(x / self.resolution)), int(math.floor(y / self.resolution))
+        n = self.tile_size
+        tx, ty = ix // n, iy // n
+        data = self._lookup((tx, ty))
+        if data is None:
+            return self.truncation, 0.0, 0.0
+        distance, gradient = data
+        i, j = ix - tx * n, iy - ty * n
+        return float(distance[i, j]), float(gradient[0, i, j]), float(gradient[1, i, j])
+
+    def distance(self, x, y):
+        return self.sample(x, y)[0]
+
+    def sample_many(self, xy):
+        """Vectorized sample over (N, 2) positions: (N,) distances and (N, 2) gradients"""
+        cells = np.floor(np.asarray(xy, dtype=float).reshape(-1, 2) / self.resolution).astype(int)
+        n = self.tile_size
+        tiles = cells // n
+        local = cells - tiles * n
+        distance = np.full(len(cells), self.truncation)
+        gradient = np.zeros((len(cells), 2))
+        keys, inverse = np.unique(tiles, axis=0, return_inverse=True)
+        order = np.argsort(inverse.ravel(), kind="stable")
+        groups = np.split(order, np.cumsum(np.bincount(inverse.ravel(), minlength=len(keys)))[:-1])
+        for tile, rows in zip(map(tuple, keys), groups):
+            data = self._lookup(tile)
+            if data is None:
+                continue
+            i, j = local[rows, 0], local[rows, 1]
+            distance[rows] = data[0][i, j]
+            gradient[rows] = data[1][:, i, j].T
+        return distance, gradient
@@ -0,0 +1,323 @@
+# ekf.py
+import math
+import numpy as np
+from config import (MOTION_NOISE, MEAS_NOISE, UPDATE_MODE, COVARIANCE_UPDATE, EKF_INITIAL_CAPACITY, SIM_DT,
+                    INITIAL_POSE_COV)
+from geometry import normalize_angle
+
+class EKF:
+    """
+    EKF-SLAM over the robot pose (x, y, theta) and a set of
+    point landmarks observed with range/bearing measurements.
+
+    The state only holds landmarks that have been sighted: each new
+    landmark is appended on first sighting. X and P are views into
+    preallocated buffers whose capacity doubles when full, so growth is
+    amortized O(N^2) per landmark and never-seen landmarks cost nothing.
+
+    covariance_update selects the measurement-update form of P: "standard"
+    (P - K H P) or "joseph" ((I - K H) P (I - K H)^T + K R K^T, which stays
+    symmetric positive semi-definite under round-off at ~2x the cost).
+
+    initial_pose_cov is the 3x3 covariance of the starting pose.
+    """
+
+    def __init__(self, pose, motion_noise=MOTION_NOISE, meas_noise=MEAS_NOISE,
+                 update_mode=UPDATE_MODE, capacity=EKF_INITIAL_CAPACITY,
+                 covariance_update=COVARIANCE_UPDATE, initial_pose_cov=INITIAL_POSE_COV):
+        if update_mode not in ("sequential", "batched"):
+            raise ValueError(f"Unknown update mode: {update_mode}")
+        if covariance_update not in ("standard", "joseph"):
+            raise ValueError(f"Unknown covariance update: {covariance_update}")
+        self.state_size = 3
+        self.motion_noise = motion_noise
+        self.meas_noise = meas_noise
+        self.update_mode = update_mode
+        self.covariance_update = covariance_update
+
+        n = 3 + 2 * capacity
+        self._X = np.zeros((n, 1))
+        self._P = np.zeros((n, n))
+        self._X[0:3, 0] = pose
+        self._P[0:3, 0:3] = initial_pose_cov
+
+        self.landmark_ids = []
+        self.landmark_index = {}
+
+    @property
+    def X(self):
+        return self._X[:self.state_size]
+
+    @X.setter
+    def X(self, value):
+        self._X[:self.state_size] = value
+
+    @property
+    def P(self):
+        return self._P[:self.state_size, :self.state_size]
+
+    @P.setter
+    def P(self, value):
+        self._P[:self.state_size, :self.state_size] = value
+
+    @property
+    def num_landmarks(self):
+        return len(self.landmark_ids)
+
+    @property
+    def pose(self):
+        return self.X[0,0], self.X[1,0], self.X[2,0]
+
+    def landmark_estimate(self, lm_id):
+        idx = self.landmark_index[lm_id]
+        return self.X[idx, 0], self.X[idx+1, 0]
+
+    def covariance(self, cols):
+        """Marginal covariance of the given state indices"""
+        return self.P[np.ix_(cols, cols)]
+
+    def pose_covariance(self):
+        return self.covariance([0, 1, 2])
+
+    def _marginal_blocks(self, rows):
+        """(k, 2, 2) covariance blocks of the state pairs starting at the given indices"""
+        idx = np.asarray(rows, dtype=int)[:, None] + np.arange(2)
+        return self.P[idx[:, :, None], idx[:, None, :]]
+
+    def landmark_means(self):
+        """(ids, means (N, 2)) of every landmark; landmark_ids[k] sits at state index 3 + 2k"""
+        return list(self.landmark_ids), self.X[3:, 0].reshape(-1, 2).copy()
+
+    def landmark_marginals(self):
+        """(ids, means (N, 2), marginal covariances (N, 2, 2)) of every landmark"""
+        ids = list(self.landmark_ids)
+        rows = np.array([self.landmark_index[i] for i in ids], dtype=int)
+        X = self.X[:, 0]
+        return ids, np.stack([X[rows], X[rows + 1]], axis=1), self._marginal_blocks(rows)
+
+    def _predict_pose(self, v, w, dt):
+        """Move the pose estimate; returns F[0,2] and F[1,2] of the motion Jacobian"""
+        X = self.X
+        theta = X[2,0]
+        X[0,0] += v * math.cos(theta) * dt; X[1,0] += v * math.sin(theta) * dt
+        X[2,0] = normalize_angle(X[2,0] + w*dt)
+        return -v * math.sin(theta) * dt, v * math.cos(theta) * dt
+
+    def _process_noise(self, dt):
+        """Diagonal of Q for a prediction over dt (MOTION_NOISE is per SIM_DT)"""
+        return np.asarray(self.motion_noise, dtype=float) * (dt / SIM_DT)
+
+    def predict(self, v, w, dt):
+        """Propagate the robot pose with odometry (v, w) over dt"""
+        a, b = self._predict_pose(v, w, dt)
+
+        # F is the identity except F[0,2] and F[1,2], so F P F^T + Q only
+        # touches the robot rows/columns: apply it in place in O(N).
+        P = self.P
+        P[0, :] += a * P[2, :]; P[1, :] += b * P[2, :]
+        P[:, 0] += a * P[:, 2]; P[:, 1] += b * P[:, 2]
+        Q = self._process_noise(dt)
+        P[0,0] += Q[0]; P[1,1] += Q[1]; P[2,2] += Q[2]
+
+    def _grow(self, size):
+        """Reallocate the X/P buffers with doubled capacity, keeping the state"""
+        n = self.state_size
+        capacity = max(size, 2 * self._X.shape[0] - 3)
+        X_new = np.zeros((capacity, 1)); X_new[:n] = self._X[:n]
+        P_new = np.zeros((capacity, capacity)); P_new[:n, :n] = self._P[:n, :n]
+        self._X, self._P = X_new, P_new
+
+    def _place_landmark(self, r, bearing):
+        """
+        Write the mean of a new landmark after the current state (growing
+        the buffers if needed) and return the Jacobians Gr, Gz of the
+        inverse observation model w.r.t. the pose and the measurement.
+        """
+        n = self.state_size
+        if n + 2 > self._X.shape[0]:
+            self._grow(n + 2)
+        X = self._X
+        theta = X[2,0]
+        c, s = math.cos(theta + bearing), math.sin(theta + bearing)
+        X[n, 0] = X[0,0] + r * c
+        X[n+1, 0] = X[1,0] + r * s
+        Gr = np.array([[1.0, 0.0, -r * s], [0.0, 1.0, r * c]])
+        Gz = np.array([[c, -r * s], [s, r * c]])
+        return Gr, Gz
+
+    def _register_landmark(self, lm_id):
+        n = self.state_size
+        self.landmark_index[lm_id] = n
+        self.landmark_ids.append(lm_id)
+        self.state_size = n + 2
+
+    def _initialize_landmark(self, lm_id, r, bearing):
+        """Append a landmark to the state from its first range/bearing sighting"""
+        n = self.state_size
+        Gr, Gz = self._place_landmark(r, bearing)
+        P = self._P
+        P_cross = Gr @ P[0:3, :n]  # (2, n)
+        P[n:n+2, :n] = P_cross
+        P[:n, n:n+2] = P_cross.T
+        P[n:n+2, n:n+2] = Gr @ P[0:3, 0:3] @ Gr.T + Gz @ self.meas_noise @ Gz.T
+        self._register_landmark(lm_id)
+
+    def remove_landmark(self, lm_id):
+        """Drop a landmark from the state, moving the last landmark into its slot"""
+        idx = self.landmark_index.pop(lm_id)
+        last = self.state_size - 2
+        if idx != last:
+            self._move_slot(last, idx)
+            moved = self.landmark_ids[-1]
+            self.landmark_index[moved] = idx
+            self.landmark_ids[self.landmark_ids.index(lm_id)] = moved
+        self.landmark_ids.pop()
+        self.state_size = last
+
+    def _move_slot(self, src, dst):
+        """Copy the mean and covariance rows/columns of the landmark at src into dst"""
+        n = self.state_size
+        X, P = self._X, self._P
+        X[dst:dst+2] = X[src:src+2]
+        P[dst:dst+2, :n] = P[src:src+2, :n]
+        P[:n, dst:dst+2] = P[:n, src:src+2]
+
+    def correct(self, measurements):
+        """Apply a frame of (lm_id, (range, bearing)) measurements"""
+        if self.update_mode == "batched":
+            self.update_batch(measurements)
+        else:
+            for lm_id, z in measurements:
+                self.update(lm_id, z)
+
+    def observation(self, lm_id):
+        """
+        Predicted (range, bearing) of a mapped landmark and its Jacobian.
+        H is only non-zero in the robot columns and the two landmark
+        columns, so only that 2x5 block is returned, with its columns.
+        """
+        X = self.X
+        idx = self.landmark_index[lm_id]
+        dx, dy = X[idx, 0] - X[0,0], X[idx+1, 0] - X[1,0]
+        q = dx**2 + dy**2; r_pred = math.sqrt(q)
+        z_hat = np.array([r_pred, normalize_angle(math.atan2(dy, dx) - X[2,0])])
+        cols = [0, 1, 2, idx, idx+1]
+        H = np.array([
+            [-dx/r_pred, -dy/r_pred, 0, dx/r_pred, dy/r_pred],
+            [dy/q, -dx/q, -1, -dy/q, dx/q]
+        ])
+        return z_hat, H, cols
+
+    def innovation(self, lm_id, z):
+        """Residual and innovation covariance S of z against a mapped landmark"""
+        z_hat, H, cols = self.observation(lm_id)
+        y = np.array([z[0] - z_hat[0], normalize_angle(z[1] - z_hat[1])])
+        S = H @ self.covariance(cols) @ H.T + self.meas_noise
+        return y, S
+
+    def update(self, lm_id, z):
+        """
+        Correct with a range/bearing measurement z = (range, bearing).
+        The first sighting of a landmark only initializes its position.
+        """
+        if lm_id not in self.landmark_index:
+            self._initialize_landmark(lm_id, z[0], z[1])
+            return
+
+        X, P = self.X, self.P
+        z_hat, H, cols = self.observation(lm_id)
+        y_res = np.array([[z[0] - z_hat[0]], [normalize_angle(z[1] - z_hat[1])]])
+
+        PHt = P[:, cols] @ H.T  # (N, 2)
+        S = H @ PHt[cols, :] + self.meas_noise
+        K = np.linalg.solve(S, PHt.T).T  # S is symmetric
+        X += K @ y_res; X[2,0] = normalize_angle(X[2,0])
+        self._correct_covariance(P, K, PHt, self.meas_noise, lambda A: A[:, cols] @ H.T)
+
+    def _correct_covariance(self, P, K, PHt, R, project):
+        """
+        In-place measurement update of P given the gain K and P H^T.
+        `project(A)` returns A H^T using the sparse blocks of H.
+        """
+        # (I - K H) P == P - K (P H^T)^T, a low-rank correction done in place
+        self._subtract_product(P, K, PHt)
+        if self.covariance_update == "joseph":
+            # (I - K H) P (I - K H)^T + K R K^T, with M = (I - K H) P already in P.
+            # M H^T is taken from M itself (not simplified with the optimal gain)
+            # so errors in K stay second order and P stays symmetric.
+            self._subtract_product(P, project(P) - K @ R, K)
+
+    @staticmethod
+    def _subtract_product(P, A, B):
+        """P -= A B^T in place, a block of rows at a time so no N x N temporary is built"""
+        for start in range(0, len(P), 64):  # 64 rows of a few thousand columns stay in cache
+            rows = slice(start, start + 64)
+            P[rows] -= A[rows] @ B.T
+
+    def _split_frame(self, measurements):
+        """Initialize first sightings; returns (state index, z) of the already mapped landmarks"""
+        observed = []
+        for lm_id, z in measurements:
+            if lm_id in self.landmark_index:
+                observed.append((self.landmark_index[lm_id], z))
+            else:
+                self._initialize_landmark(lm_id, z[0], z[1])
+        return observed
+
+    def _stacked_observation(self, observed):
+        """
+        Residuals (k, 2) and H blocks of k observed landmarks: the robot
+        part of each 2x3 block stacked into (2k, 3), and the (k, 2, 2)
+        landmark parts.
+        """
+        X = self.X
+        k = len(observed)
+        idx = np.array([i for i, _ in observed])
+        z = np.array([z for _, z in observed], dtype=float)  # (k, 2)
+        dx = X[idx, 0] - X[0,0]; dy = X[idx+1, 0] - X[1,0]
+        q = dx**2 + dy**2; r_pred = np.sqrt(q)
+
+        y_res = np.empty((k, 2))
+        y_res[:, 0] = z[:, 0] - r_pred
+        y_res[:, 1] = normalize_angle(z[:, 1] - normalize_angle(np.arctan2(dy, dx) - X[2,0]))
+
+        # Robot part of each 2x3 block of H and the 2x2 landmark part
+        Hr = np.zeros((k, 2, 3))
+        Hr[:, 0, 0] = -dx/r_pred; Hr[:, 0, 1] = -dy/r_pred
+        Hr[:, 1, 0] = dy/q; Hr[:, 1, 1] = -dx/q; Hr[:, 1, 2] = -1
+        Hl = np.empty((k, 2, 2))
+        Hl[:, 0, 0] = dx/r_pred; Hl[:, 0, 1] = dy/r_pred
+        Hl[:, 1, 0] = -dy/q; Hl[:, 1, 1] = dx/q
+        return idx, y_res, Hr.reshape(2*k, 3), Hl
+
+    def update_batch(self, measurements):
+        """
+        Fuse all measurements of a frame in one update: stack the k
+        residuals into a 2k vector and do a single Cholesky-based
+        correction of X and P instead of k sequential ones.
+        """
+        observed = self._split_frame(measurements)
+        k = len(observed)
+        if k == 0:
+            return
+
+        X, P = self.X, self.P
+        idx, y_res, Hr, Hl = self._stacked_observation(observed)
+        lm_cols = np.stack([idx, idx+1], axis=1).ravel()
+
+        def project(A):
+            """A H^T from the sparse blocks of H"""
+            AL = A[:, lm_cols].reshape(-1, k, 2)
+            return A[:, :3] @ Hr.T + np.einsum('nic,irc->nir', AL, Hl).reshape(-1, 2*k)
+
+        # P H^T (N, 2k) and S = H P H^T + R (2k, 2k) from the sparse blocks
+        PHt = project(P)
+        S = Hr @ PHt[:3, :] + np.einsum('irc,icm->irm', Hl, PHt[lm_cols, :].reshape(k, 2, 2*k)).reshape(2*k, 2*k)
+        R = np.kron(np.eye(k), self.meas_noise)
+        S += R
+
+        # K = P H^T S^-1 via the Cholesky factor S = L L^T (two triangular solves)
+        L = np.linalg.cholesky(S)
+        K = np.linalg.solve(L.T, np.linalg.solve(L, PHt.T)).T
+        X += K @ y_res.reshape(2*k, 1); X[2,0] = normalize_angle(X[2,0])
+        self._correct_covariance(P, K, PHt, R, project)
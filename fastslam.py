@@ -0,0 +1,346 @@
+# fastslam.py
+import math
+import numpy as np
+from config import *
+from geometry import normalize_angle
+
+class FastSLAM:
+    """
+    Rao-Blackwellized particle filter SLAM (FastSLAM). Each of the M
+    particles is a pose sample with its own independent 2x2 EKF per
+    landmark. Everything lives in arrays - poses (M, 3), log-weights (M,),
+    landmark means (M, L, 2) and covariances (M, L, 2, 2) - so motion
+    sampling, landmark updates and weighting run over all particles (and
+    all measurements of a frame) at once. The landmark axis doubles when
+    full, like the EKF state.
+
+    version 1 samples poses from the motion model. version 2 (FastSLAM
+    2.0) samples them from the motion model refined by the frame's
+    measurements of mapped landmarks, which keeps far more particles
+    useful when odometry is poor relative to the sensor. Particles are
+    resampled (low-variance resampling) when the effective sample size
+    drops below resample_threshold * M. The initial poses are drawn from
+    N(pose, initial_pose_cov).
+
+    The likelihood of a frame is tempered to the power dt / weight_interval
+    (at most 1), dt being the time predicted since the last frame. Every
+    particle's map is built from its own path, so its likelihood is
+    overconfident; multiplied in at full strength at 60 Hz it collapses
+    the weights every frame, and resampling that often leaves all
+    particles with one ancestor's map. weight_interval defaults to
+    FASTSLAM1_WEIGHT_INTERVAL or FASTSLAM2_WEIGHT_INTERVAL; 0 disables it.
+
+    Exposes the EKF interface, with landmark j at state indices 3 + 2j,
+    using the Gaussian moment-matched to the weighted particle set, so the
+    simulator, data association and overlays work unchanged. Landmark
+    updates are independent given the pose, so a frame is always fused at
+    once; update_mode is only accepted for interface compatibility.
+    """
+
+    def __init__(self, pose, motion_noise=MOTION_NOISE, meas_noise=MEAS_NOISE,
+                 update_mode=UPDATE_MODE, capacity=EKF_INITIAL_CAPACITY, version=2,
+                 num_particles=FASTSLAM_PARTICLES, resample_threshold=FASTSLAM_RESAMPLE_THRESHOLD,
+                 seed=FASTSLAM_SEED, initial_pose_cov=INITIAL_POSE_COV, weight_interval=None):
+        if update_mode not in ("sequential", "batched"):
+            raise ValueError(f"Unknown update mode: {update_mode}")
+        if version not in (1, 2):
+            raise ValueError(f"Unknown FastSLAM version: {version}")
+        self.motion_noise = motion_noise
+        self.meas_noise = meas_noise
+        self.update_mode = update_mode
+        self.version = version
+        self.resample_threshold = resample_threshold
+        if weight_interval is None:
+            weight_interval = FASTSLAM1_WEIGHT_INTERVAL if version == 1 else FASTSLAM2_WEIGHT_INTERVAL
+        self.weight_interval = weight_interval
+        self._elapsed = 0.0       # Time predicted since the last frame
+        self._weight_scale = 1.0  # Tempering exponent of the current frame's likelihood
+        self.rng = np.random.default_rng(seed)
+        self._meas_cov = np.asarray(meas_noise, dtype=float)
+
+        M = num_particles
+        self.poses = self.rng.multivariate_normal(np.asarray(pose, dtype=float), initial_pose_cov, M)
+        self.poses[:, 2] = normalize_angle(self.poses[:, 2])
+        self.log_weights = np.zeros(M)
+        self._means = np.zeros((M, capacity, 2))
+        self._covs = np.zeros((M, capacity, 2, 2))
+        self._proposal = np.zeros((M, 3, 3))  # Version 2: pose covariance predicted since the last sample
+        self.state_size = 3
+        self.landmark_ids = []
+        self.landmark_index = {}
+        self.resamples = 0
+
+    @property
+    def num_particles(self):
+        return len(self.poses)
+
+    @property
+    def num_landmarks(self):
+        return len(self.landmark_ids)
+
+    @property
+    def means(self):
+        return self._means[:, :self.num_landmarks]
+
+    @property
+    def covs(self):
+        return self._covs[:, :self.num_landmarks]
+
+    @property
+    def weights(self):
+        w = np.exp(self.log_weights - self.log_weights.max())
+        return w / w.sum()
+
+    # Moment-matched Gaussian of the particle set
+    @property
+    def pose(self):
+        w = self.weights
+        theta = math.atan2(w @ np.sin(self.poses[:, 2]), w @ np.cos(self.poses[:, 2]))
+        return float(w @ self.poses[:, 0]), float(w @ self.poses[:, 1]), theta
+
+    @property
+    def X(self):
+        X = np.empty((self.state_size, 1))
+        X[0:3, 0] = self.pose
+        X[3:, 0] = np.einsum("m,mlc->lc", self.weights, self.means).ravel()
+        return X
+
+    @property
+    def P(self):
+        return self.covariance(range(self.state_size))
+
+    def landmark_estimate(self, lm_id):
+        x, y = self.weights @ self._means[:, (self.landmark_index[lm_id] - 3) // 2]
+        return x, y
+
+    def _particle_states(self, cols):
+        """(M, k) values of the given state indices in every particle"""
+        cols = np.asarray(cols, dtype=int)
+        states = np.empty((self.num_particles, len(cols)))
+        robot = cols < 3
+        states[:, robot] = self.poses[:, cols[robot]]
+        lm = cols[~robot] - 3
+        states[:, ~robot] = self._means[:, lm // 2, lm % 2]
+        return states
+
+    def covariance(self, cols):
+        """Spread of the particles plus the mean landmark covariance, over the given state indices"""
+        cols = list(cols)
+        w = self.weights
+        D = self._particle_states(cols)
+        D -= w @ D
+        if 2 in cols:
+            D[:, cols.index(2)] = normalize_angle(D[:, cols.index(2)])
+        C = (D * w[:, None]).T @ D
+        slots = {}
+        for i, c in enumerate(cols):
+            if c >= 3:
+                slots.setdefault((c - 3) // 2, []).append((i, (c - 3) % 2))
+        for slot, entries in slots.items():
+            mean_cov = np.einsum("m,mab->ab", w, self._covs[:, slot])
+            for i, a in entries:
+                for j, b in entries:
+                    C[i, j] += mean_cov[a, b]
+        return C
+
+    def pose_covariance(self):
+        return self.covariance([0, 1, 2])
+
+    def landmark_means(self):
+        return list(self.landmark_ids), np.einsum("m,mlc->lc", self.weights, self.means)
+
+    def landmark_marginals(self):
+        """(ids, means (N, 2), covariances (N, 2, 2)) of every landmark over the particle set"""
+        w = self.weights
+        means = np.einsum("m,mlc->lc", w, self.means)
+        D = self.means - means
+        covs = np.einsum("m,mlab->lab", w, self.covs) + np.einsum("m,mla,mlb->lab", w, D, D)
+        return list(self.landmark_ids), means, covs
+
+    def observation(self, lm_id):
+        """Predicted (range, bearing) of a mapped landmark from the mean estimates, and its 2x5 Jacobian"""
+        x, y, theta = self.pose
+        lx, ly = self.landmark_estimate(lm_id)
+        idx = self.landmark_index[lm_id]
+        dx, dy = lx - x, ly - y
+        q = dx**2 + dy**2; r_pred = math.sqrt(q)
+        z_hat = np.array([r_pred, normalize_angle(math.atan2(dy, dx) - theta)])
+        H = np.array([
+            [-dx/r_pred, -dy/r_pred, 0, dx/r_pred, dy/r_pred],
+            [dy/q, -dx/q, -1, -dy/q, dx/q]
+        ])
+        return z_hat, H, [0, 1, 2, idx, idx+1]
+
+    def innovation(self, lm_id, z):
+        z_hat, H, cols = self.observation(lm_id)
+        y = np.array([z[0] - z_hat[0], normalize_angle(z[1] - z_hat[1])])
+        return y, H @ self.covariance(cols) @ H.T + self._meas_cov
+
+    # Filtering
+    def _process_noise(self, dt):
+        """Diagonal of Q for a prediction over dt (MOTION_NOISE is per SIM_DT)"""
+        return np.asarray(self.motion_noise, dtype=float) * (dt / SIM_DT)
+
+    def predict(self, v, w, dt):
+        """Move every particle with odometry (v, w) over dt"""
+        self._elapsed += dt
+        poses = self.poses
+        theta = poses[:, 2].copy()
+        poses[:, 0] += v * np.cos(theta) * dt; poses[:, 1] += v * np.sin(theta) * dt
+        poses[:, 2] += w * dt
+        if self.version == 1:
+            poses += self.rng.standard_normal(poses.shape) * np.sqrt(self._process_noise(dt))
+        else:
+            # Keep the noise-free prediction and its covariance F S F^T + Q; sampled in correct()
+            F = np.tile(np.eye(3), (len(poses), 1, 1))
+            F[:, 0, 2] = -v * np.sin(theta) * dt; F[:, 1, 2] = v * np.cos(theta) * dt
+            self._proposal = F @ self._proposal @ F.transpose(0, 2, 1) + np.diag(self._process_noise(dt))
+        poses[:, 2] = normalize_angle(poses[:, 2])
+
+    def correct(self, measurements):
+        """Apply a frame of (lm_id, (range, bearing)) measurements, then resample if needed"""
+        if self._elapsed:
+            # The scale holds until the next prediction, so update() calls within a frame share it
+            self._weight_scale = min(1.0, self._elapsed / self.weight_interval) if self.weight_interval > 0 else 1.0
+            self._elapsed = 0.0
+        self._fuse(measurements)
+        self._resample()
+
+    def update(self, lm_id, z):
+        self.correct([(lm_id, z)])
+
+    def update_batch(self, measurements):
+        self.correct(measurements)
+
+    def _fuse(self, measurements):
+        # A landmark measured twice in a frame is fused in a second round
+        first, again, seen = [], [], set()
+        for lm_id, z in measurements:
+            (again if lm_id in seen else first).append((lm_id, z))
+            seen.add(lm_id)
+
+        known = [(self.landmark_index[lm_id], z) for lm_id, z in first if lm_id in self.landmark_index]
+        new = [(lm_id, z) for lm_id, z in first if lm_id not in self.landmark_index]
+        slots = np.array([(idx - 3) // 2 for idx, _ in known], dtype=int)
+        z_known = np.array([z for _, z in known], dtype=float).reshape(-1, 2)
+        if self.version == 2:
+            self._sample_poses(slots, z_known)
+        if len(known):
+            self._update_landmarks(slots, z_known, weigh=self.version == 1)
+        if new:
+            self._add_landmarks(new)
+        if again:
+            self._fuse(again)
+
+    def _measurement_model(self, poses, slots, z):
+        """Residuals (M, k, 2) and Jacobians w.r.t. the landmarks (M, k, 2, 2) and the poses (M, k, 2, 3)"""
+        mu = self._means[:, slots]
+        dx = mu[..., 0] - poses[:, 0, None]; dy = mu[..., 1] - poses[:, 1, None]
+        q = dx**2 + dy**2; r_pred = np.sqrt(q)
+        y = np.stack([z[:, 0] - r_pred,
+                      normalize_angle(z[:, 1] - normalize_angle(np.arctan2(dy, dx) - poses[:, 2, None]))], axis=-1)
+        Hm = np.empty(dx.shape + (2, 2))
+        Hm[..., 0, 0] = dx/r_pred; Hm[..., 0, 1] = dy/r_pred
+        Hm[..., 1, 0] = -dy/q; Hm[..., 1, 1] = dx/q
+        Hx = np.zeros(dx.shape + (2, 3))
+        Hx[..., :, 0:2] = -Hm
+        Hx[..., 1, 2] = -1
+        return y, Hm, Hx
+
+    def _add_log_likelihood(self, y, S):
+        """Add the tempered log N(y; 0, S) over the trailing measurement axes (constant terms dropped)"""
+        d2 = np.einsum("...i,...ij,...j->...", y, np.linalg.inv(S), y)
+        ll = -0.5 * (d2 + np.log(np.linalg.det(S)))
+        self.log_weights += self._weight_scale * ll.reshape(len(self.poses), -1).sum(axis=1)
+
+    def _sample_poses(self, slots, z):
+        """
+        FastSLAM 2.0 proposal: refine each particle's predicted pose
+        Gaussian with the measurements of mapped landmarks (one EKF
+        update per measurement, vectorized over particles), weight by the
+        measurement likelihood under it, then draw the pose.
+        """
+        mu, Sx = self.poses, self._proposal
+        for j in range(len(slots)):
+            y, Hm, Hx = self._measurement_model(mu, slots[j:j+1], z[j:j+1])
+            y, Hm, Hx = y[:, 0], Hm[:, 0], Hx[:, 0]
+            Sm = self._covs[:, slots[j]]
+            Q = Hm @ Sm @ Hm.transpose(0, 2, 1) + self._meas_cov
+            SxHt = Sx @ Hx.transpose(0, 2, 1)
+            S = Hx @ SxHt + Q
+            self._add_log_likelihood(y, S)
+            K = SxHt @ np.linalg.inv(S)
+            mu = mu + (K @ y[..., None])[..., 0]
+            mu[:, 2] = normalize_angle(mu[:, 2])
+            Sx = Sx - K @ S @ K.transpose(0, 2, 1)
+        # Tiny jitter keeps the factorization defined when Sx is (near) zero
+        L = np.linalg.cholesky((Sx + Sx.transpose(0, 2, 1)) / 2 + 1e-12 * np.eye(3))
+        self.poses = mu + (L @ self.rng.standard_normal((len(mu), 3, 1)))[..., 0]
+        self.poses[:, 2] = normalize_angle(self.poses[:, 2])
+        self._proposal = np.zeros_like(self._proposal)
+
+    def _update_landmarks(self, slots, z, weigh):
+        """EKF update of the measured landmarks in every particle at once"""
+        y, Hm, _ = self._measurement_model(self.poses, slots, z)
+        Sigma = self._covs[:, slots]
+        PHt = Sigma @ Hm.swapaxes(-1, -2)
+        Q = Hm @ PHt + self._meas_cov
+        K = PHt @ np.linalg.inv(Q)
+        self._means[:, slots] += (K @ y[..., None])[..., 0]
+        self._covs[:, slots] = Sigma - K @ Q @ K.swapaxes(-1, -2)
+        if weigh:
+            self._add_log_likelihood(y, Q)
+
+    def _add_landmarks(self, new):
+        """Initialize first sightings in every particle from its own pose"""
+        L = self.num_landmarks
+        k = len(new)
+        if L + k > self._means.shape[1]:
+            capacity = max(L + k, 2 * self._means.shape[1])
+            means = np.zeros((self.num_particles, capacity, 2)); means[:, :L] = self.means
+            covs = np.zeros((self.num_particles, capacity, 2, 2)); covs[:, :L] = self.covs
+            self._means, self._covs = means, covs
+        for j, (lm_id, _) in enumerate(new):
+            self.landmark_index[lm_id] = 3 + 2 * (L + j)
+            self.landmark_ids.append(lm_id)
+        self.state_size = 3 + 2 * (L + k)
+
+        z = np.array([z for _, z in new], dtype=float)
+        r = z[:, 0]
+        angle = self.poses[:, 2, None] + z[:, 1]
+        c, s = np.cos(angle), np.sin(angle)
+        self._means[:, L:L+k, 0] = self.poses[:, 0, None] + r * c
+        self._means[:, L:L+k, 1] = self.poses[:, 1, None] + r * s
+        Gz = np.empty((self.num_particles, k, 2, 2))
+        Gz[..., 0, 0] = c; Gz[..., 0, 1] = -r * s
+        Gz[..., 1, 0] = s; Gz[..., 1, 1] = r * c
+        self._covs[:, L:L+k] = Gz @ self._meas_cov @ Gz.swapaxes(-1, -2)
+
+    def _resample(self):
+        """Low-variance resampling once the effective sample size is too small"""
+        w = self.weights
+        M = len(w)
+        if 1.0 / (w @ w) >= self.resample_threshold * M:
+            self.log_weights -= self.log_weights.max()
+            return
+        positions = (self.rng.random() + np.arange(M)) / M
+        idx = np.minimum(np.searchsorted(np.cumsum(w), positions), M - 1)
+        self.poses = self.poses[idx]
+        self._means = self._means[idx]
+        self._covs = self._covs[idx]
+        self._proposal = self._proposal[idx]
+        self.log_weights = np.zeros(M)
+        self.resamples += 1
+
+    def remove_landmark(self, lm_id):
+        """Drop a landmark from every particle, moving the last landmark into its slot"""
+        slot = (self.landmark_index.pop(lm_id) - 3) // 2
+        last = self.num_landmarks - 1
+        if slot != last:
+            self._means[:, slot] = self._means[:, last]
+            self._covs[:, slot] = self._covs[:, last]
+            moved = self.landmark_ids[-1]
+            self.landmark_index[moved] = 3 + 2 * slot
+            self.landmark_ids[self.landmark_ids.index(lm_id)] = moved
+        self.landmark_ids.pop()
+        self.state_size -= 2
@@ -0,0 +1,517 @@
+# filters.py
+import functools
+import numpy as np
+from config import *
+from ekf import EKF
+from geometry import normalize_angle
+from submap import SubmapEKF
+from fastslam import FastSLAM
+
+try:
+    import scipy.sparse as sparse
+    import scipy.sparse.linalg as sparse_linalg
+except ImportError:  # SciPy is optional; the information filter then keeps a dense Omega
+    sparse = sparse_linalg = None
+
+def _triangularize(M):
+    """Lower-triangular L with L L^T == M M^T (QR of M^T, M never squared)"""
+    return np.linalg.qr(M.T, mode="r").T
+
+def _lower_factor(A):
+    """Lower-triangular factor of a symmetric positive semi-definite matrix"""
+    w, V = np.linalg.eigh((A + A.T) / 2)
+    return _triangularize(V * np.sqrt(np.clip(w, 0.0, None)))
+
+class SquareRootEKF(EKF):
+    """
+    EKF-SLAM that propagates a lower-triangular Cholesky factor S of the
+    covariance (P = S S^T) instead of P itself. P is symmetric positive
+    semi-definite by construction and S needs half the dynamic range, so
+    round-off cannot drive the filter inconsistent over long runs.
+
+    The factor is kept in the variable order [landmarks..., robot]. With
+    the robot last, a prediction rewrites the robot rows in O(N) and only
+    re-triangularizes the 3x3 robot block, and a new landmark touches a
+    5x5 block. Measurements are fused with the QR "array" form, O(N^3)
+    per update (one measurement, or a whole frame in batched mode).
+    """
+
+    def __init__(self, pose, motion_noise=MOTION_NOISE, meas_noise=MEAS_NOISE,
+                 update_mode=UPDATE_MODE, capacity=EKF_INITIAL_CAPACITY, initial_pose_cov=INITIAL_POSE_COV):
+        super().__init__(pose, motion_noise, meas_noise, update_mode, capacity, initial_pose_cov=initial_pose_cov)
+        # _P holds the factor from here on
+        self._P[0:3, 0:3] = _lower_factor(self._P[0:3, 0:3])
+        self._meas_noise_half = np.linalg.cholesky(np.asarray(meas_noise))
+
+    def _factor_rows(self, cols):
+        """Factor rows of state indices (landmarks first, robot last)"""
+        m = self.state_size - 3
+        return [c - 3 if c >= 3 else m + c for c in cols]
+
+    @property
+    def S(self):
+        return self._P[:self.state_size, :self.state_size]
+
+    @property
+    def P(self):
+        """Covariance in the usual state order, computed from the factor"""
+        S = self.S[self._factor_rows(range(self.state_size))]
+        return S @ S.T
+
+    @P.setter
+    def P(self, value):
+        rows = self._factor_rows(range(self.state_size))
+        P_factor_order = np.empty_like(value)
+        P_factor_order[np.ix_(rows, rows)] = value
+        self.S[:] = _lower_factor(P_factor_order)
+
+    def covariance(self, cols):
+        S = self.S[self._factor_rows(cols)]
+        return S @ S.T
+
+    def _marginal_blocks(self, rows):
+        # Each block only needs its two factor rows: O(N) per block instead of forming P
+        idx = np.asarray(rows, dtype=int)[:, None] + np.arange(2)
+        S = self.S[self._factor_rows(idx.ravel())].reshape(len(idx), 2, self.state_size)
+        return S @ S.transpose(0, 2, 1)
+
+    def predict(self, v, w, dt):
+        a, b = self._predict_pose(v, w, dt)
+        m = self.state_size - 3
+        S = self._P
+        # F S only mixes the robot rows...
+        S[m, :m+3] += a * S[m+2, :m+3]
+        S[m+1, :m+3] += b * S[m+2, :m+3]
+        # ...which leaves the trailing 3x3 block non-triangular; Q is folded in with it
+        block = np.hstack([S[m:m+3, m:m+3], np.diag(np.sqrt(self._process_noise(dt)))])
+        S[m:m+3, m:m+3] = _triangularize(block)
+
+    def _initialize_landmark(self, lm_id, r, bearing):
+        n = self.state_size
+        m = n - 3
+        Gr, Gz = self._place_landmark(r, bearing)
+        S = self._P
+        # New order [landmarks, new landmark, robot]. The new landmark is
+        # Gr x_robot + Gz v, so its rows are Gr times the robot rows plus
+        # two new noise columns; only the trailing 5x5 block needs fixing up.
+        robot = S[m:m+3, :m+3].copy()
+        S[:m, m:m+5] = 0.0
+        S[m:m+2, :m+3] = Gr @ robot
+        S[m:m+2, m+3:m+5] = Gz @ self._meas_noise_half
+        S[m+2:m+5, :m+3] = robot
+        S[m+2:m+5, m+3:m+5] = 0.0
+        S[m:m+5, m:m+5] = _triangularize(S[m:m+5, m:m+5])
+        self._register_landmark(lm_id)
+
+    def remove_landmark(self, lm_id):
+        # Rare (pruned tentative landmarks): remove in covariance form and re-factor
+        n = self.state_size
+        self._P[:n, :n] = self.P
+        super().remove_landmark(lm_id)
+        n = self.state_size
+        P = self._P[:n, :n].copy()
+        self.P = P
+
+    def update(self, lm_id, z):
+        self.update_batch([(lm_id, z)])
+
+    def update_batch(self, measurements):
+        """
+        Triangularize the pre-array [[R^1/2, H S], [0, S]] into
+        [[Sigma^1/2, 0], [Kbar, S+]]: S+ is the updated factor and
+        Kbar Sigma^-1/2 the Kalman gain, without ever forming P.
+        """
+        observed = self._split_frame(measurements)
+        k = len(observed)
+        if k == 0:
+            return
+
+        X = self.X
+        n = self.state_size
+        m = n - 3
+        S = self.S
+        idx, y_res, Hr, Hl = self._stacked_observation(observed)
+        lm_rows = np.stack([idx - 3, idx - 2], axis=1).ravel()
+
+        HS = Hr @ S[m:m+3, :] + np.einsum('irc,icn->irn', Hl, S[lm_rows].reshape(k, 2, n)).reshape(2*k, n)
+        A = np.zeros((2*k + n, 2*k + n))
+        A[:2*k, :2*k] = np.kron(np.eye(k), self._meas_noise_half)
+        A[:2*k, 2*k:] = HS
+        A[2*k:, 2*k:] = S
+        B = _triangularize(A)
+
+        dx = B[2*k:, :2*k] @ np.linalg.solve(B[:2*k, :2*k], y_res.reshape(2*k))
+        X[3:, 0] += dx[:m]
+        X[0:3, 0] += dx[m:]
+        X[2,0] = normalize_angle(X[2,0])
+        S[:] = B[2*k:, 2*k:]
+
+class InformationFilter(EKF):
+    """
+    Sparse Extended Information Filter (SEIF): carries the information
+    matrix Omega = P^-1 next to the mean instead of P, as a scipy.sparse
+    matrix (a dense array when SciPy is not installed).
+
+    Measurements and new landmarks only add into the 5x5 block of the
+    robot and the landmark involved, and the motion update only touches
+    the robot and the landmarks linked to it (the active ones). Once more
+    than `max_active` landmarks are active, the least recently observed
+    are deactivated by SEIF sparsification, which cuts their links to the
+    robot, so updates work on a block of bounded size and Omega keeps
+    O(N) non-zeros. Landmarks observed since the last prediction are never
+    deactivated, so a frame with more than `max_active` in view exceeds it.
+
+    The mean is recovered approximately: the filter keeps the information
+    residual r = xi - Omega mu, runs `mean_iterations` conjugate-gradient
+    iterations on it over the whole map, warm-started from the previous
+    mean, then solves it exactly over the robot and the active landmarks
+    (None: one sparse direct solve instead). Covariances are computed on
+    request from a factorization of Omega that is cached until the next
+    update; P is the full inverse, for diagnostics only.
+    """
+
+    def __init__(self, pose, motion_noise=MOTION_NOISE, meas_noise=MEAS_NOISE,
+                 update_mode=UPDATE_MODE, capacity=EKF_INITIAL_CAPACITY, initial_pose_cov=INITIAL_POSE_COV,
+                 max_active=EIF_ACTIVE_LANDMARKS, mean_iterations=EIF_MEAN_ITERATIONS):
+        # Omega replaces the dense P buffer, so only the mean is preallocated
+        super().__init__(pose, motion_noise, meas_noise, update_mode, 0, initial_pose_cov=initial_pose_cov)
+        self._X = np.zeros((3 + 2 * capacity, 1))
+        self._X[0:3, 0] = pose
+        self._P = None
+        self.max_active = max_active
+        self.mean_iterations = mean_iterations
+        self._meas_information = np.linalg.inv(np.asarray(meas_noise))
+        self._set_information(np.linalg.inv(np.asarray(initial_pose_cov, dtype=float)))
+
+    def _set_information(self, Omega):
+        """Replace Omega, taking the current mean as exact"""
+        self._omega = sparse.csr_matrix(Omega) if sparse is not None else np.array(Omega, dtype=float)
+        self._residual = np.zeros(self.state_size)         # r = xi - Omega mu, the mean not yet recovered
+        self._last_seen = np.zeros(self.num_landmarks)     # Per landmark slot: step it was last observed in
+        self._steps = 0                                    # Motion updates so far
+        self._solver = None                                # Cached solve with Omega, dropped when it changes
+
+    @property
+    def Omega(self):
+        return self._omega
+
+    @EKF.X.setter
+    def X(self, value):
+        self._X[:self.state_size] = value
+        self._residual[:] = 0.0
+
+    @property
+    def P(self):
+        """Full covariance, a dense inverse of Omega: use covariance() for parts of it"""
+        return self._solve(np.eye(self.state_size))
+
+    @P.setter
+    def P(self, value):
+        self._set_information(np.linalg.inv(value))
+
+    def _grow(self, size):
+        n = self.state_size
+        X_new = np.zeros((max(size, 2 * self._X.shape[0] - 3), 1))
+        X_new[:n] = self._X[:n]
+        self._X = X_new
+
+    def _rows(self, idx):
+        """Non-zeros of Omega[idx, :] as (position in idx, column, value) arrays"""
+        Om = self._omega
+        if sparse is None:
+            row, col = np.nonzero(Om[idx])
+            return row, col, Om[np.asarray(idx)[row], col]
+        # Read straight from the CSR arrays: scipy's fancy indexing costs more than the small blocks used here
+        start = Om.indptr[idx]
+        count = Om.indptr[np.asarray(idx) + 1] - start
+        row = np.repeat(np.arange(len(count)), count)
+        pos = np.arange(len(row)) + np.repeat(start - (np.cumsum(count) - count), count)
+        return row, Om.indices[pos], Om.data[pos]
+
+    def _block(self, idx, rows=None):
+        """Dense Omega[idx, idx] for sorted indices, from _rows(idx) when given"""
+        row, col, val = self._rows(idx) if rows is None else rows
+        at = np.minimum(np.searchsorted(idx, col), len(idx) - 1)
+        inside = idx[at] == col
+        block = np.zeros((len(idx), len(idx)))
+        block[row[inside], at[inside]] = val[inside]
+        return block
+
+    def _times(self, rows, v):
+        """Omega[:, idx] @ v from rows = _rows(idx) (Omega is symmetric)"""
+        row, col, val = rows
+        return np.bincount(col, weights=val * v[row], minlength=self.state_size)
+
+    def _add(self, idx, delta):
+        """Omega[idx, idx] += delta, for sorted unique indices"""
+        self._solver = None
+        if sparse is None:
+            self._omega[np.ix_(idx, idx)] += delta
+            return
+        # Built directly in CSR form: row idx[i] holds delta[i] in columns idx
+        n, k = self._omega.shape[0], len(idx)
+        indptr = np.zeros(n + 1, dtype=np.int32)
+        indptr[np.asarray(idx) + 1] = k
+        self._omega = self._omega + sparse.csr_matrix(
+            (delta.ravel(), np.tile(idx, k).astype(np.int32), np.cumsum(indptr, dtype=np.int32)), shape=(n, n))
+
+    def _resize(self, n):
+        self._solver = None
+        if sparse is None:
+            m = self._omega.shape[0]
+            self._omega = np.pad(self._omega[:n, :n], (0, max(n - m, 0)))
+        else:
+            self._omega.resize((n, n))
+
+    def _linked(self):
+        """Sorted state indices with an Omega entry in the robot rows: the robot and the active landmarks"""
+        cols = self._rows(np.arange(3))[1]
+        lm = cols[cols >= 3]
+        starts = np.unique(lm - (lm - 3) % 2)  # Both coordinates of a landmark linked through either
+        return np.concatenate([[0, 1, 2], np.stack([starts, starts + 1], axis=1).ravel()])
+
+    def _solve(self, B):
+        """Omega^-1 B through a factorization kept until Omega changes"""
+        if self._solver is None:
+            if sparse is None:
+                Omega = self._omega.copy()
+                self._solver = lambda B: np.linalg.solve(Omega, B)
+            else:
+                # Omega is symmetric positive definite: pivot on the diagonal, as posegraph.py does
+                self._solver = sparse_linalg.splu(self._omega.tocsc(), permc_spec="MMD_AT_PLUS_A",
+                                                  diag_pivot_thresh=0.0, options={"SymmetricMode": True}).solve
+        return self._solver(B)
+
+    def covariance(self, cols):
+        E = np.zeros((self.state_size, len(cols)))
+        E[cols, np.arange(len(cols))] = 1.0
+        return self._solve(E)[cols]
+
+    def _marginal_blocks(self, rows):
+        idx = np.asarray(rows, dtype=int)[:, None] + np.arange(2)
+        blocks = np.empty((len(idx), 2, 2))
+        for start in range(0, len(idx), 256):  # A few hundred landmarks' columns at a time
+            chunk = idx[start:start+256]
+            k = len(chunk)
+            E = np.zeros((self.state_size, 2 * k))
+            E[chunk.ravel(), np.arange(2 * k)] = 1.0
+            Y = self._solve(E).reshape(self.state_size, k, 2)
+            blocks[start:start+k] = Y[chunk, np.arange(k)[:, None]]
+        return blocks
+
+    def predict(self, v, w, dt):
+        a, b = self._predict_pose(v, w, dt)
+        self._steps += 1
+        # Only the robot rows/columns change, and they are zero outside the linked block
+        linked = self._linked()
+        Om = self._block(linked)
+        Phi = Om.copy()
+        # Phi = F^-T Omega F^-1 with F^-1 = I - a e0 e2^T - b e1 e2^T
+        Phi[:, 2] -= a * Phi[:, 0] + b * Phi[:, 1]
+        Phi[2, :] -= a * Phi[0, :] + b * Phi[1, :]
+        # Both halves are rounded differently; the Woodbury step below would
+        # amplify that asymmetry, so mirror the robot rows onto the columns
+        Phi[:, 0:3] = Phi[0:3, :].T
+        if dt > 0:
+            # (Phi^-1 + Q)^-1 = Phi - Phi[:, r] (Q^-1 + Phi[r, r])^-1 Phi[r, :]
+            Phi_r = Phi[0:3, :]
+            C = Phi_r.T @ np.linalg.solve(np.diag(1.0 / self._process_noise(dt)) + Phi[0:3, 0:3], Phi_r)
+            Phi -= (C + C.T) / 2
+        # The residual xi - Omega mu is unchanged by the motion update
+        self._add(linked, Phi - Om)
+
+    def _initialize_landmark(self, lm_id, r, bearing):
+        n = self.state_size
+        Gr, Gz = self._place_landmark(r, bearing)
+        self._resize(n + 2)
+        # The new landmark is tied to the pose by x_lm - Gr x_robot ~ N(., Gz R Gz^T)
+        J = np.hstack([-Gr, np.eye(2)])
+        self._add(np.array([0, 1, 2, n, n+1]), J.T @ np.linalg.solve(Gz @ self.meas_noise @ Gz.T, J))
+        self._residual = np.append(self._residual, [0.0, 0.0])
+        self._last_seen = np.append(self._last_seen, self._steps)
+        self._register_landmark(lm_id)
+
+    def remove_landmark(self, lm_id):
+        # Marginalize the landmark out (Schur complement); only its neighbours in Omega change
+        idx = self.landmark_index[lm_id]
+        n = self.state_size
+        lm = np.array([idx, idx+1])
+        cols = np.union1d(self._rows(lm)[1], lm)
+        block = self._block(cols)
+        at = np.searchsorted(cols, lm)
+        others = np.delete(np.arange(len(cols)), at)
+        A, B = block[np.ix_(others, at)], block[np.ix_(at, at)]
+        self._add(cols[others], -A @ np.linalg.solve(B, A.T))
+        self._residual[cols[others]] -= A @ np.linalg.solve(B, self._residual[lm])
+
+        # Move the last landmark into the freed slot, as the base class does with the mean
+        keep = np.arange(n)
+        keep[idx:idx+2] = [n-2, n-1]
+        keep = keep[:n-2]
+        self._omega = self._omega[keep][:, keep] if sparse is not None else self._omega[np.ix_(keep, keep)]
+        self._residual = self._residual[keep]
+        slot = (idx - 3) // 2
+        self._last_seen[slot] = self._last_seen[-1]
+        self._last_seen = self._last_seen[:-1]
+        super().remove_landmark(lm_id)
+
+    def _move_slot(self, src, dst):
+        self._X[dst:dst+2] = self._X[src:src+2]
+
+    def correct(self, measurements):
+        if self.update_mode == "batched":
+            self._fuse(measurements)
+            return
+        # A first sighting is initialized from the pose corrected by the measurements before it, as in the EKF
+        run = []
+        for lm_id, z in measurements:
+            if lm_id not in self.landmark_index and run:
+                self._fuse(run, sequential=True)
+                run = []
+            run.append((lm_id, z))
+        self._fuse(run, sequential=True)
+
+    def update(self, lm_id, z):
+        self._fuse([(lm_id, z)])
+
+    def update_batch(self, measurements):
+        self._fuse(measurements)
+
+    def _fuse(self, measurements, sequential=False):
+        """
+        Omega += H^T R^-1 H and r += H^T R^-1 y per measurement, then
+        sparsify and recover the mean. A frame only touches the block of
+        the robot, the active and the observed landmarks, so that block is
+        updated densely and written back into Omega once. In sequential
+        mode the block mean is re-solved after each measurement, so the
+        next one is linearized about it.
+        """
+        if not measurements:
+            return
+        observed = self._split_frame(measurements)
+        cols = self._linked()
+        if observed:
+            lm = np.array([j for j, _ in observed])
+            cols = np.union1d(cols, np.concatenate([lm, lm + 1]))
+        rows = self._rows(cols)
+        Om = self._block(cols, rows)
+        block = Om.copy()
+        r = self._residual[cols]
+        X = self.X[:, 0]
+        moved = np.zeros(len(cols))
+        for group in ([[m] for m in observed] if sequential else [observed] if observed else []):
+            idx, y_res, Hr, Hl = self._stacked_observation(group)
+            at = np.searchsorted(cols, idx)
+            for i in range(len(idx)):
+                H = np.hstack([Hr[2*i:2*i+2], Hl[i]])
+                HtRinv = H.T @ self._meas_information
+                state = [0, 1, 2, at[i], at[i]+1]
+                block[np.ix_(state, state)] += HtRinv @ H
+                r[state] += HtRinv @ y_res[i]
+            self._last_seen[(idx - 3) // 2] = self._steps
+            if sequential:
+                d = np.linalg.solve(block, r)
+                X[cols] += d
+                X[2] = normalize_angle(X[2])
+                r -= block @ d
+                moved += d
+        self._sparsify(cols, block)
+        self._add(cols, block - Om)
+        # Omega outside the block is unchanged, so moving the block mean only shifts the residual there
+        self._residual -= self._times(rows, moved)
+        self._residual[cols] = r
+
+        r = self._residual
+        if self.mean_iterations is None:
+            X += self._solve(r)
+            r[:] = 0.0
+        else:
+            # A few CG iterations over the whole map, warm-started from the current mean...
+            if self.mean_iterations > 0:
+                d = self._conjugate_gradient(r, self.mean_iterations)
+                X += d
+                r -= self._omega @ d
+            # ...then exact over the block, which leaves no residual on the robot for the next prediction
+            d = np.linalg.solve(block, r[cols])
+            X[cols] += d
+            r -= self._times(rows, d)
+            r[cols] -= (block - Om) @ d
+        X[2] = normalize_angle(X[2])
+
+    def _sparsify(self, cols, block):
+        """
+        Deactivate the least recently observed landmarks beyond max_active,
+        in the dense Omega[cols, cols] block holding the robot and every
+        active landmark. With x the robot and m0 those landmarks, the SEIF
+        approximation replaces Omega by the marginal over (x, m0)
+        conditioned as if x and m0 were independent given the rest:
+            Omega += S(x, m0) - S(m0) - S(x),  S(s) = Omega[:, s] Omega[s, s]^-1 Omega[s, :]
+        which zeroes Omega[x, m0].
+        """
+        seen = self._last_seen[(cols[3::2] - 3) // 2]
+        # Landmarks observed since the last motion update stay active even past max_active
+        excess = min(len(seen) - self.max_active, np.count_nonzero(seen < self._steps))
+        if excess <= 0:
+            return
+        order = np.argsort(seen, kind="stable")
+        x = np.arange(3)
+        m0 = 3 + 2 * np.sort(order[:excess])
+        m0 = np.stack([m0, m0 + 1], axis=1).ravel()
+        Om = block.copy()
+
+        def schur(s):
+            return Om[:, s] @ np.linalg.solve(Om[np.ix_(s, s)], Om[s, :])
+
+        delta = schur(np.concatenate([x, m0])) - schur(m0) - schur(x)
+        block += (delta + delta.T) / 2
+        # Zero in exact arithmetic; cleared exactly so the links leave the sparsity pattern
+        block[np.ix_(x, m0)] = 0.0
+        block[np.ix_(m0, x)] = 0.0
+
+    def _conjugate_gradient(self, b, iterations):
+        """Approximate Omega^-1 b from a few Jacobi-preconditioned CG iterations"""
+        Om = self._omega
+        inv_diag = 1.0 / Om.diagonal()
+        d = np.zeros_like(b)
+        r = b.copy()
+        z = inv_diag * r
+        p = z.copy()
+        rz = r @ z
+        for _ in range(iterations):
+            Ap = Om @ p
+            pAp = p @ Ap
+            if rz <= 0.0 or pAp <= 0.0:
+                break
+            alpha = rz / pAp
+            d += alpha * p
+            r -= alpha * Ap
+            z = inv_diag * r
+            rz, rz_old = r @ z, rz
+            p = z + (rz / rz_old) * p
+        return d
+
+# Backend name -> constructor taking (pose, motion_noise, meas_noise, update_mode, capacity, initial_pose_cov)
+FILTERS = {
+    "ekf": EKF,
+    "joseph": functools.partial(EKF, covariance_update="joseph"),
+    "sqrt": SquareRootEKF,
+    "eif": InformationFilter,
+    "submap": SubmapEKF,
+    "fastslam1": functools.partial(FastSLAM, version=1),
+    "fastslam2": functools.partial(FastSLAM, version=2),
+}
+
+def ekf_backends():
+    """Names of the FILTERS backends that keep a Gaussian (X, P) state: the EKF family"""
+    return [name for name, factory in FILTERS.items() if issubclass(getattr(factory, "func", factory), EKF)]
+
+def make_filter(pose, backend=FILTER_BACKEND, **kwargs):
+    """
+    Build the EKF-SLAM backend selected by name (see FILTERS). Every
+    backend starts from the same pose prior, initial_pose_cov (default
+    INITIAL_POSE_COV), so their results stay comparable.
+    """
+    if backend not in FILTERS:
+        raise ValueError(f"Unknown filter backend: {backend} (expected one of {', '.join(FILTERS)})")
+    kwargs.setdefault("initial_pose_cov", INITIAL_POSE_COV)
+    return FILTERS[backend](pose, **kwargs)
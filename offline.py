@@ -0,0 +1,198 @@
+# offline.py
+"""
+Streaming EKF-SLAM over recorded odometry + range/bearing data.
+
+Input is read lazily, frame by frame, and filtered poses are emitted as
+they are computed, so arbitrarily long datasets run at CPU speed in
+constant memory (the filter state only grows with the number of mapped
+landmarks). Sources:
+
+  CSV (a file, or "-" for stdin), one record per line:
+      pose,x,y,theta[,t]         optional first line: start pose (and its timestamp)
+      odom,t,v,w                 starts a frame: timestamp and (v, omega) since the last one
+      meas,lm_id,range,bearing   measurement of the current frame (empty lm_id: anonymous)
+  NPZ with arrays
+      odom (N, 3)                t, v, w per frame
+      meas_frame (M,)            frame index of each measurement
+      meas_id (M,)               landmark ids ("" for anonymous)
+      meas_z (M, 2)              range, bearing
+      start_pose (3,) or (4,)    optional: x, y, theta[, t]
+  A run-log directory written by recorder.py (memory-mapped).
+
+Examples:
+    python offline.py run.log -o poses.csv --landmarks map.csv
+    cat field.csv | python offline.py - --every 10 > poses.csv
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import namedtuple
+import numpy as np
+from config import *
+from filters import FILTERS, make_filter
+from association import DataAssociator
+
+Frame = namedtuple("Frame", "t dt v w measurements")  # measurements: [(lm_id or None, (range, bearing)), ...]
+Estimate = namedtuple("Estimate", "step t x y theta num_landmarks")
+
+def read_csv(file):
+    """(start pose or None, lazy Frame iterator) for a CSV stream"""
+    rows = (row for row in csv.reader(file) if row and not row[0].startswith("#"))
+    first = next(rows, None)
+    start_pose = t_start = None
+    if first is not None and first[0] == "pose":
+        start_pose = tuple(float(c) for c in first[1:4])
+        if len(first) > 4:
+            t_start = float(first[4])
+        first = None
+
+    def frames():
+        t_prev, frame = t_start, None
+        pending = [first] if first is not None else []
+        for row in (r for source in (pending, rows) for r in source):
+            kind = row[0]
+            if kind == "odom":
+                if frame is not None:
+                    yield frame
+                t, v, w = float(row[1]), float(row[2]), float(row[3])
+                frame = Frame(t, 0.0 if t_prev is None else t - t_prev, v, w, [])
+                t_prev = t
+            elif kind == "meas":
+                if frame is None:
+                    raise ValueError("meas record before the first odom record")
+                frame.measurements.append((row[1] or None, (float(row[2]), float(row[3]))))
+            elif kind != "kind":  # Tolerate a header line
+                raise ValueError(f"Unknown record type {kind!r}")
+        if frame is not None:
+            yield frame
+
+    return start_pose, frames()
+
+def _frames_from_arrays(t, dt, v, w, meas_frame, meas_label, id_names, meas_z, chunk_size):
+    """
+    Frames from column arrays (possibly memory-mapped), converted to Python
+    objects one chunk at a time. Measurement ids are id_names[meas_label],
+    with "" for anonymous measurements.
+    """
+    for lo in range(0, len(t), chunk_size):
+        hi = min(lo + chunk_size, len(t))
+        starts = np.searchsorted(meas_frame, np.arange(lo, hi + 1))
+        m0, m1 = starts[0], starts[-1]
+        ids = [i or None for i in id_names[np.asarray(meas_label[m0:m1])].tolist()]
+        zs = np.asarray(meas_z[m0:m1]).tolist()
+        starts = (starts - m0).tolist()
+        columns = (np.asarray(c[lo:hi]).tolist() for c in (t, dt, v, w))
+        for k, (tk, dtk, vk, wk) in enumerate(zip(*columns)):
+            yield Frame(tk, dtk, vk, wk, [(ids[j], tuple(zs[j])) for j in range(starts[k], starts[k + 1])])
+
+def read_npz(path, chunk_size=OFFLINE_CHUNK):
+    """
+    (start pose or None, lazy Frame iterator) for an .npz dataset. Each
+    array is loaded whole (npz members cannot be memory-mapped); use a
+    run log for datasets larger than memory.
+    """
+    data = np.load(path)
+    odom = data["odom"]
+    t = odom[:, 0]
+    start = data["start_pose"].tolist() if "start_pose" in data else None
+    dt = np.diff(t, prepend=start[3] if start and len(start) > 3 else t[:1])
+    start_pose = tuple(start[:3]) if start else None
+    id_names, meas_label = np.unique(data["meas_id"].astype(str), return_inverse=True)
+    frames = _frames_from_arrays(t, dt, odom[:, 1], odom[:, 2], data["meas_frame"],
+                                 meas_label, id_names, data["meas_z"], chunk_size)
+    return start_pose, frames
+
+def read_log(path, chunk_size=OFFLINE_CHUNK):
+    """(start pose, lazy Frame iterator) for a recorder.py run log; clutter records are anonymous"""
+    from recorder import RunLog
+    log = RunLog(path)
+    steps, meas = log.steps, log.measurements
+    # Landmark index -1 (clutter) wraps around to the trailing ""
+    id_names = np.array(log.landmark_ids + [""])
+    frames = _frames_from_arrays(steps["t"], steps["dt"], steps["odom_input"][:, 0], steps["odom_input"][:, 1],
+                                 meas["step"], meas["landmark"], id_names, meas["z"], chunk_size)
+    return tuple(log.meta["start_pose"]), frames
+
+def open_source(source, chunk_size=OFFLINE_CHUNK):
+    """(start pose or None, lazy Frame iterator) for a path, or "-" for CSV on stdin"""
+    if source == "-":
+        return read_csv(sys.stdin)
+    if os.path.isdir(source):
+        return read_log(source, chunk_size)
+    if source.endswith(".npz"):
+        return read_npz(source, chunk_size)
+    return read_csv(open(source, newline=""))
+
+def process(frames, ekf, associator=None):
+    """
+    Filter a Frame stream, yielding an Estimate after every frame.
+    Measurements with an id update that landmark directly; anonymous ones
+    go through `associator` (and are skipped without one).
+    """
+    for step, frame in enumerate(frames):
+        ekf.predict(frame.v, frame.w, frame.dt)
+        known = [(lm_id, z) for lm_id, z in frame.measurements if lm_id is not None]
+        if known:
+            ekf.correct(known)
+        if associator is not None:
+            anonymous = [z for lm_id, z in frame.measurements if lm_id is None]
+            if anonymous:
+                associator.correct(anonymous)
+        x, y, theta = ekf.pose
+        yield Estimate(step, frame.t, x, y, theta, ekf.num_landmarks)
+
+def landmark_estimates(ekf):
+    """Lazily yield (lm_id, x, y) for every mapped landmark"""
+    for lm_id in ekf.landmark_ids:
+        yield (lm_id, *ekf.landmark_estimate(lm_id))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help='CSV / NPZ file, recorder.py log directory, or "-" for CSV on stdin')
+    parser.add_argument("-o", "--output", help="Pose CSV (default: stdout)")
+    parser.add_argument("--landmarks", help="Write the final landmark estimates to this CSV")
+    parser.add_argument("--every", type=int, default=1, help="Only write every N-th pose")
+    parser.add_argument("--start-pose", type=float, nargs=3, help="Overrides the source's start pose")
+    parser.add_argument("--update-mode", choices=["sequential", "batched"], default=UPDATE_MODE)
+    parser.add_argument("--backend", choices=list(FILTERS), default=FILTER_BACKEND, help="EKF-SLAM filter variant")
+    parser.add_argument("--anonymous", action="store_true",
+                        help="Ignore ids and run data association (otherwise anonymous measurements are skipped)")
+    parser.add_argument("--joint", action="store_true", help="JCBC instead of nearest-neighbour association")
+    parser.add_argument("--chunk", type=int, default=OFFLINE_CHUNK, help="Frames converted per chunk")
+    args = parser.parse_args()
+
+    start_pose, frames = open_source(args.source, args.chunk)
+    start_pose = tuple(args.start_pose or start_pose or (0.0, 0.0, 0.0))
+    ekf = make_filter(start_pose, args.backend, update_mode=args.update_mode)
+    associator = None
+    if args.anonymous:
+        associator = DataAssociator(ekf, joint=args.joint or JOINT_COMPATIBILITY)
+        frames = (f._replace(measurements=[(None, z) for _, z in f.measurements]) for f in frames)
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = csv.writer(out)
+    writer.writerow(Estimate._fields)
+    start = time.perf_counter()
+    count = 0
+    for estimate in process(frames, ekf, associator):
+        count += 1
+        if estimate.step % args.every == 0:
+            writer.writerow([estimate.step, f"{estimate.t:.6f}", f"{estimate.x:.6f}", f"{estimate.y:.6f}",
+                             f"{estimate.theta:.6f}", estimate.num_landmarks])
+    elapsed = time.perf_counter() - start
+    if args.output:
+        out.close()
+
+    if args.landmarks:
+        with open(args.landmarks, "w", newline="") as f:
+            lm_writer = csv.writer(f)
+            lm_writer.writerow(["lm_id", "x", "y"])
+            for lm_id, x, y in landmark_estimates(ekf):
+                lm_writer.writerow([lm_id, f"{x:.6f}", f"{y:.6f}"])
+    print(f"Processed {count} frames in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.0f} frames/s), "
+          f"{ekf.num_landmarks} landmarks", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# overlays.py
+import numpy as np
+import pygame
+from config import *
+
+ROBOT = None  # Overlay key of the robot's position block (landmark ids are strings)
+
+def ellipse_outlines(covs, sigma=ELLIPSE_SIGMA, segments=ELLIPSE_SEGMENTS):
+    """
+    Outlines of the sigma-ellipses of (N, 2, 2) covariances, centred on the
+    origin: (N, segments, 2) offsets and the (N,) semi-major axes. All the
+    eigendecompositions are one batched eigh call.
+    """
+    values, vectors = np.linalg.eigh(covs)
+    axes = sigma * np.sqrt(np.clip(values, 0.0, None))
+    t = np.linspace(0.0, 2 * np.pi, segments, endpoint=False)
+    circle = np.stack([np.cos(t), np.sin(t)], axis=1)
+    return np.einsum("sk,nk,njk->nsj", circle, axes, vectors), axes[:, 1]
+
+class CovarianceOverlay:
+    """
+    Uncertainty ellipses of the robot position and every mapped landmark.
+
+    update(ekf) pulls the 2x2 marginal blocks out of the filter each frame,
+    but an ellipse is only recomputed when its block changed by more than
+    `tolerance` (relative Frobenius norm) since it was last computed;
+    otherwise the cached outline is reused and just moved to the current
+    mean. Landmarks that stopped being observed settle quickly, so in a
+    large map almost every outline comes from the cache. draw() culls the
+    ellipses against the camera view before converting them to pixels.
+    """
+
+    def __init__(self, sigma=ELLIPSE_SIGMA, segments=ELLIPSE_SEGMENTS, tolerance=ELLIPSE_TOLERANCE,
+                 robot_color=GREEN, landmark_color=PURPLE):
+        self.sigma = sigma
+        self.segments = segments
+        self.tolerance = tolerance
+        self.robot_color = robot_color
+        self.landmark_color = landmark_color
+        self.ids = []
+        self.means = np.empty((0, 2))
+        self._covs = np.empty((0, 2, 2))      # Blocks the cached outlines were computed from
+        self._outlines = np.empty((0, segments, 2))
+        self._radii = np.empty(0)
+        self.recomputed = 0  # Outlines recomputed by the last update
+
+    def update(self, ekf):
+        ids, means, covs = ekf.landmark_marginals()
+        x, y, _ = ekf.pose
+        ids = [ROBOT] + ids
+        means = np.concatenate([[[x, y]], means.reshape(-1, 2)])
+        covs = np.concatenate([ekf.pose_covariance()[None, :2, :2], covs.reshape(-1, 2, 2)])
+
+        # Line the cached blocks up with the new order (usually unchanged, or grown at the end)
+        if ids[:len(self.ids)] == self.ids:
+            old = np.arange(len(ids))
+            old[len(self.ids):] = -1
+        else:
+            previous = {lm_id: i for i, lm_id in enumerate(self.ids)}
+            old = np.array([previous.get(lm_id, -1) for lm_id in ids])
+        cached = old >= 0
+        prev_covs = np.zeros_like(covs)
+        prev_covs[cached] = self._covs[old[cached]]
+        outlines = np.empty((len(ids), self.segments, 2))
+        outlines[cached] = self._outlines[old[cached]]
+        radii = np.empty(len(ids))
+        radii[cached] = self._radii[old[cached]]
+
+        change = np.linalg.norm(covs - prev_covs, axis=(1, 2))
+        stale = ~cached | (change > self.tolerance * np.linalg.norm(prev_covs, axis=(1, 2)))
+        if stale.any():
+            outlines[stale], radii[stale] = ellipse_outlines(covs[stale], self.sigma, self.segments)
+            prev_covs[stale] = covs[stale]
+
+        self.ids, self.means = ids, means
+        self._covs, self._outlines, self._radii = prev_covs, outlines, radii
+        self.recomputed = int(stale.sum())
+
+    def polygons(self):
+        """(N, segments, 2) world-frame ellipse outlines, the robot first"""
+        return self.means[:, None, :] + self._outlines
+
+    def draw(self, screen, camera):
+        """Draw the ellipses inside the view; ones under a pixel across are skipped"""
+        extent = self._radii[:, None]
+        visible = camera.segments_visible(self.means - extent, self.means + extent)
+        visible &= self._radii * camera.scale >= 1.0
+        rows = np.flatnonzero(visible)
+        if not len(rows):
+            return
+        pixels = camera.to_screen_array((self.means[rows, None, :] + self._outlines[rows]).reshape(-1, 2))
+        for row, polygon in zip(rows, pixels.reshape(len(rows), self.segments, 2).tolist()):
+            color = self.robot_color if row == 0 else self.landmark_color
+            pygame.draw.lines(screen, color, True, polygon, 1)
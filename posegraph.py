@@ -0,0 +1,380 @@
+# posegraph.py
+"""
+Offline graph-SLAM smoothing of recorded odometry + range/bearing data.
+
+Every frame of the source becomes a pose variable. It is linked to the
+previous pose by an odometry factor built from the same (v, w, dt) and
+motion noise that the EKF prediction uses, and to each landmark it
+measured by a range/bearing factor. The whole trajectory and map are
+then solved jointly with sparse Gauss-Newton or Levenberg-Marquardt.
+The normal equations are as sparse as the graph, so solve time grows
+near-linearly with trajectory length, while the EKF's state and update
+cost grow quadratically with the map.
+
+The graph is also solved every --incremental frames while it is built.
+Odometry alone is a poor starting point for a long run (one batch solve
+from dead reckoning can settle in a local minimum); solving as it grows
+keeps every new pose close to the optimum, and the cached Jacobians
+keep the repeated relinearization cheap.
+
+Sources are the same as offline.py (CSV, NPZ, or a recorder.py log).
+Measurements without a landmark id are skipped. For a log, the smoothed
+and recorded EKF trajectories are both scored against ground truth.
+
+Examples:
+    python posegraph.py run.log -o smoothed.csv --landmarks map.csv
+    python posegraph.py run.log --incremental 0 --method gn --solver cg
+"""
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from collections import namedtuple
+import numpy as np
+from config import *
+from geometry import normalize_angle
+from offline import open_source
+
+try:
+    import scipy.sparse as sparse
+    import scipy.sparse.linalg as sparse_linalg
+except ImportError:  # Without SciPy the normal equations are solved densely (short runs only)
+    sparse = sparse_linalg = None
+
+SolveStats = namedtuple("SolveStats", "iterations initial_cost cost relinearized seconds")
+
+class PoseGraph:
+    """
+    Factor graph of robot poses (N, 3) and landmarks (L, 2) with a prior
+    on the first pose, odometry factors between consecutive poses and
+    range/bearing factors. Residuals and Jacobians of each factor type
+    are evaluated for all factors at once with NumPy.
+
+    Frames can be added while optimizing (add_frame / optimize). New
+    poses start from the odometry prediction off the latest estimate,
+    new landmarks from their first sighting. Relinearization is
+    incremental: Jacobians are cached, and only the factors touching a
+    variable that moved more than `relinearize_threshold` since its last
+    linearization are re-evaluated.
+    """
+
+    def __init__(self, start_pose, motion_noise=MOTION_NOISE, meas_noise=MEAS_NOISE,
+                 prior_std=POSEGRAPH_PRIOR_STD, relinearize_threshold=POSEGRAPH_RELINEARIZE):
+        self.start_pose = np.asarray(start_pose, dtype=float)
+        self.relinearize_threshold = relinearize_threshold
+        # Square-root information (whitening) of each factor type
+        self._prior_w = np.full(3, 1.0 / prior_std)
+        self._odom_w = 1.0 / np.sqrt(np.asarray(motion_noise, dtype=float))  # Per SIM_DT; see _odom_weights
+        self._meas_w = np.linalg.inv(np.linalg.cholesky(np.asarray(meas_noise, dtype=float)))
+
+        self.poses = self.start_pose[None, :].copy()
+        self.landmarks = np.empty((0, 2))
+        self.landmark_ids = []
+        self.landmark_index = {}
+        self.odom = np.empty((0, 3))           # (v, w, dt) of the factor from pose k to k + 1
+        self.meas_pose = np.empty(0, dtype=int)
+        self.meas_landmark = np.empty(0, dtype=int)
+        self.meas_z = np.empty((0, 2))
+        self._pending_poses, self._pending_odom, self._pending_landmarks, self._pending_meas = [], [], [], []
+
+        # Linearization cache
+        self._lin_poses = np.empty((0, 3))
+        self._lin_landmarks = np.empty((0, 2))
+        self._odom_jacobians = np.empty((0, 3, 3))  # Whitened d(residual)/d(previous pose)
+        self._meas_jacobians = np.empty((0, 2, 5))  # Whitened d(residual)/d(pose, landmark)
+        self._lambda = POSEGRAPH_INITIAL_LAMBDA
+
+    @property
+    def num_poses(self):
+        return len(self.poses) + len(self._pending_poses)
+
+    @property
+    def num_landmarks(self):
+        return len(self.landmark_ids)
+
+    def add_frame(self, v, w, dt, measurements):
+        """Add a pose after odometry (v, w, dt) and its (lm_id, (range, bearing)) measurements"""
+        x, y, theta = self._pending_poses[-1] if self._pending_poses else self.poses[-1]
+        pose = (x + v * math.cos(theta) * dt, y + v * math.sin(theta) * dt, normalize_angle(theta + w * dt))
+        self._pending_poses.append(pose)
+        self._pending_odom.append((v, w, dt))
+        k = self.num_poses - 1
+        for lm_id, (r, bearing) in measurements:
+            if lm_id is None:
+                continue
+            if lm_id not in self.landmark_index:
+                self.landmark_index[lm_id] = len(self.landmark_ids)
+                self.landmark_ids.append(lm_id)
+                self._pending_landmarks.append((pose[0] + r * math.cos(pose[2] + bearing),
+                                                pose[1] + r * math.sin(pose[2] + bearing)))
+            self._pending_meas.append((k, self.landmark_index[lm_id], r, bearing))
+
+    def _flush(self):
+        """Move the frames added since the last optimization into the arrays"""
+        if self._pending_poses:
+            self.poses = np.concatenate([self.poses, self._pending_poses])
+            self.odom = np.concatenate([self.odom, self._pending_odom])
+        if self._pending_landmarks:
+            self.landmarks = np.concatenate([self.landmarks, self._pending_landmarks])
+        if self._pending_meas:
+            meas = np.array(self._pending_meas)
+            self.meas_pose = np.concatenate([self.meas_pose, meas[:, 0].astype(int)])
+            self.meas_landmark = np.concatenate([self.meas_landmark, meas[:, 1].astype(int)])
+            self.meas_z = np.concatenate([self.meas_z, meas[:, 2:]])
+        self._pending_poses, self._pending_odom, self._pending_landmarks, self._pending_meas = [], [], [], []
+
+    # Factors
+    def _residuals(self, poses, landmarks):
+        """Whitened residual vector: prior (3), odometry (3 per factor), measurements (2 per factor)"""
+        prior = self._prior_w * (poses[0] - self.start_pose)
+        prior[2] = self._prior_w[2] * normalize_angle(poses[0, 2] - self.start_pose[2])
+
+        a, b = poses[:-1], poses[1:]
+        v, w, dt = self.odom.T
+        odom = np.empty_like(b)
+        odom[:, 0] = b[:, 0] - (a[:, 0] + v * np.cos(a[:, 2]) * dt)
+        odom[:, 1] = b[:, 1] - (a[:, 1] + v * np.sin(a[:, 2]) * dt)
+        odom[:, 2] = normalize_angle(b[:, 2] - a[:, 2] - w * dt)
+        odom *= self._odom_weights()
+
+        p = poses[self.meas_pose]
+        d = landmarks[self.meas_landmark] - p[:, :2]
+        meas = np.empty_like(self.meas_z)
+        meas[:, 0] = np.hypot(d[:, 0], d[:, 1]) - self.meas_z[:, 0]
+        meas[:, 1] = normalize_angle(np.arctan2(d[:, 1], d[:, 0]) - p[:, 2] - self.meas_z[:, 1])
+        meas = meas @ self._meas_w.T
+        return np.concatenate([prior, odom.ravel(), meas.ravel()])
+
+    def cost(self, poses=None, landmarks=None):
+        e = self._residuals(self.poses if poses is None else poses, self.landmarks if landmarks is None else landmarks)
+        return 0.5 * float(e @ e)
+
+    def _relinearize(self, threshold=None):
+        """Refresh the cached Jacobians of factors touching moved variables; returns how many were refreshed"""
+        threshold = self.relinearize_threshold if threshold is None else threshold
+        n_poses, n_landmarks = len(self.poses), len(self.landmarks)
+        moved_poses = np.ones(n_poses, dtype=bool)
+        moved_poses[:len(self._lin_poses)] = np.abs(self.poses[:len(self._lin_poses)] - self._lin_poses).max(axis=1) \
+            > threshold
+        moved_landmarks = np.ones(n_landmarks, dtype=bool)
+        moved_landmarks[:len(self._lin_landmarks)] = np.abs(
+            self.landmarks[:len(self._lin_landmarks)] - self._lin_landmarks).max(axis=1) > threshold
+        self._lin_poses = np.concatenate([self._lin_poses, self.poses[len(self._lin_poses):]])
+        self._lin_poses[moved_poses] = self.poses[moved_poses]
+        self._lin_landmarks = np.concatenate([self._lin_landmarks, self.landmarks[len(self._lin_landmarks):]])
+        self._lin_landmarks[moved_landmarks] = self.landmarks[moved_landmarks]
+
+        # Odometry factor k depends on the heading of pose k (d/d pose k+1 is the constant whitening)
+        stale_odom = moved_poses[:-1]
+        self._odom_jacobians = np.concatenate([self._odom_jacobians,
+                                               np.empty((len(self.odom) - len(self._odom_jacobians), 3, 3))])
+        k = np.flatnonzero(stale_odom)
+        v, _, dt = self.odom[k].T
+        theta = self.poses[k, 2]
+        Ja = -np.tile(np.eye(3), (len(k), 1, 1))
+        Ja[:, 0, 2] = v * np.sin(theta) * dt
+        Ja[:, 1, 2] = -v * np.cos(theta) * dt
+        self._odom_jacobians[k] = self._odom_weights(k)[:, :, None] * Ja
+
+        stale_meas = moved_poses[self.meas_pose] | moved_landmarks[self.meas_landmark]
+        self._meas_jacobians = np.concatenate([self._meas_jacobians,
+                                               np.empty((len(self.meas_z) - len(self._meas_jacobians), 2, 5))])
+        m = np.flatnonzero(stale_meas)
+        p = self.poses[self.meas_pose[m]]
+        d = self.landmarks[self.meas_landmark[m]] - p[:, :2]
+        q = d[:, 0]**2 + d[:, 1]**2; r = np.sqrt(q)
+        J = np.zeros((len(m), 2, 5))
+        J[:, 0, 0] = -d[:, 0] / r; J[:, 0, 1] = -d[:, 1] / r
+        J[:, 1, 0] = d[:, 1] / q;  J[:, 1, 1] = -d[:, 0] / q; J[:, 1, 2] = -1
+        J[:, :, 3:5] = -J[:, :, 0:2]
+        self._meas_jacobians[m] = self._meas_w @ J
+        return len(k) + len(m)
+
+    def _odom_weights(self, k=slice(None)):
+        """(k, 3) whitening of odometry factors k: the EKF's process noise grows with dt, so the weight falls"""
+        dt = np.maximum(self.odom[k, 2], 1e-3 * SIM_DT)  # A dt = 0 frame would get an infinite weight
+        return self._odom_w * np.sqrt(SIM_DT / dt)[:, None]
+
+    def _jacobian_entries(self):
+        """(rows, cols, values) of the whitened Jacobian from the cached blocks"""
+        n_poses = len(self.poses)
+        n_odom, n_meas = len(self.odom), len(self.meas_z)
+        r3, r2 = np.arange(3), np.arange(2)
+
+        rows = [r3]
+        cols = [r3]
+        vals = [self._prior_w]
+
+        # Odometry k: rows 3 + 3k + i; d/d pose k (3x3 block) and d/d pose k+1 (whitening diagonal)
+        base = 3 + 3 * np.arange(n_odom)
+        rows.append(np.repeat(base[:, None, None] + r3[:, None], 3, axis=2).ravel())
+        cols.append(np.repeat((3 * np.arange(n_odom))[:, None, None] + r3[None, :], 3, axis=1).ravel())
+        vals.append(self._odom_jacobians.ravel())
+        rows.append((base[:, None] + r3).ravel())
+        cols.append((3 * np.arange(1, n_odom + 1)[:, None] + r3).ravel())
+        vals.append(self._odom_weights().ravel())
+
+        # Measurements: rows 3 + 3 n_odom + 2m + i; columns of the pose, then of the landmark
+        base = 3 + 3 * n_odom + 2 * np.arange(n_meas)
+        var_cols = np.concatenate([3 * self.meas_pose[:, None] + r3,
+                                   3 * n_poses + 2 * self.meas_landmark[:, None] + r2], axis=1)  # (n_meas, 5)
+        rows.append(np.repeat(base[:, None] + r2, 5, axis=1).ravel())
+        cols.append(np.repeat(var_cols[:, None, :], 2, axis=1).ravel())
+        vals.append(self._meas_jacobians.ravel())
+        return np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+
+    def _normal_equations(self, e):
+        """H = J^T J and g = J^T e (sparse, or dense without SciPy)"""
+        rows, cols, vals = self._jacobian_entries()
+        size = 3 * len(self.poses) + 2 * len(self.landmarks)
+        if sparse is not None:
+            J = sparse.csr_matrix((vals, (rows, cols)), shape=(len(e), size))
+            return J.T @ J, J.T @ e
+        # Accumulate the outer products of each residual row's (at most 5) non-zeros
+        order = np.argsort(rows, kind="stable")
+        rows, cols, vals = rows[order], cols[order], vals[order]
+        starts = np.searchsorted(rows, np.arange(len(e)))
+        slot = np.arange(len(rows)) - starts[rows]
+        padded_cols = np.zeros((len(e), 5), dtype=int)
+        padded_vals = np.zeros((len(e), 5))
+        padded_cols[rows, slot] = cols
+        padded_vals[rows, slot] = vals
+        H = np.zeros((size, size))
+        np.add.at(H, (padded_cols[:, :, None], padded_cols[:, None, :]),
+                  padded_vals[:, :, None] * padded_vals[:, None, :])
+        return H, np.bincount(cols, weights=vals * e[rows], minlength=size)
+
+    def _solve(self, H, g, damping, solver):
+        """Solve (H + damping * diag(H)) delta = -g"""
+        if sparse is None:
+            return np.linalg.solve(H + damping * np.diag(np.diag(H)), -g)
+        diagonal = H.diagonal()
+        A = (H + sparse.diags(damping * diagonal)).tocsc()
+        if solver == "cg":
+            preconditioner = sparse.diags(1.0 / (diagonal * (1 + damping)))
+            delta, _ = sparse_linalg.cg(A, -g, rtol=POSEGRAPH_CG_TOLERANCE, maxiter=POSEGRAPH_CG_ITERATIONS,
+                                        M=preconditioner)
+            return delta
+        # A is symmetric positive definite: factor it like a sparse Cholesky (no pivoting). A small map
+        # is eliminated in the variable order (poses in time order, landmarks last: fill-in stays in
+        # the landmark columns); a large one with a symmetric minimum-degree ordering
+        ordering = "NATURAL" if len(self.landmarks) <= POSEGRAPH_SMALL_MAP else "MMD_AT_PLUS_A"
+        factor = sparse_linalg.splu(A, permc_spec=ordering, diag_pivot_thresh=0.0, options={"SymmetricMode": True})
+        return factor.solve(-g)
+
+    def _retract(self, delta):
+        n = len(self.poses)
+        poses = self.poses + delta[:3 * n].reshape(n, 3)
+        poses[:, 2] = normalize_angle(poses[:, 2])
+        return poses, self.landmarks + delta[3 * n:].reshape(-1, 2)
+
+    def optimize(self, iterations=POSEGRAPH_ITERATIONS, method="lm", solver="direct", tolerance=POSEGRAPH_TOLERANCE):
+        """
+        Gauss-Newton ("gn") or Levenberg-Marquardt ("lm") iterations until
+        the relative cost decrease drops below `tolerance`. A step is only
+        taken if it lowers the cost: LM then raises its damping, GN stops
+        at the current estimate. LM keeps its damping between calls, so
+        incremental optimization warm-starts.
+        """
+        if method not in ("gn", "lm"):
+            raise ValueError(f"Unknown method: {method}")
+        if solver not in ("direct", "cg"):
+            raise ValueError(f"Unknown solver: {solver}")
+        start = time.perf_counter()
+        self._flush()
+        e = self._residuals(self.poses, self.landmarks)
+        cost = initial_cost = 0.5 * float(e @ e)
+        relinearized = 0
+        iteration = 0
+        for iteration in range(1, iterations + 1):
+            relinearized += self._relinearize()
+            H, g = self._normal_equations(e)
+            stale = self.relinearize_threshold > 0
+            while True:
+                damping = self._lambda if method == "lm" else 0.0
+                poses, landmarks = self._retract(self._solve(H, g, damping, solver))
+                e_new = self._residuals(poses, landmarks)
+                new_cost = 0.5 * float(e_new @ e_new)
+                if new_cost < cost:
+                    self._lambda = max(self._lambda / 10, POSEGRAPH_MIN_LAMBDA)
+                    break
+                if stale:
+                    # The step may have failed on outdated Jacobians: relinearize everything before damping more
+                    relinearized += self._relinearize(threshold=0.0)
+                    H, g = self._normal_equations(e)
+                    stale = False
+                    continue
+                if method == "gn":
+                    # Undamped GN overshot: keep the current (lower-cost) estimate
+                    return SolveStats(iteration, initial_cost, cost, relinearized, time.perf_counter() - start)
+                self._lambda *= 10
+                if self._lambda > POSEGRAPH_MAX_LAMBDA:
+                    self._lambda = POSEGRAPH_INITIAL_LAMBDA
+                    return SolveStats(iteration, initial_cost, cost, relinearized, time.perf_counter() - start)
+            self.poses, self.landmarks, e = poses, landmarks, e_new
+            decrease, cost = cost - new_cost, new_cost
+            if decrease <= tolerance * max(cost, 1e-12):
+                break
+        return SolveStats(iteration, initial_cost, cost, relinearized, time.perf_counter() - start)
+
+def smooth(frames, start_pose, incremental=POSEGRAPH_INCREMENTAL, iterations=POSEGRAPH_ITERATIONS, **options):
+    """Build the graph from a Frame stream (optimizing every `incremental` frames if > 0) and solve it"""
+    graph = PoseGraph(start_pose)
+    times = []
+    for step, frame in enumerate(frames):
+        times.append(frame.t)
+        graph.add_frame(frame.v, frame.w, frame.dt, frame.measurements)
+        if incremental and (step + 1) % incremental == 0:
+            graph.optimize(POSEGRAPH_INCREMENTAL_ITERATIONS, **options)
+    return graph, np.array(times), graph.optimize(iterations, **options)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help='CSV / NPZ file, recorder.py log directory, or "-" for CSV on stdin')
+    parser.add_argument("-o", "--output", help="Smoothed pose CSV (default: stdout)")
+    parser.add_argument("--landmarks", help="Write the smoothed landmark positions to this CSV")
+    parser.add_argument("--start-pose", type=float, nargs=3, help="Overrides the source's start pose")
+    parser.add_argument("--method", choices=["lm", "gn"], default="lm", help="Levenberg-Marquardt or Gauss-Newton")
+    parser.add_argument("--solver", choices=["direct", "cg"], default="direct",
+                        help="Sparse direct solve or Jacobi-preconditioned conjugate gradient")
+    parser.add_argument("--iterations", type=int, default=POSEGRAPH_ITERATIONS)
+    parser.add_argument("--incremental", type=int, default=POSEGRAPH_INCREMENTAL, metavar="N",
+                        help="Optimize every N frames while reading, warm-starting the final solve (0: batch only)")
+    args = parser.parse_args()
+    if sparse is None:
+        print("SciPy not found: solving the normal equations densely", file=sys.stderr)
+
+    start_pose, frames = open_source(args.source)
+    start_pose = tuple(args.start_pose or start_pose or (0.0, 0.0, 0.0))
+    graph, times, stats = smooth(frames, start_pose, args.incremental,
+                                 iterations=args.iterations, method=args.method, solver=args.solver)
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = csv.writer(out)
+    writer.writerow(["step", "t", "x", "y", "theta"])
+    for step, (t, (x, y, theta)) in enumerate(zip(times, graph.poses[1:])):
+        writer.writerow([step, f"{t:.6f}", f"{x:.6f}", f"{y:.6f}", f"{theta:.6f}"])
+    if args.output:
+        out.close()
+    if args.landmarks:
+        with open(args.landmarks, "w", newline="") as f:
+            lm_writer = csv.writer(f)
+            lm_writer.writerow(["lm_id", "x", "y"])
+            for lm_id, (x, y) in zip(graph.landmark_ids, graph.landmarks):
+                lm_writer.writerow([lm_id, f"{x:.6f}", f"{y:.6f}"])
+
+    print(f"{len(times)} poses, {graph.num_landmarks} landmarks, {len(graph.meas_z)} measurements: "
+          f"cost {stats.initial_cost:.1f} -> {stats.cost:.1f} in {stats.iterations} iterations, "
+          f"{stats.relinearized} factors relinearized, {stats.seconds:.2f}s", file=sys.stderr)
+    if os.path.isdir(args.source):
+        from recorder import RunLog, pose_errors
+        log = RunLog(args.source)
+        for name, est in (("recorded EKF", np.asarray(log.steps["est"])), ("smoothed", graph.poses[1:])):
+            position, heading = pose_errors(log, est)
+            print(f"{name:>12}: position RMSE {math.sqrt(np.mean(position ** 2)):.4f} m, "
+                  f"heading RMSE {math.sqrt(np.mean(heading ** 2)):.4f} rad", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# profiler.py
+import csv
+import functools
+import json
+import sys
+import time
+from contextlib import contextmanager
+import numpy as np
+from config import *
+
+class Profiler:
+    """
+    Named timing spans with rolling percentiles. Each span keeps its last
+    `window` durations in a NumPy ring buffer, so recording is O(1) and
+    p50/p95/p99 are computed only when a summary is asked for.
+
+    Spans are recorded with `with profiler.span(name):`, or by wrapping an
+    existing function or method with instrument() so hot code does not
+    have to be edited. A disabled profiler records nothing.
+    """
+
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, window=PROFILE_WINDOW, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self._samples = {}  # name -> ring buffer of seconds
+        self.counts = {}    # name -> samples ever recorded
+        self.totals = {}    # name -> seconds ever recorded
+
+    @property
+    def names(self):
+        return list(self._samples)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        buffer = self._samples.get(name)
+        if buffer is None:
+            buffer = self._samples[name] = np.zeros(self.window)
+            self.counts[name] = 0
+            self.totals[name] = 0.0
+        buffer[self.counts[name] % self.window] = seconds
+        self.counts[name] += 1
+        self.totals[name] += seconds
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def instrument(self, owner, attribute, name=None):
+        """
+        Replace owner.attribute (a method on an instance, or a function in a
+        module) with a timed wrapper recording span `name` (default: the
+        attribute name). Returns the original so it can be restored.
+        """
+        original = getattr(owner, attribute)
+        name = name or attribute
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+
+        setattr(owner, attribute, timed)
+        return original
+
+    def samples(self, name):
+        """Stored durations (seconds) of a span, oldest first"""
+        count = self.counts[name]
+        if count <= self.window:
+            return self._samples[name][:count].copy()
+        return np.roll(self._samples[name], -(count % self.window))
+
+    def summary(self):
+        """{span: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}} over each span's window"""
+        result = {}
+        for name in self._samples:
+            recent = self.samples(name) * 1e3
+            if not len(recent):
+                continue
+            p = np.percentile(recent, self.PERCENTILES)
+            result[name] = {
+                "count": self.counts[name],
+                "mean_ms": float(recent.mean()),
+                **{f"p{q}_ms": float(v) for q, v in zip(self.PERCENTILES, p)},
+                "max_ms": float(recent.max()),
+            }
+        return result
+
+    def export(self, path):
+        """Write the summary as JSON, or CSV if the path ends in .csv"""
+        summary = self.summary()
+        if path.endswith(".csv"):
+            fields = ["count", "mean_ms"] + [f"p{q}_ms" for q in self.PERCENTILES] + ["max_ms"]
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["span"] + fields)
+                for name, stats in summary.items():
+                    writer.writerow([name, stats["count"]] + [f"{stats[k]:.4f}" for k in fields[1:]])
+        else:
+            with open(path, "w") as f:
+                json.dump({"window": self.window, "spans": summary}, f, indent=2)
+
+    def reset(self):
+        self._samples.clear()
+        self.counts.clear()
+        self.totals.clear()
+
+def instrument_simulator(profiler, sim):
+    """Time the simulator's per-step stages: control, avoidance, prediction, sensing and the update"""
+    module = sys.modules[type(sim).__module__]  # simulator, or __main__ when run as a script
+    profiler.instrument(sim, "control_step", "control")
+    profiler.instrument(module, "detect_obstacles_and_avoid", "avoidance")
+    profiler.instrument(sim, "dynamics_step", "dynamics")
+    profiler.instrument(sim.ekf, "predict", "predict")
+    profiler.instrument(sim, "sense", "sense")
+    profiler.instrument(sim.ekf, "correct", "update")
+    if sim.associator is not None:
+        profiler.instrument(sim.associator, "associate", "association")
@@ -0,0 +1,284 @@
+# recorder.py
+"""
+Binary run logs: record a headless run once, then replay the logged
+odometry and measurements through any filter variant at full speed.
+
+A log is a directory holding
+    meta.json          run settings, start pose, landmark ids
+    landmarks.npy      true landmark positions (same order as the ids)
+    steps.bin          one STEP_DTYPE record per simulation step
+    measurements.bin   one MEAS_DTYPE record per measurement
+The .bin files are raw, append-only NumPy structured records, so RunLog
+memory-maps them and long runs are never loaded into RAM as a whole.
+
+Examples:
+    python recorder.py record run.log --seconds 600 --seed 1
+    python recorder.py replay run.log --update-mode batched
+    python recorder.py info run.log
+"""
+import argparse
+import json
+import math
+import os
+import time
+import numpy as np
+from config import *
+from filters import FILTERS, make_filter
+from association import DataAssociator
+from simulator import SlamSimulator
+
+LOG_VERSION = 1
+
+STEP_DTYPE = np.dtype([
+    ("t", "<f8"), ("dt", "<f8"),
+    ("true", "<f8", 3),        # Ground-truth pose
+    ("odom", "<f8", 3),        # Dead-reckoned pose
+    ("control", "<f8", 2),     # Commanded (v, omega)
+    ("odom_input", "<f8", 2),  # Noisy (v, omega) fed to the EKF prediction
+    ("est", "<f8", 3),         # EKF pose after the update
+    ("est_cov", "<f8", (3, 3)),
+    ("num_landmarks", "<i4"),  # Landmarks in the EKF state
+    ("meas_start", "<i8"),     # First record of this step in measurements.bin
+    ("meas_count", "<i4"),
+])
+
+MEAS_DTYPE = np.dtype([
+    ("step", "<i8"),
+    ("landmark", "<i4"),       # Index into meta["landmark_ids"], -1 for clutter
+    ("z", "<f8", 2),           # (range, bearing)
+])
+
+class Recorder:
+    """
+    Streams a SlamSimulator run to a log directory. Records are collected
+    in fixed-size NumPy chunks and appended to the .bin files when a chunk
+    fills up (and on close), so recording costs a few array writes per step.
+    """
+
+    def __init__(self, path, sim, chunk_size=RECORDER_CHUNK):
+        self.path = path
+        self.sim = sim
+        os.makedirs(path, exist_ok=True)
+        ids = list(sim.landmarks)
+        self.landmark_number = {lm_id: i for i, lm_id in enumerate(ids)}
+        meta = {
+            "version": LOG_VERSION,
+            "start_pose": list(sim.ekf.pose),
+            "landmark_ids": ids,
+            "goals": [list(g) for g in sim.goals],
+            "world_size": [sim.world_width, sim.world_height],
+            "motion_noise": [float(n) for n in sim.ekf.motion_noise],
+            "meas_noise": np.asarray(sim.ekf.meas_noise).tolist(),
+            "anonymous": sim.associator is not None,
+            "clutter_rate": sim.clutter_rate,
+            "filter_backend": sim.filter_backend,
+        }
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        np.save(os.path.join(path, "landmarks.npy"), np.array([sim.landmarks[i] for i in ids], dtype=float).reshape(-1, 2))
+
+        self._steps_file = open(os.path.join(path, "steps.bin"), "wb")
+        self._meas_file = open(os.path.join(path, "measurements.bin"), "wb")
+        self._steps = np.zeros(chunk_size, STEP_DTYPE)
+        self._meas = np.zeros(chunk_size, MEAS_DTYPE)
+        self._num_steps = self._num_meas = 0  # Records in the current chunks
+        self.steps_written = self.meas_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def step(self, dt=SIM_DT):
+        """Advance the simulator one step and record it"""
+        sim = self.sim
+        sim.step(dt)
+
+        meas_start = self.meas_written + self._num_meas
+        for lm_id, z in sim.measurements:
+            if self._num_meas == len(self._meas):
+                self._flush_measurements()
+            m = self._meas[self._num_meas]
+            m["step"] = self.steps_written + self._num_steps
+            m["landmark"] = -1 if lm_id is None else self.landmark_number[lm_id]
+            m["z"] = z
+            self._num_meas += 1
+
+        if self._num_steps == len(self._steps):
+            self._flush_steps()
+        r = self._steps[self._num_steps]
+        r["t"], r["dt"] = sim.time, dt
+        r["true"] = sim.true_x, sim.true_y, sim.true_theta
+        r["odom"] = sim.odom_x, sim.odom_y, sim.odom_theta
+        r["control"] = sim.control
+        r["odom_input"] = sim.v_o, sim.w_o
+        r["est"] = sim.ekf.pose
+        r["est_cov"] = sim.ekf.pose_covariance()
+        r["num_landmarks"] = sim.ekf.num_landmarks
+        r["meas_start"], r["meas_count"] = meas_start, len(sim.measurements)
+        self._num_steps += 1
+
+    def run(self, duration, dt=SIM_DT):
+        for _ in range(int(round(duration / dt))):
+            self.step(dt)
+        return self
+
+    def _flush_steps(self):
+        self._steps[:self._num_steps].tofile(self._steps_file)
+        self.steps_written += self._num_steps
+        self._num_steps = 0
+
+    def _flush_measurements(self):
+        self._meas[:self._num_meas].tofile(self._meas_file)
+        self.meas_written += self._num_meas
+        self._num_meas = 0
+
+    def close(self):
+        if self._steps_file.closed:
+            return
+        self._flush_measurements()
+        self._flush_steps()
+        self._steps_file.close()
+        self._meas_file.close()
+
+class RunLog:
+    """Read-only, memory-mapped view of a recorded run"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != LOG_VERSION:
+            raise ValueError(f"Unsupported log version {self.meta['version']}")
+        self.landmark_ids = self.meta["landmark_ids"]
+        self.landmark_xy = np.load(os.path.join(path, "landmarks.npy"), mmap_mode="r")
+        self.steps = self._map("steps.bin", STEP_DTYPE)
+        self.measurements = self._map("measurements.bin", MEAS_DTYPE)
+
+    def _map(self, name, dtype):
+        file = os.path.join(self.path, name)
+        if os.path.getsize(file) == 0:  # np.memmap cannot map empty files
+            return np.zeros(0, dtype)
+        return np.memmap(file, dtype=dtype, mode="r")
+
+    def __len__(self):
+        return len(self.steps)
+
+    def step_measurements(self, i):
+        """Measurement records of step i"""
+        start, count = int(self.steps[i]["meas_start"]), int(self.steps[i]["meas_count"])
+        return self.measurements[start:start + count]
+
+def replay(log, update_mode=UPDATE_MODE, motion_noise=None, meas_noise=None, anonymous=None, joint=JOINT_COMPATIBILITY,
+           backend=None):
+    """
+    Run a fresh filter (see filters.FILTERS) over a log's odometry and
+    measurements (no simulation). The backend and noise settings default
+    to the recorded ones. Returns the filter and the per-step estimated poses.
+    """
+    meta = log.meta
+    backend = meta.get("filter_backend", FILTER_BACKEND) if backend is None else backend
+    ekf = make_filter(tuple(meta["start_pose"]), backend,
+                      motion_noise=meta["motion_noise"] if motion_noise is None else motion_noise,
+                      meas_noise=np.array(meta["meas_noise"]) if meas_noise is None else meas_noise,
+                      update_mode=update_mode)
+    anonymous = meta["anonymous"] if anonymous is None else anonymous
+    associator = DataAssociator(ekf, joint=joint) if anonymous else None
+    ids = log.landmark_ids
+
+    est = np.empty((len(log), 3))
+    steps = log.steps
+    for i in range(len(log)):
+        step = steps[i]
+        v, w = step["odom_input"]
+        ekf.predict(float(v), float(w), float(step["dt"]))
+        records = log.step_measurements(i)
+        if associator is None:
+            ekf.correct([(ids[k], (float(r), float(b))) for k, (r, b) in zip(records["landmark"], records["z"]) if k >= 0])
+        else:
+            associator.correct([(float(r), float(b)) for r, b in records["z"]])
+        est[i] = ekf.pose
+    return ekf, est
+
+def pose_errors(log, est):
+    """Position and heading errors of estimated poses against the logged ground truth"""
+    true = log.steps["true"]
+    position = np.hypot(true[:, 0] - est[:, 0], true[:, 1] - est[:, 1])
+    d = true[:, 2] - est[:, 2]
+    heading = np.abs(np.arctan2(np.sin(d), np.cos(d)))
+    return position, heading
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="Run the headless simulator and log it")
+    record.add_argument("path")
+    record.add_argument("--seconds", type=float, default=60.0)
+    record.add_argument("--dt", type=float, default=SIM_DT)
+    record.add_argument("--seed", type=int, default=None)
+    record.add_argument("--world", help="World .npz file from world.py")
+    record.add_argument("--anonymous", action="store_true")
+    record.add_argument("--clutter", type=float, default=CLUTTER_RATE)
+    record.add_argument("--backend", choices=list(FILTERS), default=FILTER_BACKEND)
+
+    play = commands.add_parser("replay", help="Re-run the EKF on a log")
+    play.add_argument("path")
+    play.add_argument("--update-mode", choices=["sequential", "batched"], default=UPDATE_MODE)
+    play.add_argument("--motion-noise-scale", type=float, default=1.0)
+    play.add_argument("--meas-noise-scale", type=float, default=1.0)
+    play.add_argument("--joint", action="store_true", help="JCBC data association (anonymous logs)")
+    play.add_argument("--backend", choices=list(FILTERS), help="Filter variant to replay with (default: the recorded one)")
+
+    info = commands.add_parser("info", help="Summarize a log")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        options = dict(seed=args.seed, anonymous=args.anonymous or ANONYMOUS_LANDMARKS, clutter_rate=args.clutter,
+                       filter_backend=args.backend)
+        if args.world:
+            from world import load_world
+            sim = SlamSimulator.from_world(load_world(args.world), **options)
+        else:
+            sim = SlamSimulator(**options)
+        start = time.perf_counter()
+        with Recorder(args.path, sim) as recorder:
+            recorder.run(args.seconds, args.dt)
+        elapsed = time.perf_counter() - start
+        print(f"Recorded {recorder.steps_written} steps, {recorder.meas_written} measurements "
+              f"in {elapsed:.2f}s -> {args.path}")
+        return
+
+    log = RunLog(args.path)
+    recorded_position, recorded_heading = pose_errors(log, log.steps["est"])
+    if args.command == "info":
+        meta = log.meta
+        print(f"{len(log)} steps ({log.steps['t'][-1] if len(log) else 0:.1f} s), "
+              f"{len(log.measurements)} measurements, {len(log.landmark_ids)} landmarks"
+              f"{' (anonymous, clutter %g)' % meta['clutter_rate'] if meta['anonymous'] else ''}")
+        if len(log):
+            print(f"Recorded RMSE {math.sqrt(np.mean(recorded_position ** 2)):.4f} m, "
+                  f"final error {recorded_position[-1]:.4f} m, "
+                  f"{int(log.steps['num_landmarks'][-1])} landmarks mapped")
+        return
+
+    meta = log.meta
+    start = time.perf_counter()
+    ekf, est = replay(log, args.update_mode,
+                      [n * args.motion_noise_scale for n in meta["motion_noise"]],
+                      np.array(meta["meas_noise"]) * args.meas_noise_scale, joint=args.joint, backend=args.backend)
+    elapsed = time.perf_counter() - start
+    position, heading = pose_errors(log, est)
+    print(f"Replayed {len(log)} steps in {elapsed:.2f}s ({len(log) / max(elapsed, 1e-9):.0f} steps/s)")
+    print(f"{'':>10} {'RMSE (m)':>9} {'final (m)':>10} {'heading RMSE (deg)':>19}")
+    for name, pos, hdg in (("recorded", recorded_position, recorded_heading), ("replay", position, heading)):
+        if len(pos):
+            print(f"{name:>10} {math.sqrt(np.mean(pos ** 2)):>9.4f} {pos[-1]:>10.4f} "
+                  f"{math.degrees(math.sqrt(np.mean(hdg ** 2))):>19.3f}")
+    if len(est):
+        print(f"Max pose deviation from the recorded estimate: {np.abs(est - log.steps['est']).max():.3g}")
+
+if __name__ == "__main__":
+    main()
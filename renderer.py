@@ -0,0 +1,118 @@
+# renderer.py
+import math
+import numpy as np
+import pygame
+from config import *
+from assets import create_room_background
+from utils import create_landmark_sprite
+from camera import Camera
+
+class LayeredRenderer:
+    """
+    Cached render layers for the map area.
+
+    The static layer (background, grid, true landmark sprites and their
+    labels) is drawn once into an off-screen surface and only rebuilt when
+    the map size or the camera view changes; each frame it is blitted in
+    one go and the dynamic content (trails, rays, estimates, robots) is
+    drawn on top. Only landmarks inside the view are drawn into it (one
+    vectorized visibility test), so a rebuild costs what is on screen.
+    The sensor-range bubble is likewise pre-rendered once per radius
+    instead of allocating a full-screen alpha surface every frame.
+    """
+
+    def __init__(self, landmarks, sprites, label_font, camera=None, room_background=ROOM_BACKGROUND):
+        self.landmarks = landmarks
+        self.sprites = sprites
+        self.default_sprite = create_landmark_sprite((220, 20, 60), 24, "circle")
+        self.label_font = label_font
+        self.camera = camera or Camera()
+        self.room_background = room_background
+        self._static = None
+        self._static_key = None
+        self._bubble = None
+        self._bubble_radius = None
+        self._index_landmarks()
+
+    @property
+    def scale(self):
+        return self.camera.scale
+
+    def to_screen(self, x, y):
+        """World meters -> map pixels for the current camera view"""
+        return self.camera.to_screen(x, y)
+
+    def set_scale(self, scale):
+        self.camera.scale = scale
+
+    def invalidate(self):
+        """Force the static layer to be rebuilt on the next frame (e.g. landmarks changed)"""
+        self._static = None
+        self._index_landmarks()
+
+    def _index_landmarks(self):
+        self._landmark_ids = list(self.landmarks)
+        self._landmark_xy = np.array([self.landmarks[i] for i in self._landmark_ids], dtype=float).reshape(-1, 2)
+
+    def map_size(self, screen):
+        return screen.get_width() - SIDEBAR_WIDTH, screen.get_height()
+
+    def _build_static(self, size):
+        width, height = size
+        camera = self.camera
+        layer = pygame.Surface(size)
+        if pygame.display.get_surface() is not None:
+            layer = layer.convert()
+
+        if self.room_background:
+            layer.blit(create_room_background(width, height), (0, 0))
+        else:
+            layer.fill(BG_COLOR)
+
+        # World-aligned grid: 1 m lines, coarser when zoomed out so they stay >= 8 px apart
+        spacing = next(s for s in (1, 5, 10, 50, 100, 500, 1000, 5000) if s * camera.scale >= 8 or s == 5000)
+        xmin, ymin, xmax, ymax = camera.bounds()
+        for x in np.arange(math.ceil(xmin / spacing), math.floor(xmax / spacing) + 1) * spacing:
+            px = camera.to_screen(x, 0)[0]
+            pygame.draw.line(layer, GRID_COLOR, (px, 0), (px, height))
+        for y in np.arange(math.ceil(ymin / spacing), math.floor(ymax / spacing) + 1) * spacing:
+            py = camera.to_screen(0, y)[1]
+            pygame.draw.line(layer, GRID_COLOR, (0, py), (width, py))
+
+        margin = 64  # Largest sprite plus label offset
+        visible = np.flatnonzero(camera.visible(self._landmark_xy, margin))
+        for i, pos in zip(visible, camera.to_screen_array(self._landmark_xy[visible])):
+            lm_id = self._landmark_ids[i]
+            pos = tuple(pos)
+            sprite = self.sprites.get(lm_id, self.default_sprite)
+            layer.blit(sprite, sprite.get_rect(center=pos))
+            layer.blit(self.label_font.render(lm_id, True, TEXT_WHITE), (pos[0] + 15, pos[1] - 20))
+        return layer
+
+    def static_layer(self, screen):
+        """The cached static layer, rebuilt first if the map size or the camera view changed"""
+        size = self.map_size(screen)
+        if (self.camera.width, self.camera.height) != size:
+            self.camera.set_viewport(*size)
+        key = self.camera.key
+        if self._static is None or key != self._static_key:
+            self._static = self._build_static(size)
+            self._static_key = key
+        return self._static
+
+    def draw_static(self, screen):
+        screen.blit(self.static_layer(screen), (0, 0))
+
+    def draw_sensor_range(self, screen, x, y, radius):
+        r = int(radius * self.camera.scale)
+        cx, cy = self.to_screen(x, y)
+        if r > max(self.camera.width, self.camera.height):
+            # Zoomed in too far for a pre-rendered bubble: just the outline
+            pygame.draw.circle(screen, (80, 80, 80), (cx, cy), r, 1)
+            return
+        if self._bubble is None or r != self._bubble_radius:
+            self._bubble = pygame.Surface((2 * r + 2, 2 * r + 2), pygame.SRCALPHA)
+            pygame.draw.circle(self._bubble, (255, 255, 255, 10), (r + 1, r + 1), r)
+            pygame.draw.circle(self._bubble, (80, 80, 80), (r + 1, r + 1), r, 1)
+            self._bubble_radius = r
+        screen.blit(self._bubble, (cx - r - 1, cy - r - 1))
@@ -0,0 +1,81 @@
+# scheduler.py
+from collections import namedtuple
+from config import *
+
+Task = namedtuple("Task", "name period callback")  # period in base ticks; callback(dt) gets the task's own dt
+
+class MultirateScheduler:
+    """
+    Runs callbacks at fixed rates derived from one base tick, in simulated
+    time. Every rate is rounded to a whole number of base ticks; on each
+    tick the due tasks run in the order they were added.
+
+    advance(elapsed) turns wall-clock time into base ticks with an
+    accumulator, so the simulated rates do not depend on how long a
+    rendered frame took. A frame that took longer than `max_lag` only
+    advances by `max_lag`; the rest is dropped (and counted) instead of
+    stalling the next frames while the simulation catches up.
+    """
+
+    def __init__(self, base_rate, max_lag=MAX_FRAME_TIME):
+        self.base_rate = base_rate
+        self.base_dt = 1.0 / base_rate
+        self.max_lag = max_lag
+        self.tasks = []
+        self.ticks = 0
+        self.accumulator = 0.0
+        self.dropped = 0.0  # Wall-clock seconds not simulated because of max_lag
+
+    def add(self, name, rate, callback):
+        """Run callback(dt) `rate` times per simulated second (at most once per base tick)"""
+        period = round(self.base_rate / rate)
+        if period < 1:
+            raise ValueError(f"Task {name!r} rate {rate} Hz is above the base rate {self.base_rate} Hz")
+        self.tasks.append(Task(name, period, callback))
+
+    def rate(self, name):
+        """Effective rate (Hz) of a task after rounding to whole ticks"""
+        task = next(t for t in self.tasks if t.name == name)
+        return self.base_rate / task.period
+
+    @property
+    def time(self):
+        return self.ticks * self.base_dt
+
+    def tick(self):
+        """Run one base tick"""
+        for task in self.tasks:
+            if self.ticks % task.period == 0:
+                task.callback(task.period * self.base_dt)
+        self.ticks += 1
+
+    def advance(self, elapsed):
+        """Run the base ticks covered by `elapsed` wall-clock seconds; returns how many ran"""
+        if elapsed > self.max_lag:
+            self.dropped += elapsed - self.max_lag
+            elapsed = self.max_lag
+        self.accumulator += elapsed
+        count = int(self.accumulator / self.base_dt)
+        self.accumulator -= count * self.base_dt
+        for _ in range(count):
+            self.tick()
+        return count
+
+    def run(self, duration):
+        """Run `duration` simulated seconds as fast as possible (headless)"""
+        for _ in range(int(round(duration * self.base_rate))):
+            self.tick()
+        return self
+
+def simulation_scheduler(sim, physics_rate=PHYSICS_RATE, control_rate=CONTROL_RATE, sensor_rate=SENSOR_RATE):
+    """
+    Scheduler driving a SlamSimulator: the controller at control_rate,
+    truth and odometry at physics_rate, and EKF prediction (over the
+    odometry integrated since the last one) plus measurement update at
+    sensor_rate.
+    """
+    scheduler = MultirateScheduler(physics_rate)
+    scheduler.add("control", control_rate, lambda dt: sim.control_step())
+    scheduler.add("dynamics", physics_rate, sim.dynamics_step)
+    scheduler.add("sensor", sensor_rate, lambda dt: sim.sensor_step())
+    return scheduler
@@ -0,0 +1,314 @@
+# simulator.py
+import math
+import random
+import time
+from config import *
+from geometry import normalize_angle
+from filters import FILTERS, make_filter
+from spatial import GridIndex
+from costmap import DistanceField
+from association import DataAssociator
+from telemetry import TruthIndex
+
+def detect_obstacles_and_avoid(true_x, true_y, true_theta, costmap, sensor_rays):
+    """
+    Detect obstacles in front of the robot and compute avoidance steering
+    Returns: avoidance_angle (radians)
+    """
+    avoidance_angle = 0.0
+    closest_obstacle_dist = float('inf')
+    obstacle_detected = False
+
+    # Convert sensor rays to obstacle information
+    for start, end in sensor_rays:
+        # Calculate distance to obstacle
+        dist = math.hypot(end[0] - true_x, end[1] - true_y)
+
+        # Only consider obstacles in front of robot
+        dx = end[0] - true_x
+        dy = end[1] - true_y
+        angle_to_obstacle = math.atan2(dy, dx)
+        angle_diff = normalize_angle(angle_to_obstacle - true_theta)
+
+        # Check if obstacle is in front (within ±90 degrees)
+        if abs(angle_diff) < math.pi/2 and dist < SAFE_DISTANCE:
+            obstacle_detected = True
+            closest_obstacle_dist = min(closest_obstacle_dist, dist)
+
+            # Calculate avoidance steering: turn away from obstacle
+            # Obstacle on right -> turn left (negative), obstacle on left -> turn right (positive)
+            avoidance_angle += -AVOIDANCE_GAIN * (angle_diff / abs(angle_diff)) / max(dist, 0.1)
+
+    # Also check the nearest obstacle in the distance field (landmarks not currently sensed, walls)
+    dist, grad_x, grad_y = costmap.sample(true_x, true_y)
+    if dist < SAFE_DISTANCE and (grad_x or grad_y):
+        # The gradient points away from the obstacle
+        angle_to_obstacle = math.atan2(-grad_y, -grad_x)
+        angle_diff = normalize_angle(angle_to_obstacle - true_theta)
+
+        if abs(angle_diff) < math.pi/2:  # In front
+            obstacle_detected = True
+            closest_obstacle_dist = min(closest_obstacle_dist, dist)
+            avoidance_angle += -AVOIDANCE_GAIN * math.copysign(1.0, angle_diff) / max(dist, 0.1)
+
+    # Limit the avoidance angle
+    if obstacle_detected:
+        avoidance_angle = max(-MAX_AVOIDANCE_ANGLE, min(MAX_AVOIDANCE_ANGLE, avoidance_angle))
+
+        # If too close, slow down or stop
+        if closest_obstacle_dist < STOP_DISTANCE:
+            return avoidance_angle, 0.0  # Stop but still steer
+
+    return avoidance_angle, 1.0  # Normal speed
+
+class SlamSimulator:
+    """
+    Headless differential-drive EKF-SLAM simulation.
+    Holds the ground truth, odometry and EKF estimate and advances them
+    with a fixed-timestep step(dt); no pygame is required.
+    """
+
+    def __init__(self, landmarks=None, goals=None, start_pose=None, seed=None, world_size=None, walls=None,
+                 k_distance=K_DISTANCE, k_heading=K_HEADING, max_sensor_range=MAX_SENSOR_RANGE,
+                 odom_std=ODOM_STD, range_std=RANGE_STD, bearing_std=BEARING_STD,
+                 motion_noise=MOTION_NOISE, meas_noise=MEAS_NOISE,
+                 anonymous=ANONYMOUS_LANDMARKS, clutter_rate=CLUTTER_RATE, filter_backend=FILTER_BACKEND):
+        self.rng = random.Random(seed)
+        self.landmarks = dict(LANDMARKS if landmarks is None else landmarks)
+        self.landmark_truth = TruthIndex(self.landmarks)
+        self.landmark_grid = GridIndex(GRID_CELL_SIZE)
+        for lm_id, (lx, ly) in self.landmarks.items():
+            self.landmark_grid.insert(lm_id, lx, ly)
+        self.walls = list(walls or [])  # ((x0, y0), (x1, y1)) segments: obstacles, but not landmarks
+        self.costmap = DistanceField.from_world(self.landmarks, self.walls)
+        self.goals = list(GOALS if goals is None else goals)
+        self.goal_index = 0
+        self.world_width, self.world_height = world_size or (WORLD_WIDTH, WORLD_HEIGHT)
+
+        self.k_distance, self.k_heading = k_distance, k_heading
+        self.max_sensor_range = max_sensor_range
+        self.odom_std, self.range_std, self.bearing_std = odom_std, range_std, bearing_std
+
+        if start_pose is None:
+            start_pose = (self.rng.uniform(0.5, self.world_width - 0.5),
+                          self.rng.uniform(0.5, self.world_height - 0.5),
+                          self.rng.uniform(0, 2 * math.pi))
+        self.true_x, self.true_y, self.true_theta = start_pose
+        self.odom_x, self.odom_y, self.odom_theta = start_pose
+        self.filter_backend = filter_backend
+        self.ekf = make_filter(start_pose, filter_backend, motion_noise=motion_noise, meas_noise=meas_noise)
+        self.associator = DataAssociator(self.ekf) if anonymous else None
+        self.clutter_rate = clutter_rate
+
+        self.sensor_rays = []
+        self.v_o, self.w_o = 0.0, 0.0
+        self._odom_mean = [0.0, 0.0, 0.0]  # Mean (v_o, w_o) and elapsed time since the last sensor step
+        self.control = (0.0, 0.0)   # Commanded (v, omega) of the last step
+        self.measurements = []      # (lm_id, z) fed to the filter in the last step; lm_id None for clutter
+        self.time = 0.0
+        self.step_count = 0
+
+        # Run statistics
+        self.goal_times = []
+        self.collisions = 0
+        self.in_collision = False
+
+    @classmethod
+    def from_world(cls, world, **kwargs):
+        """Build a simulator for a world dict from world.py"""
+        return cls(landmarks=world["landmarks"], goals=world["goals"], walls=world.get("walls"),
+                   world_size=(world["width"], world["height"]), **kwargs)
+
+    @property
+    def done(self):
+        return self.goal_index >= len(self.goals)
+
+    @property
+    def est_pose(self):
+        return self.ekf.pose
+
+    @property
+    def error(self):
+        est_x, est_y, _ = self.ekf.pose
+        return math.hypot(self.true_x - est_x, self.true_y - est_y)
+
+    def compute_control(self):
+        """Waypoint controller with reactive obstacle avoidance"""
+        est_x, est_y, est_theta = self.ekf.pose
+        if self.goal_index >= len(self.goals):
+            return 0.0, 0.0
+
+        gx, gy = self.goals[self.goal_index]
+        dx, dy = gx - est_x, gy - est_y
+        dist = math.hypot(dx, dy)
+        heading_error = normalize_angle(math.atan2(dy, dx) - est_theta)
+
+        # Detect obstacles and get avoidance steering
+        avoidance_angle, speed_factor = detect_obstacles_and_avoid(
+            self.true_x, self.true_y, self.true_theta, self.costmap, self.sensor_rays
+        )
+
+        if dist < GOAL_THRESHOLD:
+            self.goal_index += 1
+            self.goal_times.append(self.time)
+            return 0.0, 0.0
+
+        # Base navigation control
+        base_v = min(self.k_distance * dist, MAX_SPEED)
+        base_omega = self.k_heading * heading_error
+
+        # Combine navigation with obstacle avoidance
+        if avoidance_angle != 0.0:
+            # When avoiding, prioritize obstacle avoidance
+            omega = avoidance_angle * 1.5  # Stronger avoidance
+            v = base_v * 0.5 * speed_factor  # Slow down while avoiding
+        else:
+            # Normal navigation
+            v = base_v
+            omega = base_omega
+
+        # Stop if heading error is too large (except when avoiding)
+        if abs(heading_error) > 1.0 and abs(avoidance_angle) < 0.1:
+            v = 0.0
+        return v, omega
+
+    def sense(self):
+        """Range/bearing measurements of every landmark within sensor range"""
+        measurements = []
+        self.sensor_rays.clear()
+        for lm_id, (lx_t, ly_t) in self.landmark_grid.query_radius(self.true_x, self.true_y, self.max_sensor_range):
+            dx, dy = lx_t - self.true_x, ly_t - self.true_y
+            true_dist = math.hypot(dx, dy)
+
+            self.sensor_rays.append(((self.true_x, self.true_y), (lx_t, ly_t)))
+            true_bearing = normalize_angle(math.atan2(dy, dx) - self.true_theta)
+            z = (true_dist + self.rng.gauss(0, self.range_std),
+                 normalize_angle(true_bearing + self.rng.gauss(0, self.bearing_std)))
+            measurements.append((lm_id, z))
+        return measurements
+
+    def clutter(self):
+        """Spurious (range, bearing) returns, uniform over the sensor disc"""
+        # Poisson-distributed count (Knuth's method)
+        count, threshold, p = 0, math.exp(-self.clutter_rate), self.rng.random()
+        while p > threshold:
+            count += 1
+            p *= self.rng.random()
+        return [(self.max_sensor_range * math.sqrt(self.rng.random()), self.rng.uniform(-math.pi, math.pi))
+                for _ in range(count)]
+
+    def check_collision(self):
+        """Count each time the true robot comes within COLLISION_RADIUS of a landmark or wall"""
+        colliding = any(math.hypot(lx - self.true_x, ly - self.true_y) < COLLISION_RADIUS
+                        for _, (lx, ly) in self.landmark_grid.query_radius(self.true_x, self.true_y, COLLISION_RADIUS))
+        if self.walls and not colliding:
+            colliding = self.costmap.distance(self.true_x, self.true_y) < COLLISION_RADIUS
+        if colliding and not self.in_collision:
+            self.collisions += 1
+        self.in_collision = colliding
+
+    def control_step(self):
+        """Recompute the (v, omega) command; it is held until the next control step"""
+        self.control = self.compute_control()
+
+    def dynamics_step(self, dt):
+        """Move the true robot under the held command and integrate the noisy odometry"""
+        v, omega = self.control
+        v_l = v - omega*WHEEL_BASE/2
+        v_r = v + omega*WHEEL_BASE/2
+
+        # Ground truth
+        v_t = (v_l + v_r)/2; w_t = (v_r - v_l)/WHEEL_BASE
+        self.true_x += v_t * math.cos(self.true_theta) * dt
+        self.true_y += v_t * math.sin(self.true_theta) * dt
+        self.true_theta = normalize_angle(self.true_theta + w_t*dt)
+
+        # Noisy wheel odometry
+        v_l_n = v_l + self.rng.gauss(0, self.odom_std); v_r_n = v_r + self.rng.gauss(0, self.odom_std)
+        self.v_o = (v_l_n + v_r_n)/2; self.w_o = (v_r_n - v_l_n)/WHEEL_BASE
+        self.odom_x += self.v_o * math.cos(self.odom_theta) * dt
+        self.odom_y += self.v_o * math.sin(self.odom_theta) * dt
+        self.odom_theta = normalize_angle(self.odom_theta + self.w_o*dt)
+
+        # Running mean of the odometry for the next filter prediction
+        mean = self._odom_mean
+        mean[2] += dt
+        weight = dt / mean[2]
+        mean[0] += (self.v_o - mean[0]) * weight
+        mean[1] += (self.w_o - mean[1]) * weight
+
+        self.check_collision()
+        self.time += dt
+        self.step_count += 1
+
+    def sensor_step(self):
+        """EKF prediction over the odometry since the last sensor step, then a measurement update"""
+        v_mean, w_mean, elapsed = self._odom_mean
+        if elapsed > 0:
+            self.ekf.predict(v_mean, w_mean, elapsed)
+            self._odom_mean = [0.0, 0.0, 0.0]
+        measurements = self.sense()
+        if self.associator is None:
+            self.ekf.correct(measurements)
+        else:
+            measurements += [(None, z) for z in self.clutter()]
+            self.associator.correct([z for _, z in measurements])
+        self.measurements = measurements
+
+    def step(self, dt=SIM_DT):
+        """Advance control, truth, odometry and the EKF by one fixed timestep"""
+        self.control_step()
+        self.dynamics_step(dt)
+        self.sensor_step()
+
+    def run(self, duration, dt=SIM_DT):
+        """Step the simulation for `duration` simulated seconds"""
+        for _ in range(int(round(duration / dt))):
+            self.step(dt)
+        return self
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the EKF-SLAM simulation headless")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Simulated duration")
+    parser.add_argument("--dt", type=float, default=SIM_DT, help="Fixed timestep")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--world", help="World .npz file from world.py (default: the config.py room)")
+    parser.add_argument("--anonymous", action="store_true", help="Hide landmark ids and run data association")
+    parser.add_argument("--clutter", type=float, default=CLUTTER_RATE, help="Mean false detections per frame")
+    parser.add_argument("--backend", choices=list(FILTERS), default=FILTER_BACKEND, help="EKF-SLAM filter variant")
+    parser.add_argument("--multirate", action="store_true",
+                        help="Separate physics / control / sensor rates instead of one --dt step")
+    parser.add_argument("--physics-rate", type=float, default=PHYSICS_RATE, help="Hz (with --multirate)")
+    parser.add_argument("--control-rate", type=float, default=CONTROL_RATE, help="Hz (with --multirate)")
+    parser.add_argument("--sensor-rate", type=float, default=SENSOR_RATE, help="Hz (with --multirate)")
+    parser.add_argument("--profile", metavar="PATH", help="Write per-stage timing percentiles (.json or .csv)")
+    args = parser.parse_args()
+
+    options = dict(seed=args.seed, anonymous=args.anonymous or ANONYMOUS_LANDMARKS, clutter_rate=args.clutter,
+                   filter_backend=args.backend)
+    if args.world:
+        from world import load_world
+        sim = SlamSimulator.from_world(load_world(args.world), **options)
+    else:
+        sim = SlamSimulator(**options)
+    if args.profile:
+        from profiler import Profiler, instrument_simulator
+        profiler = Profiler()
+        instrument_simulator(profiler, sim)
+    start = time.perf_counter()
+    if args.multirate:
+        from scheduler import simulation_scheduler
+        simulation_scheduler(sim, args.physics_rate, args.control_rate, args.sensor_rate).run(args.seconds)
+    else:
+        sim.run(args.seconds, args.dt)
+    elapsed = time.perf_counter() - start
+    print(f"Simulated {sim.time:.1f}s in {elapsed:.2f}s wall ({sim.time / elapsed:.0f}x real time)")
+    print(f"Goals reached: {sim.goal_index}/{len(sim.goals)}  final error: {sim.error:.3f} m")
+    if sim.associator:
+        print(f"Mapped {sim.ekf.num_landmarks} landmarks ({len(sim.associator.tentative)} tentative)")
+    if args.profile:
+        profiler.export(args.profile)
+        print(f"{'span':>12} {'calls':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+        for name, stats in profiler.summary().items():
+            print(f"{name:>12} {stats['count']:>8} {stats['p50_ms']:>9.4f} {stats['p95_ms']:>9.4f} {stats['p99_ms']:>9.4f}")
@@ -0,0 +1,60 @@
+# spatial.py
+import math
+
+class GridIndex:
+    """
+    Uniform-grid spatial hash over 2D points, keyed by id.
+    Points can be inserted, moved and removed incrementally; radius
+    queries only visit the cells overlapping the query circle, so with a
+    cell size close to the usual query radius they cost O(points nearby)
+    instead of O(all points).
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.cells = {}   # (ix, iy) -> {key: (x, y)}
+        self.points = {}  # key -> (x, y)
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, key):
+        return key in self.points
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def insert(self, key, x, y):
+        if key in self.points:
+            self.remove(key)
+        self.points[key] = (x, y)
+        self.cells.setdefault(self._cell(x, y), {})[key] = (x, y)
+
+    def remove(self, key):
+        x, y = self.points.pop(key)
+        cell = self._cell(x, y)
+        bucket = self.cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self.cells[cell]
+
+    def move(self, key, x, y):
+        self.insert(key, x, y)
+
+    def query_radius(self, x, y, radius):
+        """(key, (px, py)) pairs with distance to (x, y) <= radius"""
+        r2 = radius * radius
+        x0, y0 = self._cell(x - radius, y - radius)
+        x1, y1 = self._cell(x + radius, y + radius)
+        found = []
+        cells = self.cells
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(cells):
+            # Query box covers more cells than exist: scan the occupied ones
+            candidates = (b for (ix, iy), b in cells.items() if x0 <= ix <= x1 and y0 <= iy <= y1)
+        else:
+            candidates = (cells[c] for c in ((ix, iy) for ix in range(x0, x1 + 1) for iy in range(y0, y1 + 1)) if c in cells)
+        for bucket in candidates:
+            for key, (px, py) in bucket.items():
+                if (px - x)**2 + (py - y)**2 <= r2:
+                    found.append((key, (px, py)))
+        return found
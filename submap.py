@@ -0,0 +1,182 @@
+# submap.py
+import math
+from collections import namedtuple
+import numpy as np
+from config import *
+from spatial import GridIndex
+
+# A frozen local map: where it was started, and its landmark estimates when it was frozen
+Submap = namedtuple("Submap", "origin landmark_ids means covariances")
+
+class SubmapEKF:
+    """
+    EKF-SLAM with a bounded local map, so the per-frame cost does not grow
+    with the mapped area.
+
+    The local filter (an EKF-family backend from filters.py: ekf, joseph,
+    sqrt or eif) holds the robot and the landmarks within `radius` of it. Every `length` meters of travel the
+    local map is frozen: landmarks that fell outside the radius move to
+    the global map with their marginal mean and 2x2 covariance, landmarks
+    still inside stay in the new local map with their correlations, and
+    global landmarks that came back inside the radius are re-imported
+    (uncorrelated with the rest) as priors. Everything is kept in the
+    world frame, so stitching a submap into the global map is replacing
+    the estimates of its landmarks.
+
+    Exposes the EKF interface the simulator, data association and
+    front-ends use; landmark_ids / landmark_estimate span the whole map.
+    """
+
+    def __init__(self, pose, motion_noise=MOTION_NOISE, meas_noise=MEAS_NOISE,
+                 update_mode=UPDATE_MODE, capacity=EKF_INITIAL_CAPACITY,
+                 local_backend=SUBMAP_BACKEND, radius=SUBMAP_RADIUS, length=SUBMAP_LENGTH,
+                 initial_pose_cov=INITIAL_POSE_COV):
+        from filters import ekf_backends, make_filter  # filters.py registers this class
+        if local_backend not in ekf_backends():
+            # Each new local map is seeded with a Gaussian (X, P) prior, which only the EKF family can take
+            raise ValueError(f"Unsupported submap local backend: {local_backend} "
+                             f"(expected one of {', '.join(ekf_backends())})")
+        self._make_filter = make_filter
+        self.motion_noise = motion_noise
+        self.meas_noise = meas_noise
+        self.update_mode = update_mode
+        self.local_backend = local_backend
+        self.radius = radius
+        self.length = length
+        self.local = make_filter(pose, local_backend, motion_noise=motion_noise, meas_noise=meas_noise,
+                                 update_mode=update_mode, capacity=capacity, initial_pose_cov=initial_pose_cov)
+        self.origin = tuple(pose)
+        self.submaps = []
+        self._means = {}  # Global (frozen) landmarks: lm_id -> mean (2,)
+        self._covs = {}   # lm_id -> covariance (2, 2)
+        self._frozen_index = GridIndex(GRID_CELL_SIZE)
+        self._frozen_means = None  # Cached (ids, (N, 2) means) of the global map, rebuilt when it changes
+
+    # The local filter's state and measurement model
+    @property
+    def X(self):
+        return self.local.X
+
+    @property
+    def P(self):
+        return self.local.P
+
+    @property
+    def state_size(self):
+        return self.local.state_size
+
+    @property
+    def landmark_index(self):
+        return self.local.landmark_index
+
+    @property
+    def pose(self):
+        return self.local.pose
+
+    def covariance(self, cols):
+        return self.local.covariance(cols)
+
+    def pose_covariance(self):
+        return self.local.pose_covariance()
+
+    def observation(self, lm_id):
+        return self.local.observation(lm_id)
+
+    def innovation(self, lm_id, z):
+        return self.local.innovation(lm_id, z)
+
+    # The whole map
+    @property
+    def landmark_ids(self):
+        return self.local.landmark_ids + list(self._means)
+
+    @property
+    def num_landmarks(self):
+        return self.local.num_landmarks + len(self._means)
+
+    def landmark_estimate(self, lm_id):
+        if lm_id in self.local.landmark_index:
+            return self.local.landmark_estimate(lm_id)
+        x, y = self._means[lm_id]
+        return x, y
+
+    def global_map(self):
+        """(ids, means (N, 2), covariances (N, 2, 2)) of every landmark, local ones as marginals"""
+        ids, means, covs = self.local.landmark_marginals()
+        frozen = list(self._means)
+        if frozen:
+            means = np.concatenate([means, np.array([self._means[i] for i in frozen])])
+            covs = np.concatenate([covs, np.array([self._covs[i] for i in frozen])])
+        return ids + frozen, means, covs
+
+    landmark_marginals = global_map
+
+    def landmark_means(self):
+        ids, means = self.local.landmark_means()
+        if self._frozen_means is None:
+            frozen = list(self._means)
+            self._frozen_means = frozen, np.array([self._means[i] for i in frozen]).reshape(-1, 2)
+        frozen, frozen_means = self._frozen_means
+        return ids + frozen, np.concatenate([means, frozen_means])
+
+    def predict(self, v, w, dt):
+        self.local.predict(v, w, dt)
+        x, y, _ = self.local.pose
+        if math.hypot(x - self.origin[0], y - self.origin[1]) > self.length:
+            self.start_submap()
+
+    def correct(self, measurements):
+        self.local.correct(measurements)
+
+    def update(self, lm_id, z):
+        self.local.update(lm_id, z)
+
+    def update_batch(self, measurements):
+        self.local.update_batch(measurements)
+
+    def remove_landmark(self, lm_id):
+        if lm_id in self.local.landmark_index:
+            self.local.remove_landmark(lm_id)
+        else:
+            del self._means[lm_id], self._covs[lm_id]
+            self._frozen_index.remove(lm_id)
+            self._frozen_means = None
+
+    def start_submap(self):
+        """Freeze the local map into the global map and start a new one around the robot"""
+        local = self.local
+        pose = local.pose
+        ids, means, covs = local.landmark_marginals()
+        self._frozen_means = None
+        self.submaps.append(Submap(self.origin, ids, means, covs))
+
+        # Landmarks out of range go to the global map, the rest stay local with their correlations
+        near = np.hypot(means[:, 0] - pose[0], means[:, 1] - pose[1]) <= self.radius
+        for i in np.flatnonzero(~near):
+            lm_id = ids[i]
+            self._means[lm_id], self._covs[lm_id] = means[i], covs[i]
+            self._frozen_index.insert(lm_id, *means[i])
+        kept = [ids[i] for i in np.flatnonzero(near)]
+        cols = [0, 1, 2] + [c for lm_id in kept for c in (local.landmark_index[lm_id], local.landmark_index[lm_id] + 1)]
+
+        # Global landmarks back within the radius rejoin the local map
+        imported = [lm_id for lm_id, _ in self._frozen_index.query_radius(pose[0], pose[1], self.radius)]
+        n = len(cols) + 2 * len(imported)
+        X = np.empty((n, 1))
+        X[:len(cols), 0] = local.X[cols, 0]
+        P = np.zeros((n, n))
+        P[:len(cols), :len(cols)] = local.covariance(cols)
+        for j, lm_id in enumerate(imported):
+            k = len(cols) + 2 * j
+            X[k:k+2, 0] = self._means.pop(lm_id)
+            P[k:k+2, k:k+2] = self._covs.pop(lm_id)
+            self._frozen_index.remove(lm_id)
+
+        new = self._make_filter(pose, self.local_backend, motion_noise=self.motion_noise, meas_noise=self.meas_noise,
+                                update_mode=self.update_mode, capacity=max(len(kept) + len(imported), EKF_INITIAL_CAPACITY))
+        for lm_id in kept + imported:
+            new._register_landmark(lm_id)
+        new.X = X
+        new.P = P
+        self.local = new
+        self.origin = pose
@@ -0,0 +1,145 @@
+# sweep.py
+"""
+Parameter sweep over the headless simulator on all CPU cores.
+
+Every combination of the --param grids (and --goals lists) is run for
+--seeds repetitions with deterministic seeds, and the results are
+aggregated into one table (RMSE, time-to-goal, collisions).
+
+Example:
+    python sweep.py --param K_DISTANCE=0.8,1.2,1.6 --param K_HEADING=2.5,3.5 \\
+                    --param MAX_SENSOR_RANGE=3,5 --seeds 20 --seconds 90 --csv runs.csv
+"""
+import argparse
+import csv
+import itertools
+import math
+import multiprocessing
+import os
+import time
+from config import *
+from simulator import SlamSimulator
+
+# config.py name -> SlamSimulator keyword, value parser
+SWEEPABLE = {
+    "K_DISTANCE": ("k_distance", float),
+    "K_HEADING": ("k_heading", float),
+    "MAX_SENSOR_RANGE": ("max_sensor_range", float),
+    "ODOM_STD": ("odom_std", float),
+    "RANGE_STD": ("range_std", float),
+    "BEARING_STD": ("bearing_std", float),
+    "MOTION_NOISE_SCALE": ("motion_noise", lambda s: [n * float(s) for n in MOTION_NOISE]),
+    "MEAS_NOISE_SCALE": ("meas_noise", lambda s: MEAS_NOISE * float(s)),
+    "FILTER_BACKEND": ("filter_backend", str),
+}
+
+def parse_param(text):
+    name, _, values = text.partition("=")
+    name = name.strip().upper()
+    if name not in SWEEPABLE or not values:
+        raise argparse.ArgumentTypeError(f"expected NAME=v1,v2,... with NAME in {', '.join(SWEEPABLE)}")
+    return name, [v.strip() for v in values.split(",") if v.strip()]
+
+def parse_goals(text):
+    """'0,2;8,4;9,7' -> [(0.0, 2.0), (8.0, 4.0), (9.0, 7.0)]"""
+    try:
+        return [tuple(float(c) for c in wp.split(",")) for wp in text.split(";") if wp.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad goal list: {text!r}")
+
+def run_one(job):
+    """Worker: one headless run, returns a flat result row"""
+    settings, goals, seed, seconds, dt = job
+    kwargs = {SWEEPABLE[name][0]: SWEEPABLE[name][1](value) for name, value in settings}
+    sim = SlamSimulator(goals=goals, seed=seed, **kwargs)
+
+    sq_error = 0.0
+    steps = int(round(seconds / dt))
+    for _ in range(steps):
+        sim.step(dt)
+        sq_error += sim.error ** 2
+    return {
+        "settings": settings,
+        "goals": goals,
+        "seed": seed,
+        "rmse": math.sqrt(sq_error / max(steps, 1)),
+        "time_to_goal": sim.goal_times[-1] if sim.done else None,
+        "goals_reached": sim.goal_index,
+        "collisions": sim.collisions,
+    }
+
+def aggregate(rows):
+    groups = {}
+    for row in rows:
+        groups.setdefault((row["settings"], tuple(row["goals"])), []).append(row)
+
+    table = []
+    for (settings, goals), runs in groups.items():
+        finished = [r["time_to_goal"] for r in runs if r["time_to_goal"] is not None]
+        table.append({
+            "settings": settings,
+            "goals": goals,
+            "runs": len(runs),
+            "rmse": sum(r["rmse"] for r in runs) / len(runs),
+            "completed": len(finished) / len(runs),
+            "time_to_goal": sum(finished) / len(finished) if finished else float("nan"),
+            "collisions": sum(r["collisions"] for r in runs),
+        })
+    table.sort(key=lambda r: r["rmse"])
+    return table
+
+def format_settings(settings, goals, show_goals):
+    text = " ".join(f"{name}={value}" for name, value in settings) or "(defaults)"
+    if show_goals:
+        text += " goals=" + ";".join(f"{x:g},{y:g}" for x, y in goals)
+    return text
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--param", type=parse_param, action="append", default=[],
+                        help="Grid axis NAME=v1,v2,... (repeatable)")
+    parser.add_argument("--goals", type=parse_goals, action="append",
+                        help="Goal list 'x,y;x,y;...' (repeatable, default from config.py)")
+    parser.add_argument("--seeds", type=int, default=10, help="Runs per grid point")
+    parser.add_argument("--base-seed", type=int, default=0)
+    parser.add_argument("--seconds", type=float, default=90.0, help="Simulated seconds per run")
+    parser.add_argument("--dt", type=float, default=SIM_DT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--csv", help="Also write every individual run to this CSV file")
+    args = parser.parse_args()
+
+    names = [name for name, _ in args.param]
+    grids = [values for _, values in args.param]
+    goal_lists = args.goals or [list(GOALS)]
+    jobs = [
+        (tuple(zip(names, combo)), goals, args.base_seed + i, args.seconds, args.dt)
+        for combo in itertools.product(*grids)
+        for goals in goal_lists
+        for i in range(args.seeds)
+    ]
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        rows = list(pool.imap_unordered(run_one, jobs, chunksize=max(1, len(jobs) // (4 * args.workers))))
+    elapsed = time.perf_counter() - start
+    print(f"{len(jobs)} runs on {args.workers} workers in {elapsed:.1f}s\n")
+
+    show_goals = len(goal_lists) > 1
+    print(f"{'RMSE (m)':>9} {'done':>6} {'t_goal (s)':>11} {'collisions':>11}  settings")
+    for r in aggregate(rows):
+        print(f"{r['rmse']:>9.3f} {r['completed']*100:>5.0f}% {r['time_to_goal']:>11.1f} {r['collisions']:>11}  "
+              f"{format_settings(r['settings'], r['goals'], show_goals)}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(names + ["goals", "seed", "rmse", "time_to_goal", "goals_reached", "collisions"])
+            for r in sorted(rows, key=lambda r: (r["settings"], r["goals"], r["seed"])):
+                writer.writerow([value for _, value in r["settings"]] + [
+                    ";".join(f"{x:g},{y:g}" for x, y in r["goals"]), r["seed"], f"{r['rmse']:.5f}",
+                    "" if r["time_to_goal"] is None else f"{r['time_to_goal']:.2f}",
+                    r["goals_reached"], r["collisions"],
+                ])
+
+if __name__ == "__main__":
+    main()
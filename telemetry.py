@@ -0,0 +1,110 @@
+# telemetry.py
+import math
+import numpy as np
+from config import *
+from geometry import normalize_angle
+
+def error_metrics(sim):
+    """
+    Per-step estimation errors of a SlamSimulator: position and heading
+    error, mean error of the mapped landmarks that have a ground truth, and
+    the NEES of the robot pose (3 on average for a consistent filter).
+    """
+    est_x, est_y, est_theta = sim.est_pose
+    e = np.array([sim.true_x - est_x, sim.true_y - est_y, normalize_angle(sim.true_theta - est_theta)])
+    try:
+        nees = float(e @ np.linalg.solve(sim.ekf.pose_covariance(), e))
+    except np.linalg.LinAlgError:
+        nees = math.nan
+
+    errors = sim.landmark_truth.errors(*sim.ekf.landmark_means())
+    return {
+        "position": math.hypot(e[0], e[1]),
+        "heading": abs(e[2]),
+        "landmarks": float(errors.mean()) if len(errors) else math.nan,
+        "nees": nees,
+    }
+
+class TruthIndex:
+    """
+    Ground-truth row of every landmark slot of a filter, so the map error
+    is one vectorized subtraction. The rows follow the ids the filter
+    reports: landmarks appended since the last call are looked up on their
+    own, and only a removal or reordering rebuilds the index.
+    """
+
+    def __init__(self, landmarks):
+        self.truth_rows = {lm_id: i for i, lm_id in enumerate(landmarks)}
+        self.xy = np.array([landmarks[lm_id] for lm_id in landmarks], dtype=float).reshape(-1, 2)
+        self.ids = []                       # Filter landmark ids the rows were built for
+        self.rows = np.empty(0, dtype=int)  # Truth row per slot, -1 where there is no truth
+
+    def sync(self, ids):
+        """Bring the rows in line with the filter's landmark ids"""
+        n = len(self.ids)
+        if len(ids) == n and ids == self.ids:
+            return self.rows
+        if len(ids) < n or ids[:n] != self.ids:
+            n = 0  # A landmark was removed or the slots were reordered
+        lookup = self.truth_rows.get
+        added = np.fromiter((lookup(lm_id, -1) for lm_id in ids[n:]), dtype=int, count=len(ids) - n)
+        self.rows = np.concatenate([self.rows[:n], added])
+        self.ids = list(ids)
+        return self.rows
+
+    def errors(self, ids, means):
+        """Distance of each (N, 2) estimate that has a ground truth from that truth"""
+        rows = self.sync(ids)
+        known = rows >= 0
+        diff = means[known] - self.xy[rows[known]]
+        return np.hypot(diff[:, 0], diff[:, 1])
+
+class Telemetry:
+    """
+    Fixed-capacity NumPy ring buffer of named series sampled together.
+    Appending is O(1) and reading a series back (or turning it into graph
+    points) is a vectorized copy, so any number of signals can be logged
+    every frame at a constant cost.
+    """
+
+    def __init__(self, names, capacity=TELEMETRY_CAPACITY):
+        self.names = list(names)
+        self.columns = {name: i for i, name in enumerate(self.names)}
+        self.capacity = capacity
+        self._buffer = np.full((capacity, len(self.names)), np.nan)
+        self.count = 0  # Samples ever appended
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, values):
+        """Append one sample; `values` maps series names to numbers (missing ones are NaN)"""
+        row = self._buffer[self.count % self.capacity]
+        row[:] = np.nan
+        for name, value in values.items():
+            row[self.columns[name]] = value
+        self.count += 1
+
+    def series(self, name, last=None):
+        """The most recent `last` (default: all stored) samples of a series, oldest first"""
+        n = len(self) if last is None else min(last, len(self))
+        rows = np.arange(self.count - n, self.count) % self.capacity
+        return self._buffer[rows, self.columns[name]]
+
+    def latest(self, name):
+        return self._buffer[(self.count - 1) % self.capacity, self.columns[name]] if self.count else math.nan
+
+    def plot_lines(self, name, x, y, width, height, scale):
+        """
+        Screen polylines for the last `width` samples of a series in a graph
+        box at (x, y): one pixel per sample, `scale` pixels per unit, clipped
+        to the box. NaN samples split the line, so gaps are not bridged.
+        """
+        values = self.series(name, width)
+        if not len(values):
+            return []
+        px = x + np.arange(len(values))
+        py = (y + height) - np.minimum(values * scale, height - 2)
+        finite = np.isfinite(py)
+        runs = np.split(np.stack([px, py], axis=1), np.flatnonzero(np.diff(finite)) + 1)
+        return runs[0 if finite[0] else 1::2]
@@ -0,0 +1,85 @@
+# trails.py
+import math
+import numpy as np
+import pygame
+from config import *
+
+class Trail:
+    """
+    Bounded path storage: a NumPy ring buffer of the last `capacity`
+    points. With `min_distance` > 0, points closer than that to the last
+    stored one are dropped (decimation), so a robot standing still does
+    not fill the buffer.
+    """
+
+    def __init__(self, capacity=TRAIL_CAPACITY, min_distance=TRAIL_MIN_DISTANCE):
+        self.capacity = capacity
+        self.min_distance = min_distance
+        self._buffer = np.empty((capacity, 2))
+        self.count = 0  # Points ever stored; index of the next one
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, x, y):
+        """Store a point; returns False if it was decimated away"""
+        if self.count and self.min_distance > 0:
+            lx, ly = self._buffer[(self.count - 1) % self.capacity]
+            if math.hypot(x - lx, y - ly) < self.min_distance:
+                return False
+        self._buffer[self.count % self.capacity] = x, y
+        self.count += 1
+        return True
+
+    def since(self, start):
+        """Points with index >= start that are still stored, oldest first"""
+        start = max(start, self.count - self.capacity, 0)
+        return self._buffer[np.arange(start, self.count) % self.capacity]
+
+    def points(self):
+        return self.since(0)
+
+class TrailLayer:
+    """
+    Draws trails incrementally onto a persistent copy of a background
+    layer: each frame only the segments appended since the last frame are
+    drawn, and the result is blitted in one go, so the per-frame cost does
+    not grow with run time. The layer is rebuilt from the stored points
+    when the background surface changes (resize, pan, zoom); older
+    segments that have left the ring buffers are then gone.
+
+    Points are transformed with one camera.to_screen_array call and
+    segments outside the view are culled before drawing.
+    """
+
+    def __init__(self, trails, camera):
+        self.trails = trails  # [(Trail, color, width), ...], drawn in this order
+        self.camera = camera
+        self.surface = None
+        self._background = None
+        self._drawn = [0] * len(trails)
+
+    def _draw_lines(self, points, color, width):
+        if len(points) < 2:
+            return
+        visible = self.camera.segments_visible(points[:-1], points[1:], margin=width)
+        if not visible.any():
+            return
+        pixels = self.camera.to_screen_array(points).tolist()
+        # Draw each run of consecutive visible segments as one polyline
+        edges = np.flatnonzero(np.diff(np.concatenate([[False], visible, [False]]).astype(np.int8)))
+        for start, end in zip(edges[::2], edges[1::2]):
+            pygame.draw.lines(self.surface, color, False, pixels[start:end + 1], width)
+
+    def draw(self, screen, background):
+        if background is not self._background:
+            self.surface = background.copy()
+            self._background = background
+            self._drawn = [0] * len(self.trails)
+
+        for i, (trail, color, width) in enumerate(self.trails):
+            if trail.count > self._drawn[i]:
+                # Start from the last drawn point so consecutive segments join up
+                self._draw_lines(trail.since(self._drawn[i] - 1), color, width)
+                self._drawn[i] = trail.count
+        screen.blit(self.surface, (0, 0))
@@ -2,9 +2,7 @@
 import math
 import pygame
 from config import SCALE, SCREEN_HEIGHT
-
-def normalize_angle(angle):
-    return (angle + math.pi) % (2 * math.pi) - math.pi
+from geometry import normalize_angle
 
 def world_to_screen(x, y):
     """
@@ -15,7 +13,7 @@ def world_to_screen(x, y):
     screen_y = int(SCREEN_HEIGHT - y * SCALE)
     return screen_x, screen_y
 
-def draw_robot(screen, x, y, theta, color):
+def draw_robot(screen, x, y, theta, color, to_screen=world_to_screen):
     """
     Draw robot as a triangle
     """
@@ -32,11 +30,11 @@ def draw_robot(screen, x, y, theta, color):
     for px, py in points:
         rx = x + px * math.cos(theta) - py * math.sin(theta)
         ry = y + px * math.sin(theta) + py * math.cos(theta)
-        transformed_points.append(world_to_screen(rx, ry))
+        transformed_points.append(to_screen(rx, ry))
 
     pygame.draw.polygon(screen, color, transformed_points)
     # Draw a small circle at the center
-    center_pos = world_to_screen(x, y)
+    center_pos = to_screen(x, y)
     pygame.draw.circle(screen, (0, 0, 0), center_pos, 2)
 
 def create_landmark_sprite(color, size=30, shape="circle"):
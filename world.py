@@ -0,0 +1,126 @@
+# world.py
+"""
+Seeded procedural worlds for stress-testing the filter and renderer.
+
+A world is a dict with "width", "height" (meters), "landmarks"
+({id: (x, y)}), "goals" ([(x, y), ...]) and "walls" ([((x0, y0), (x1, y1)),
+...], obstacles the robot avoids but does not observe); save_world /
+load_world store it as a compact .npz file.
+
+Example:
+    python world.py --width 1000 --height 1000 --landmarks 100000 --goals 20 --seed 1 -o big.npz
+    python world.py --width 200 --height 200 --density 0.1 --walls 2000 --seed 1 -o walls.npz
+    python simulator.py --world big.npz --seconds 600
+"""
+import argparse
+import numpy as np
+from config import *
+from spatial import GridIndex
+from costmap import DistanceField
+
+def default_world():
+    """The hand-made 10 x 8 m room from config.py"""
+    return {"width": WORLD_WIDTH, "height": WORLD_HEIGHT,
+            "landmarks": dict(LANDMARKS), "goals": list(GOALS), "walls": []}
+
+def generate_world(width, height, num_landmarks=None, density=None, num_goals=5,
+                   min_separation=0.0, goal_clearance=SAFE_DISTANCE, seed=None,
+                   num_walls=0, wall_length=(1.0, 5.0)):
+    """
+    Scatter landmarks uniformly over a width x height world, either a fixed
+    `num_landmarks` or `density` landmarks per square meter, keeping them at
+    least `min_separation` apart, plus `num_walls` straight walls of random
+    direction and a length drawn from `wall_length`. Goals are placed at
+    least `goal_clearance` from every landmark and wall.
+    """
+    if (num_landmarks is None) == (density is None):
+        raise ValueError("Give exactly one of num_landmarks or density")
+    if num_landmarks is None:
+        num_landmarks = int(round(density * width * height))
+
+    rng = np.random.default_rng(seed)
+    cell = max(min_separation, goal_clearance, 1.0)
+    grid = GridIndex(cell)
+    landmarks = {}
+    width_digits = len(str(max(num_landmarks - 1, 0)))
+
+    attempts = 0
+    max_attempts = 20 * num_landmarks + 100
+    while len(landmarks) < num_landmarks and attempts < max_attempts:
+        # Draw candidates in blocks; rejection only matters with min_separation
+        for x, y in rng.uniform((0.0, 0.0), (width, height), size=(min(num_landmarks, 4096), 2)):
+            attempts += 1
+            if min_separation > 0 and grid.query_radius(x, y, min_separation):
+                continue
+            lm_id = f"L{len(landmarks):0{width_digits}d}"
+            landmarks[lm_id] = (float(x), float(y))
+            grid.insert(lm_id, x, y)
+            if len(landmarks) == num_landmarks:
+                break
+    if len(landmarks) < num_landmarks:
+        raise ValueError(f"Could only place {len(landmarks)} landmarks with min_separation={min_separation}")
+
+    start = rng.uniform((0.0, 0.0), (width, height), size=(num_walls, 2))
+    angle = rng.uniform(0, 2 * np.pi, num_walls)
+    end = start + rng.uniform(*wall_length, num_walls)[:, None] * np.column_stack([np.cos(angle), np.sin(angle)])
+    end = np.clip(end, (0.0, 0.0), (width, height))
+    walls = [((float(x0), float(y0)), (float(x1), float(y1))) for (x0, y0), (x1, y1) in zip(start, end)]
+    wall_field = DistanceField.from_world({}, walls, truncation=goal_clearance + COSTMAP_RESOLUTION)
+
+    goals = []
+    margin = min(0.5, width / 4, height / 4)
+    for _ in range(1000 * num_goals):
+        if len(goals) == num_goals:
+            break
+        x, y = rng.uniform((margin, margin), (width - margin, height - margin))
+        if grid.query_radius(x, y, goal_clearance) or (walls and wall_field.distance(x, y) < goal_clearance):
+            continue
+        goals.append((float(x), float(y)))
+    if len(goals) < num_goals:
+        raise ValueError(f"Could not place {num_goals} goals {goal_clearance} m clear of landmarks")
+
+    return {"width": float(width), "height": float(height), "landmarks": landmarks, "goals": goals, "walls": walls}
+
+def save_world(path, world):
+    ids = list(world["landmarks"])
+    np.savez_compressed(
+        path,
+        size=np.array([world["width"], world["height"]]),
+        landmark_ids=np.array(ids),
+        landmark_xy=np.array([world["landmarks"][i] for i in ids], dtype=float).reshape(-1, 2),
+        goals=np.array(world["goals"], dtype=float).reshape(-1, 2),
+        walls=np.array(world.get("walls", []), dtype=float).reshape(-1, 4),
+    )
+
+def load_world(path):
+    with np.load(path) as data:
+        width, height = data["size"]
+        landmarks = {str(i): (float(x), float(y)) for i, (x, y) in zip(data["landmark_ids"], data["landmark_xy"])}
+        goals = [(float(x), float(y)) for x, y in data["goals"]]
+        walls = [((x0, y0), (x1, y1)) for x0, y0, x1, y1 in data["walls"].tolist()] if "walls" in data.files else []
+    return {"width": float(width), "height": float(height), "landmarks": landmarks, "goals": goals, "walls": walls}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=float, default=1000.0)
+    parser.add_argument("--height", type=float, default=1000.0)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--landmarks", type=int, help="Number of landmarks")
+    group.add_argument("--density", type=float, help="Landmarks per square meter")
+    parser.add_argument("--goals", type=int, default=10)
+    parser.add_argument("--min-separation", type=float, default=0.0)
+    parser.add_argument("--walls", type=int, default=0, help="Number of random wall segments")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("-o", "--output", required=True, help="Output .npz file")
+    args = parser.parse_args()
+
+    if args.landmarks is None and args.density is None:
+        args.landmarks = 10000
+    world = generate_world(args.width, args.height, args.landmarks, args.density, args.goals,
+                           args.min_separation, seed=args.seed, num_walls=args.walls)
+    save_world(args.output, world)
+    print(f"{world['width']:g} x {world['height']:g} m world, {len(world['landmarks'])} landmarks, "
+          f"{len(world['goals'])} goals, {len(world['walls'])} walls -> {args.output}")
+
+if __name__ == "__main__":
+    main()